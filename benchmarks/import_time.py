@@ -0,0 +1,68 @@
+"""
+Check how long it takes to import the core of horton.
+
+Each module is imported in a fresh interpreter with ``-X importtime``
+and the best cumulative time of several runs is compared against a
+budget. Bytecode is written on the first run so that later runs
+measure loading, not compiling.
+The script exits with a non-zero status if any module is over budget,
+or if importing it loads an optional dependency.
+
+    python benchmarks/import_time.py
+"""
+import os
+import subprocess
+import sys
+
+
+BUDGET_MS = 30.0
+MODULES = ['horton', 'horton.backends', 'horton.grid', 'horton.conway',
+           'horton.chunked', 'horton.history', 'horton.maze', 'horton.path',
+           'horton.records', 'horton.shared', 'horton.spatial',
+           'horton.checkpoint', 'horton.disk', 'horton.summary', 'horton.hex',
+           'horton.render.loop']
+OPTIONAL = ['numpy', 'pygame']
+RUNS = 5
+
+
+def import_time(module):
+    """ Return the best cumulative import time of *module* in
+    milliseconds, and the optional dependencies it loaded."""
+    best = None
+    loaded = []
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    check = ("import sys, {0}; "
+             "print(','.join(m for m in {1!r} if m in sys.modules))".format(
+                 module, OPTIONAL))
+    for _ in range(RUNS):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                                 check],
+                                capture_output=True, text=True, check=True,
+                                env=env)
+        loaded = [m for m in result.stdout.strip().split(',') if m]
+        for line in result.stderr.splitlines():
+            fields = [f.strip() for f in line.split('|')]
+            if len(fields) == 3 and fields[2] == module:
+                micros = int(fields[1])
+                best = micros if best is None else min(best, micros)
+    return best / 1000.0, loaded
+
+
+def main():
+    failed = False
+    for module in MODULES:
+        millis, loaded = import_time(module)
+        status = 'ok'
+        if millis > BUDGET_MS:
+            status = 'over budget'
+            failed = True
+        if loaded:
+            status = 'loaded ' + ', '.join(loaded)
+            failed = True
+        print("{0:<20} {1:8.2f} ms  {2}".format(module, millis, status))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+"""
+A library of grids and other fine amusements.
+
+Submodules are imported the first time they are used, so
+``import horton`` itself costs next to nothing and optional
+dependencies such as pygame are only loaded by the modules that need
+them.
+"""
+import importlib
+
+
+_SUBMODULES = frozenset(['backends', 'checkpoint', 'chunked', 'conway', 'disk',
+                         'grid', 'hex', 'history', 'maze', 'path', 'records',
+                         'render', 'shared', 'spatial', 'summary'])
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('horton.' + name)
+    raise AttributeError("module 'horton' has no attribute %r" % name)
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -0,0 +1,22 @@
+import importlib
+
+
+_modules = {}
+
+
+def optional(name):
+    """ Return the module *name*, or None if it is not installed.
+
+    The module is imported on the first call and remembered after that,
+    so optional dependencies are only loaded by the code that uses
+    them.
+    """
+    try:
+        return _modules[name]
+    except KeyError:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            module = None
+        _modules[name] = module
+        return module
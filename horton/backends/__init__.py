@@ -0,0 +1,158 @@
+"""
+Interchangeable implementations of the bulk grid operations.
+
+Grids fill, copy, combine and convolve their cells, and the Game of
+Life steps them, through the operations of a *backend*. The
+``'python'`` backend in :py:mod:`horton.backends.python` is the
+reference and is always available. Other backends, such as
+``'numpy'``, implement some or all of the operations with faster
+array code, and any operation they leave out, or decline for a given
+input by returning ``NotImplemented``, falls back to the reference.
+
+By default each operation uses the highest priority backend that is
+installed. :py:func:`use`, or the ``HORTON_BACKEND`` environment
+variable, selects one explicitly.
+
+A backend is only imported the first time one of its operations is
+used, so registering one costs nothing.
+
+>>> op('fill')(3, 0)
+[0, 0, 0]
+"""
+import importlib
+import os
+import warnings
+from collections import namedtuple
+
+from horton._optional import optional
+
+
+Backend = namedtuple("Backend", "name module ops requires priority")
+
+OPERATIONS = frozenset(['fill', 'copy', 'combine', 'convolve',
+                        'neighbourhood_sums', 'life_step', 'pixels'])
+
+_backends = {}
+_selected = None
+_resolved = {}
+
+
+def register(name, module, ops, requires=(), priority=0):
+    """ Register the backend *name*, implemented by the functions named
+    *ops* in *module*.
+
+    *requires* names the optional modules the backend needs, and the
+    installed backend with the highest *priority* is used for each
+    operation unless one is chosen with :py:func:`use`.
+    """
+    unknown = set(ops) - OPERATIONS
+    if unknown:
+        raise ValueError("Unknown operations: {0}".format(
+            ', '.join(sorted(unknown))))
+    _backends[name] = Backend(name, module, frozenset(ops), tuple(requires),
+                              priority)
+    _resolved.clear()
+
+
+def names():
+    """ Return the names of every registered backend."""
+    return sorted(_backends)
+
+
+def is_available(name):
+    """ Return True if the backend *name* can be used here."""
+    return all(optional(module) is not None
+               for module in _backends[name].requires)
+
+
+def available():
+    """ Return the names of the registered backends that can be used
+    here, highest priority first.
+    """
+    return [b.name for b in sorted(_backends.values(),
+                                   key=lambda b: (-b.priority, b.name))
+            if is_available(b.name)]
+
+
+def use(name):
+    """ Use the backend *name* for every operation it provides.
+
+    ``'auto'`` goes back to choosing the best installed backend for
+    each operation.
+    """
+    if name != 'auto':
+        if name not in _backends:
+            raise ValueError("Unknown backend: {0!r}".format(name))
+        if not is_available(name):
+            raise ValueError("Backend {0!r} needs {1}".format(
+                name, ', '.join(_backends[name].requires)))
+    global _selected
+    _selected = name
+    _resolved.clear()
+
+
+def current():
+    """ Return the name of the selected backend, or ``'auto'``."""
+    if _selected is None:
+        name = os.environ.get('HORTON_BACKEND', 'auto')
+        try:
+            use(name)
+        except ValueError as e:
+            warnings.warn("Ignoring HORTON_BACKEND: {0}".format(e))
+            use('auto')
+    return _selected
+
+
+def load(name):
+    """ Return the module implementing the backend *name*."""
+    return importlib.import_module(_backends[name].module)
+
+
+def _choose(operation):
+    """ Return the name of the backend that should run *operation*."""
+    selected = current()
+    if selected != 'auto':
+        if operation in _backends[selected].ops:
+            return selected
+        return 'python'
+    candidates = [b for b in _backends.values() if operation in b.ops]
+    for backend in sorted(candidates, key=lambda b: (-b.priority, b.name)):
+        if is_available(backend.name):
+            return backend.name
+    return 'python'
+
+
+def _with_fallback(fast, reference):
+    def dispatch(*args):
+        result = fast(*args)
+        if result is NotImplemented:
+            return reference(*args)
+        return result
+    return dispatch
+
+
+def op(operation):
+    """ Return the function that runs *operation* with the selected
+    backend.
+    """
+    try:
+        return _resolved[operation]
+    except KeyError:
+        pass
+    if operation not in OPERATIONS:
+        raise ValueError("Unknown operation: {0!r}".format(operation))
+    reference = getattr(load('python'), operation)
+    name = _choose(operation)
+    if name == 'python':
+        function = reference
+    else:
+        function = _with_fallback(getattr(load(name), operation), reference)
+    _resolved[operation] = function
+    return function
+
+
+register('python', 'horton.backends.python', OPERATIONS)
+register('numpy', 'horton.backends.numpy',
+         ['combine', 'convolve', 'neighbourhood_sums', 'life_step',
+          'pixels'],
+         requires=['numpy'], priority=10)
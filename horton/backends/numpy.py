@@ -0,0 +1,191 @@
+"""
+A backend that runs the bulk grid operations as NumPy array code.
+
+Each operation converts the flat cells to an array, works on the whole
+array at once and hands back a list, so its results match the
+reference backend. It declines, by returning ``NotImplemented``, any
+input it cannot handle exactly: cells that are not plain numbers,
+small grids where converting costs more than it saves, integers that
+might overflow a machine word and division by zero.
+"""
+from numbers import Number
+from operator import add, eq, ge, gt, le, lt, mul, ne, sub, truediv
+
+import numpy as np
+
+
+# Grids smaller than this are left to the reference backend.
+MIN_SIZE = 1024
+
+_ARITHMETIC = {add: np.add, sub: np.subtract, mul: np.multiply,
+               truediv: np.true_divide}
+_COMPARISON = {eq: np.equal, ne: np.not_equal, lt: np.less,
+               le: np.less_equal, gt: np.greater, ge: np.greater_equal}
+
+# The largest magnitude integers are allowed to reach, leaving room
+# for one more addition before an int64 overflows.
+_INT_LIMIT = 2 ** 62
+# Integers beyond this do not survive the conversion to a float.
+_FLOAT_EXACT = 2 ** 53
+
+_PAD_MODES = {'zero': 'constant', 'clamp': 'edge', 'wrap': 'wrap'}
+
+
+def _numbers(values):
+    """ Return *values* as an int64 or float64 array, or None if they
+    are not all real numbers that fit one.
+    """
+    if len(values) < MIN_SIZE:
+        return None
+    try:
+        a = np.asarray(values)
+    except (OverflowError, ValueError):
+        return None
+    if a.dtype.kind == 'b':
+        return a.astype(np.int64)
+    if a.dtype.kind == 'u' and a.size and a.max() >= 2 ** 63:
+        return None
+    if a.dtype.kind in 'iu':
+        return a.astype(np.int64, copy=False)
+    if a.dtype.kind == 'f':
+        return a.astype(np.float64, copy=False)
+    return None
+
+
+def _magnitude(a):
+    """ Return the largest absolute value in *a*."""
+    if not a.size:
+        return 0.0
+    return max(abs(float(a.max())), abs(float(a.min())))
+
+
+def combine(values, other, op, reflected=False):
+    """ Return the list of *op* applied to each of *values* and the
+    matching item of *other*, or to *other* itself if it is a scalar.
+    """
+    ufunc = _ARITHMETIC.get(op) or _COMPARISON.get(op)
+    if ufunc is None:
+        return NotImplemented
+    a = _numbers(values)
+    if a is None:
+        return NotImplemented
+    if isinstance(other, Number):
+        if isinstance(other, complex):
+            return NotImplemented
+        b = np.asarray(int(other) if isinstance(other, bool) else other)
+        if b.dtype.kind not in 'iuf':
+            return NotImplemented
+    else:
+        b = _numbers(other)
+        if b is None:
+            return NotImplemented
+
+    if op in _ARITHMETIC:
+        integers = a.dtype.kind == 'i' and b.dtype.kind in 'iu'
+        largest = max(_magnitude(a), _magnitude(b))
+        if op is mul and integers and largest * largest >= _INT_LIMIT:
+            return NotImplemented
+        if integers and largest >= _INT_LIMIT:
+            return NotImplemented
+        if op is truediv:
+            if integers and largest >= _FLOAT_EXACT:
+                return NotImplemented
+            if not np.all(a if reflected else b):
+                return NotImplemented
+    if reflected:
+        a, b = b, a
+    return ufunc(a, b).tolist()
+
+
+def _pad(a, width, height, ry, rx, boundary):
+    return np.pad(a.reshape(height, width), ((ry, ry), (rx, rx)),
+                  mode=_PAD_MODES[boundary])
+
+
+def convolve(values, width, height, kernel, boundary):
+    """ Return the flat list of the weighted sums of each cell's
+    neighbourhood.
+    """
+    a = _numbers(values)
+    if a is None:
+        return NotImplemented
+    k = np.asarray(kernel)
+    if k.dtype.kind not in 'biuf':
+        return NotImplemented
+    if a.dtype.kind == 'i':
+        if k.dtype.kind == 'f':
+            if _magnitude(a) >= _FLOAT_EXACT:
+                return NotImplemented
+        elif _magnitude(a) * float(np.abs(k).sum()) >= _INT_LIMIT:
+            return NotImplemented
+    ry, rx = k.shape[0] // 2, k.shape[1] // 2
+    padded = _pad(a, width, height, ry, rx, boundary)
+    total = np.zeros((height, width), dtype=np.result_type(a, k))
+    for ky, kx in zip(*np.nonzero(k)):
+        w = k[ky, kx]
+        shifted = padded[ky:ky + height, kx:kx + width]
+        total += shifted if w == 1 else shifted * w
+    return total.ravel().tolist()
+
+
+def neighbourhood_sums(values, width, height, runs, wraps):
+    """ Return the flat list of the weighted sum of each cell's
+    neighbourhood, from running sums along the rows.
+    """
+    a = _numbers(values)
+    if a is None:
+        return NotImplemented
+    rx = max(max(-x1, x2, 0) for _, x1, x2, _ in runs)
+    ry = max(abs(dy) for dy, _, _, _ in runs)
+    if wraps and (rx >= width or ry >= height):
+        return NotImplemented
+    weights = np.asarray([weight for _, _, _, weight in runs])
+    if weights.dtype.kind not in 'biuf':
+        return NotImplemented
+    if a.dtype.kind == 'i':
+        # The largest running sum along a padded row.
+        reach = _magnitude(a) * (width + 2 * rx)
+        if weights.dtype.kind == 'f':
+            if reach >= _FLOAT_EXACT:
+                return NotImplemented
+        elif reach * float(np.abs(weights).sum()) >= _INT_LIMIT:
+            return NotImplemented
+    padded = _pad(a, width, height, ry, rx, 'wrap' if wraps else 'zero')
+    rows = np.zeros((padded.shape[0], padded.shape[1] + 1), dtype=a.dtype)
+    np.cumsum(padded, axis=1, out=rows[:, 1:])
+    total = np.zeros((height, width), dtype=np.result_type(a, weights))
+    for dy, x1, x2, weight in runs:
+        lo, hi = rx + x1, rx + x2 + 1
+        box = (rows[ry + dy:ry + dy + height, hi:hi + width] -
+               rows[ry + dy:ry + dy + height, lo:lo + width])
+        total += box if weight == 1 else box * weight
+    return total.ravel().tolist()
+
+
+def life_step(values, width, height, wraps):
+    """ Return the flat list of cells after one generation of Conway's
+    Game of Life.
+    """
+    a = _numbers(values)
+    if a is None or _magnitude(a) * 9 >= _INT_LIMIT:
+        return NotImplemented
+    padded = _pad(a, width, height, 1, 1, 'wrap' if wraps else 'zero')
+    ns = -a.reshape(height, width)
+    for dy in range(3):
+        for dx in range(3):
+            ns = ns + padded[dy:dy + height, dx:dx + width]
+    cells = a.reshape(height, width)
+    alive = (ns == 3) | ((cells == 1) & (ns == 2))
+    return alive.astype(np.int64).ravel().tolist()
+
+
+def pixels(values, colours, default=(0, 0, 0)):
+    """ Return the packed RGB bytes of the flat *values*."""
+    a = _numbers(values)
+    if a is None or not all(isinstance(v, (int, float)) for v in colours):
+        return NotImplemented
+    rgb = np.empty((len(a), 3), dtype=np.uint8)
+    rgb[:] = default
+    for value, colour in colours.items():
+        rgb[a == value] = colour
+    return rgb.tobytes()
@@ -0,0 +1,238 @@
+"""
+The pure-Python reference backend.
+
+Every operation a backend may provide is defined here, and the
+results of this module are what the other backends are tested
+against. It only needs the standard library, so it is always
+available.
+"""
+from array import array
+from copy import copy as _copy, deepcopy
+from fractions import Fraction
+from functools import reduce
+from itertools import accumulate, groupby, repeat
+from math import gcd
+from operator import add, mul, sub
+
+
+_IMMUTABLE = (int, float, complex, bool, str, bytes, tuple, frozenset,
+              type(None))
+
+# Summing a cell together with its eight neighbours is a separable
+# kernel, so the neighbour count is that total minus the cell.
+NEIGHBOURHOOD = [[1, 1, 1],
+                 [1, 1, 1],
+                 [1, 1, 1]]
+
+
+def fill(size, value):
+    """ Return a list of *size* cells holding *value*.
+
+    Mutable values are copied for each cell so that cells do not share
+    them.
+    """
+    if isinstance(value, _IMMUTABLE):
+        return [value] * size
+    return [_copy(value) for _ in range(size)]
+
+
+def copy(values):
+    """ Return a deep copy of the flat *values*.
+
+    Values held in a :py:class:`memoryview`, such as shared memory,
+    are copied into a list.
+    """
+    if isinstance(values, memoryview):
+        return values.tolist()
+    return deepcopy(values)
+
+
+def combine(values, other, op, reflected=False):
+    """ Return the list of *op* applied to each of *values* and the
+    matching item of the sequence *other*, or to *other* itself if it
+    is a scalar.
+
+    With *reflected* the arguments of *op* are swapped.
+    """
+    if not isinstance(other, (list, array, memoryview)):
+        other = repeat(other, len(values))
+    if reflected:
+        return list(map(op, other, values))
+    return list(map(op, values, other))
+
+
+def _boundary_indices(size, radius, boundary):
+    """ Return the source index of each padded position from *-radius*
+    to *size + radius*.
+
+    Positions beyond the edges of a ``'zero'`` boundary map to *size*,
+    where the caller keeps a zero.
+    """
+    indices = range(-radius, size + radius)
+    if boundary == 'wrap':
+        return [i % size for i in indices]
+    if boundary == 'clamp':
+        return [min(max(i, 0), size - 1) for i in indices]
+    return [i if 0 <= i < size else size for i in indices]
+
+
+def _separate(kernel):
+    """ Return a row and a column whose outer product is *kernel*, or
+    None if there are none.
+
+    The row of integer weights is divided by their greatest common
+    divisor, which makes the column whole numbers too and keeps sums of
+    integers exact. Fractional column weights are only accepted from a
+    kernel with float weights, whose sums are floats either way.
+    """
+    pivot_row = next((r for r in kernel if any(r)), None)
+    if pivot_row is None:
+        return None
+    if all(isinstance(w, int) for w in pivot_row):
+        divisor = reduce(gcd, pivot_row)
+        pivot_row = [w // divisor for w in pivot_row]
+    floats = any(isinstance(w, float) for row in kernel for w in row)
+    pivot = next(i for i, w in enumerate(pivot_row) if w)
+    column = []
+    for row in kernel:
+        scale = Fraction(row[pivot]) / Fraction(pivot_row[pivot])
+        if scale.denominator == 1:
+            scale = int(scale)
+        elif floats:
+            scale = float(scale)
+        else:
+            return None
+        if row != [scale * w for w in pivot_row]:
+            return None
+        column.append(scale)
+    return pivot_row, column
+
+
+def _correlate_rows(values, width, height, kernel, boundary):
+    """ Return the flat list of *kernel* applied to the flat, row-major
+    *values* of a *width* by *height* grid.
+
+    Each kernel weight adds a whole shifted row at a time.
+    """
+    ry, rx = len(kernel) // 2, len(kernel[0]) // 2
+    xs = _boundary_indices(width, rx, boundary)
+    ys = _boundary_indices(height, ry, boundary)
+    zero_row = [0] * (width + 2 * rx)
+    padded = []
+    for y in ys:
+        if y == height:
+            padded.append(zero_row)
+        else:
+            row = list(values[y * width:(y + 1) * width])
+            row.append(0)
+            padded.append([row[x] for x in xs])
+
+    taps = [(ky, kx, w) for ky, krow in enumerate(kernel)
+            for kx, w in enumerate(krow) if w]
+    result = []
+    for y in range(height):
+        total = [0] * width
+        for ky, kx, w in taps:
+            shifted = padded[y + ky][kx:kx + width]
+            if w != 1:
+                shifted = map(mul, shifted, repeat(w, width))
+            total = list(map(add, total, shifted))
+        result.extend(total)
+    return result
+
+
+def convolve(values, width, height, kernel, boundary):
+    """ Return the flat list of the weighted sums of each cell's
+    neighbourhood.
+
+    *kernel* is a list of rows with odd dimensions and *boundary* is
+    one of ``'zero'``, ``'clamp'`` or ``'wrap'``. Kernels whose rows are
+    all multiples of one row are applied as two one-dimensional passes.
+    """
+    separated = _separate(kernel)
+    if separated is not None:
+        row, column = separated
+        values = _correlate_rows(values, width, height, [row], boundary)
+        return _correlate_rows(values, width, height,
+                               [[w] for w in column], boundary)
+    return _correlate_rows(values, width, height, kernel, boundary)
+
+
+def _spans(dys):
+    """ Return the inclusive ranges of consecutive numbers in the
+    sorted *dys*."""
+    return [(group[0][1], group[-1][1]) for group in
+            (list(g) for _, g in groupby(enumerate(dys),
+                                         lambda pair: pair[1] - pair[0]))]
+
+
+def neighbourhood_sums(values, width, height, runs, wraps):
+    """ Return the flat list of the weighted sum of each cell's
+    neighbourhood.
+
+    The neighbourhood is a list of *runs*, each a tuple of a row
+    offset, the first and last column offsets and a weight. Every run
+    is summed from running sums along its row, and runs of the same
+    width and weight in consecutive rows from running sums down the
+    columns, so the cost does not depend on how long the runs are.
+    A square neighbourhood takes constant time per cell whatever its
+    radius, and other shapes time proportional to their height.
+    """
+    boundary = 'wrap' if wraps else 'zero'
+    rx = max(max(-x1, x2, 0) for _, x1, x2, _ in runs)
+    ry = max(abs(dy) for dy, _, _, _ in runs)
+    xs = _boundary_indices(width, rx, boundary)
+    prefixes = []
+    for y in range(height):
+        row = list(values[y * width:(y + 1) * width])
+        row.append(0)
+        prefixes.append([0] + list(accumulate(row[x] for x in xs)))
+    ys = _boundary_indices(height, ry, boundary)
+
+    groups = {}
+    for dy, x1, x2, weight in runs:
+        groups.setdefault((x1, x2, weight), set()).add(dy)
+    totals = [[0] * width for _ in range(height)]
+    for (x1, x2, weight), dys in groups.items():
+        lo, hi = rx + x1, rx + x2 + 1
+        boxes = [list(map(sub, p[hi:hi + width], p[lo:lo + width]))
+                 for p in prefixes]
+        boxes.append([0] * width)
+        columns = [[0] * width]
+        for y in ys:
+            columns.append(list(map(add, columns[-1], boxes[y])))
+        for d1, d2 in _spans(sorted(dys)):
+            for y in range(height):
+                total = map(sub, columns[y + ry + d2 + 1],
+                            columns[y + ry + d1])
+                if weight != 1:
+                    total = map(mul, total, repeat(weight, width))
+                totals[y] = list(map(add, totals[y], total))
+    return [total for row in totals for total in row]
+
+
+def life_step(values, width, height, wraps):
+    """ Return the flat list of cells after one generation of Conway's
+    Game of Life.
+
+    Cells beyond the edges are dead unless *wraps* is true, in which
+    case the grid wraps around like a torus.
+    """
+    totals = convolve(values, width, height, NEIGHBOURHOOD,
+                      'wrap' if wraps else 'zero')
+    cells = []
+    for total, cell in zip(totals, values):
+        ns = total - cell
+        cells.append(1 if ns == 3 or (cell == 1 and ns == 2) else 0)
+    return cells
+
+
+def pixels(values, colours, default=(0, 0, 0)):
+    """ Return the packed RGB bytes of the flat *values*.
+
+    *colours* maps cell values to ``(r, g, b)`` tuples and every other
+    value is drawn in *default*.
+    """
+    lookup = dict((value, bytes(rgb)) for value, rgb in colours.items())
+    default = bytes(default)
+    return b''.join([lookup.get(value, default) for value in values])
@@ -0,0 +1,251 @@
+"""
+Checkpoints for long simulation runs.
+
+:py:func:`dumps` and :py:func:`loads` turn a Grid into a compact,
+compressed byte string and back. A :py:class:`Checkpointer` writes
+them to a file from a background thread, together with the generation
+and the state of a random number generator, so that
+:py:func:`horton.conway.generations` can pick a run up where it was
+last saved.
+
+Checkpoints are pickled, so only load files you trust.
+"""
+import importlib
+import os
+import pickle
+import threading
+import zlib
+from array import array
+
+from horton.grid import Grid
+
+
+MAGIC = b'HRTN\x01'
+
+
+# Typecodes tried, smallest first, for cells that are all plain ints.
+_INT_TYPECODES = 'BbHhIiLlQq'
+
+
+def _encode_cells(values):
+    """ Return the kind of encoding used for *values* and its bytes.
+
+    Typed storage keeps its own typecode. Cells that are all bools are
+    stored one byte each under the :py:mod:`struct` code ``'?'``, and
+    cells that are all plain ints in the smallest :py:mod:`array`
+    typecode that holds them. Anything else is pickled.
+    """
+    if isinstance(values, array):
+        return values.typecode, values.tobytes()
+    kinds = set(map(type, values))
+    if kinds == {bool}:
+        return '?', bytes(values)
+    if kinds == {int}:
+        bounds = (min(values), max(values))
+        for typecode in _INT_TYPECODES:
+            try:
+                array(typecode, bounds)
+            except OverflowError:
+                continue
+            return typecode, array(typecode, values).tobytes()
+    return None, pickle.dumps(list(values), pickle.HIGHEST_PROTOCOL)
+
+
+def _state(cls, width, height, values, generation=None, rng_state=None,
+           options=None):
+    typecode, data = _encode_cells(values)
+    return {'class': (cls.__module__, cls.__name__),
+            'options': options or {},
+            'width': width,
+            'height': height,
+            'typed': isinstance(values, array),
+            'typecode': typecode,
+            'data': data,
+            'generation': generation,
+            'rng': rng_state}
+
+
+def _pack(state):
+    return MAGIC + zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+
+def _unpack(data):
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a horton checkpoint")
+    return pickle.loads(zlib.decompress(data[len(MAGIC):]))
+
+
+def _grid(state):
+    """ Return the Grid stored in *state*."""
+    module, name = state['class']
+    cls = getattr(importlib.import_module(module), name)
+    if not (isinstance(cls, type) and issubclass(cls, Grid)):
+        raise ValueError("{0}.{1} is not a Grid".format(module, name))
+    typecode, data = state['typecode'], state['data']
+    if typecode is None:
+        values = pickle.loads(data)
+    elif typecode == '?':
+        values = list(map(bool, data))
+    else:
+        values = array(typecode)
+        values.frombytes(data)
+        if not state['typed']:
+            values = values.tolist()
+    return cls.from_array(state['width'], state['height'], values,
+                          copy=False, **state.get('options', {}))
+
+
+def dumps(grid):
+    """ Return *grid* encoded as compressed bytes.
+
+    Cells that are all bools or small non-negative integers, such as
+    the cells of a Game of Life, are stored one byte each before
+    compression.
+    The options the grid was built with, such as its chunk size, are
+    stored with its type.
+
+    >>> g = Grid.from_array(3, 1, [0, 1, 2])
+    >>> loads(dumps(g)) == g
+    True
+    """
+    return _pack(_state(type(grid), grid.width, grid.height, grid._grid,
+                        options=grid._options()))
+
+
+def loads(data):
+    """ Return the Grid encoded in *data* by :py:func:`dumps`."""
+    return _grid(_unpack(data))
+
+
+class Checkpointer(object):
+    """
+    Periodic checkpoints of a simulation, written to *path*.
+
+    :py:meth:`Checkpointer.save` takes a snapshot of the cells and
+    returns at once, while a background thread encodes it and replaces
+    the file. At most one snapshot waits for the writer, so a slow disk
+    holds stepping back rather than using more memory. Each file is
+    written beside *path* first and then renamed over it, so a crash
+    never leaves a half-written checkpoint.
+
+    *every* is how many generations :py:func:`horton.conway.generations`
+    runs between checkpoints. The state of *rng*, a
+    :py:class:`random.Random`, is saved with each checkpoint and
+    restored by :py:meth:`Checkpointer.load`.
+    """
+
+    def __init__(self, path, every=1000, rng=None):
+        if every < 1:
+            raise ValueError("Checkpoints must be at least one generation "
+                             "apart")
+        self.path = path
+        self.every = every
+        self.rng = rng
+        self._pending = None
+        self._writing = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def save(self, generation, world):
+        """ Checkpoint *world* as generation *generation*."""
+        values = world._grid
+        if isinstance(values, memoryview):
+            values = values.tolist()
+        else:
+            values = values[:]
+        state = (type(world), world.width, world.height, values, generation,
+                 self.rng.getstate() if self.rng is not None else None,
+                 world._options())
+        with self._condition:
+            self._raise_error()
+            while self._pending is not None:
+                self._condition.wait()
+                self._raise_error()
+            self._pending = state
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write,
+                                                name="horton-checkpoint")
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self):
+        """ Wait until every saved checkpoint is on disk."""
+        with self._condition:
+            while self._pending is not None or self._writing:
+                self._condition.wait()
+            self._raise_error()
+
+    def load(self):
+        """ Return the generation and Grid of the last checkpoint, or
+        None if there is none.
+
+        The saved state of the random number generator is restored.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            if os.path.exists(self.path):
+                raise
+            return None
+        state = _unpack(data)
+        if self.rng is not None and state['rng'] is not None:
+            self.rng.setstate(state['rng'])
+        return state['generation'], _grid(state)
+
+    def close(self):
+        """ Write any pending checkpoint and stop the writer thread."""
+        self.flush()
+        with self._condition:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._pending = False
+                self._condition.notify_all()
+        if thread is not None:
+            thread.join()
+            self._pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                if self._pending is False:
+                    return
+                state = self._pending
+                self._pending = None
+                self._writing = True
+                self._condition.notify_all()
+            try:
+                data = _pack(_state(*state))
+                temporary = self.path + '.tmp'
+                with open(temporary, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temporary, self.path)
+            except Exception as e:
+                with self._condition:
+                    self._error = e
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
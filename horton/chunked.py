@@ -0,0 +1,358 @@
+from copy import copy, deepcopy
+from itertools import chain
+from operator import eq
+
+from horton.grid import Grid, _changed_runs
+
+
+class _Uniform(object):
+    """ A chunk whose every cell holds the same value."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class ChunkedGrid(Grid):
+    """
+    A Grid stored as square chunks of cells.
+
+    A chunk is only allocated the first time one of its cells is
+    written with a value different from the rest of the chunk. Until
+    then, and again after :py:meth:`ChunkedGrid.compact`, the chunk is
+    stored as a single uniform value. Neighbouring cells in both
+    directions live in the same chunk, which keeps column-wise and
+    neighbourhood access local on wide grids.
+
+    Unallocated cells share the default value, so a ChunkedGrid should
+    hold immutable values. Iteration, reductions, comparison and
+    :py:meth:`ChunkedGrid.diff` work a chunk, or a band of chunks, at a
+    time rather than building the whole grid, and uniform chunks are
+    counted and summed without visiting their cells.
+
+    >>> g = ChunkedGrid(100, 100, chunk_size=10)
+    >>> g[42, 17] = 1
+    >>> g[42, 17], g[43, 17]
+    (1, 0)
+    >>> g.allocated_chunks
+    1
+    """
+
+    def __init__(self, width, height, value=0, chunk_size=64):
+        assert chunk_size > 0
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self._value = value
+        self._empty = _Uniform(value)
+        self._chunks = {}
+        self._coordinates = None
+
+    @classmethod
+    def copy(cls, other):
+        """
+        Return a new ChunkedGrid as a copy of *other*.
+        """
+        if not isinstance(other, ChunkedGrid):
+            return super(ChunkedGrid, cls).copy(other)
+        g = cls(other.width, other.height, other._value, other.chunk_size)
+        g._chunks = deepcopy(other._chunks)
+        return g
+
+    @classmethod
+    def from_array(cls, width, height, arr, copy=True, chunk_size=64):
+        """ Create a ChunkedGrid of *chunk_size* chunks from an array."""
+        assert len(arr) == width * height, ("Array dimensions do not "
+                                            "match length of array.")
+        g = cls(width, height, chunk_size=chunk_size)
+        g._grid = deepcopy(arr) if copy else arr
+        return g
+
+    def _options(self):
+        return {'chunk_size': self.chunk_size}
+
+    @property
+    def allocated_chunks(self):
+        """ Return the number of chunks holding individual cells."""
+        return sum(1 for chunk in self._chunks.values()
+                   if chunk.__class__ is not _Uniform)
+
+    @property
+    def _grid(self):
+        """ Return the cells as a flat, row-major list."""
+        return self._rows(0, self.height)
+
+    def _rows(self, start, stop):
+        """ Return the cells of the rows from *start* up to *stop* as
+        a flat, row-major list.
+        """
+        size = self.chunk_size
+        chunks = self._chunks
+        empty = self._empty
+        cells = []
+        for y in range(start, min(stop, self.height)):
+            cy, ly = divmod(y, size)
+            offset = ly * size
+            for cx in range(0, self.width, size):
+                width = min(size, self.width - cx)
+                chunk = chunks.get((cx // size, cy), empty)
+                if chunk.__class__ is _Uniform:
+                    cells.extend([chunk.value] * width)
+                else:
+                    cells.extend(chunk[offset:offset + width])
+        return cells
+
+    @_grid.setter
+    def _grid(self, cells):
+        assert len(cells) == self.width * self.height
+        self._chunks = {}
+        width = self.width
+        for idx, value in enumerate(cells):
+            self._put(idx % width, idx // width, value)
+        self.compact()
+
+    def compact(self):
+        """ Store every chunk whose cells are all equal as a single
+        value.
+
+        Return the number of chunks released.
+        """
+        size = self.chunk_size
+        released = 0
+        for key, chunk in list(self._chunks.items()):
+            if chunk.__class__ is _Uniform:
+                continue
+            cx, cy = key
+            width = min(size, self.width - cx * size)
+            height = min(size, self.height - cy * size)
+            first = chunk[0]
+            if all(chunk[row * size:row * size + width] == [first] * width
+                   for row in range(height)):
+                if first == self._value:
+                    del self._chunks[key]
+                else:
+                    self._chunks[key] = _Uniform(first)
+                released += 1
+        return released
+
+    def _chunk_cells(self):
+        """ Yield every chunk as a pair of its number of cells inside
+        the grid and either its :py:class:`_Uniform` or a list of those
+        cells.
+        """
+        size = self.chunk_size
+        empty = self._empty
+        for y0 in range(0, self.height, size):
+            height = min(size, self.height - y0)
+            for x0 in range(0, self.width, size):
+                width = min(size, self.width - x0)
+                chunk = self._chunks.get((x0 // size, y0 // size), empty)
+                if chunk.__class__ is not _Uniform and width < size:
+                    chunk = list(chain.from_iterable(
+                        chunk[row * size:row * size + width]
+                        for row in range(height)))
+                elif chunk.__class__ is not _Uniform and height < size:
+                    chunk = chunk[:height * size]
+                yield width * height, chunk
+
+    def _from_values(self, values):
+        """ Return a new grid of the same type holding *values*."""
+        g = self.__class__(self.width, self.height, self._value,
+                           self.chunk_size)
+        g._grid = values
+        return g
+
+    def _store(self, values):
+        """ Replace every value in the grid with *values*."""
+        self._grid = values
+        self._notify(None, None)
+
+    def fill(self, value):
+        """ Set every cell to *value*, releasing every chunk."""
+        size = self.chunk_size
+        if value == self._value:
+            self._chunks = {}
+        else:
+            self._chunks = dict(((cx, cy), _Uniform(value))
+                                for cy in range((self.height - 1) // size + 1)
+                                for cx in range((self.width - 1) // size + 1))
+        self._notify(None, None)
+
+    def flood_fill(self, start, value, connectivity=4):
+        """ Set the region of equal, connected cells around *start* to
+        *value*.
+
+        Return the number of cells filled.
+        """
+        grid = Grid.from_array(self.width, self.height, self._grid,
+                               copy=False)
+        filled = grid.flood_fill(start, value, connectivity)
+        if filled:
+            self._store(grid._grid)
+        return filled
+
+    def iter_chunk_items(self):
+        """ Yield successive co-ordinate, value pairs one chunk at a
+        time.
+
+        Chunks are visited in row-major order and so are the cells
+        within each chunk.
+        """
+        size = self.chunk_size
+        empty = self._empty
+        for y0 in range(0, self.height, size):
+            y1 = min(y0 + size, self.height)
+            for x0 in range(0, self.width, size):
+                x1 = min(x0 + size, self.width)
+                chunk = self._chunks.get((x0 // size, y0 // size), empty)
+                if chunk.__class__ is _Uniform:
+                    value = chunk.value
+                    for y in range(y0, y1):
+                        for x in range(x0, x1):
+                            yield (x, y), value
+                else:
+                    for y in range(y0, y1):
+                        offset = (y - y0) * size - x0
+                        for x in range(x0, x1):
+                            yield (x, y), chunk[offset + x]
+
+    def iter_row_chunks(self, rows=64):
+        """ Yield the values of *rows* rows at a time.
+
+        Each chunk of rows is gathered into its own list, without
+        building the whole grid first.
+        """
+        if rows < 1:
+            raise ValueError("A chunk must hold at least one row")
+        for y in range(0, self.height, rows):
+            yield y, self._rows(y, y + rows)
+
+    def apply_patch(self, patch):
+        """ Apply a changeset produced by :py:meth:`Grid.diff`."""
+        size = len(self)
+        width = self.width
+        for start, values in patch:
+            if start < 0 or start + len(values) > size:
+                raise KeyError("Patch run at {0} is outside the grid".format(
+                    start))
+            for idx, value in enumerate(values, start):
+                self._put(idx % width, idx // width, value)
+        self._notify(None, None)
+
+    def diff(self, other):
+        """ Return the changes needed to turn this grid into *other*,
+        comparing a band of chunks at a time.
+        """
+        self._check_comparable(other)
+        rows = self.chunk_size
+        width = self.width
+        runs = []
+        for (y, ours), (_, theirs) in zip(self.iter_row_chunks(rows),
+                                          other.iter_row_chunks(rows)):
+            for start, values in _changed_runs(ours, theirs, y * width):
+                if runs and runs[-1][0] + len(runs[-1][1]) == start:
+                    runs[-1][1].extend(values)
+                else:
+                    runs.append((start, values))
+        return runs
+
+    def _same_values(self, other):
+        return len(self) == len(other) and all(map(eq, self, other))
+
+    def sum(self):
+        """ Return the sum of the values."""
+        total = 0
+        for cells, chunk in self._chunk_cells():
+            if chunk.__class__ is _Uniform:
+                total += chunk.value * cells
+            else:
+                total += sum(chunk)
+        return total
+
+    def count(self, predicate=None):
+        """ Return the number of values for which *predicate* is true.
+
+        *Without a predicate, count the values that are true.* The
+        predicate is called once for each uniform chunk.
+        """
+        total = 0
+        for cells, chunk in self._chunk_cells():
+            if chunk.__class__ is _Uniform:
+                value = chunk.value
+                if predicate(value) if predicate is not None else value:
+                    total += cells
+            elif predicate is None:
+                total += sum(1 for v in chunk if v)
+            else:
+                total += sum(1 for v in map(predicate, chunk) if v)
+        return total
+
+    def min(self):
+        """ Return the smallest value."""
+        return min(chunk.value if chunk.__class__ is _Uniform else min(chunk)
+                   for _, chunk in self._chunk_cells())
+
+    def max(self):
+        """ Return the largest value."""
+        return max(chunk.value if chunk.__class__ is _Uniform else max(chunk)
+                   for _, chunk in self._chunk_cells())
+
+    def __iter__(self):
+        """ Return an iterator over the values, gathered a band of
+        chunks at a time."""
+        return chain.from_iterable(
+            values for _, values in self.iter_row_chunks(self.chunk_size))
+
+    def __contains__(self, value):
+        """ Return True of *value* can be found in the grid."""
+        return any(value == cell for _, cell in self.iter_chunk_items())
+
+    def __get_coordinate__(self, x, y):
+        if not self._is_valid_location(x, y):
+            raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                x, y))
+        size = self.chunk_size
+        cx, lx = divmod(x, size)
+        cy, ly = divmod(y, size)
+        chunk = self._chunks.get((cx, cy), self._empty)
+        if chunk.__class__ is _Uniform:
+            return chunk.value
+        return chunk[ly * size + lx]
+
+    def __setitem__(self, *args):
+        """ Set an item in the grid to a value.
+
+        *The first argument is an (x, y) tuple and the second is the value.*
+        """
+        if not self._is_valid_location(*args[0]):
+            raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                *args[0]))
+        x, y = args[0]
+        if self._hash is None:
+            self._put(x, y, args[1])
+        else:
+            old = self.__get_coordinate__(x, y)
+            self._put(x, y, args[1])
+            self._rehash(y * self.width + x, old,
+                         self.__get_coordinate__(x, y))
+        if self._watchers:
+            self._notify(x, y)
+
+    def _put(self, x, y, value):
+        size = self.chunk_size
+        cx, lx = divmod(x, size)
+        cy, ly = divmod(y, size)
+        key = (cx, cy)
+        chunk = self._chunks.get(key, self._empty)
+        if chunk.__class__ is _Uniform:
+            if chunk.value == value:
+                return
+            chunk = [copy(chunk.value) for _ in range(size * size)]
+            self._chunks[key] = chunk
+        chunk[ly * size + lx] = value
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
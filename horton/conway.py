@@ -1,11 +1,37 @@
+import re
 from collections import namedtuple
 from functools import partial
+from itertools import chain, groupby
 
-from grid import Grid
+from horton import backends
+from horton.grid import Grid
 
 
 Coordinate = namedtuple("Coordinate", "x y")
 
+Rule = namedtuple("Rule", "birth survival neighbourhood states weights",
+                  defaults=(None, 2, None))
+Rule.__doc__ = """
+A rule for :py:func:`step` with any neighbourhood and number of states.
+
+A dead cell, in state 0, is born when the weighted count of its
+neighbourhood is in *birth*, and a live cell, in state 1, survives
+when it is in *survival*. Both are containers such as a set or a
+range. *neighbourhood* is a mask like those from
+:py:func:`neighbourhood`, the eight adjacent cells by default.
+
+With more than two *states*, a live cell that does not survive
+spends the states from 2 up to ``states - 1`` dying, one generation
+each, before it is dead. Dying cells are neither counted nor born.
+*weights* maps each state to what it adds to a count, ``{1: 1}`` by
+default.
+"""
+
+_LTL = re.compile(r'^R(\d+),C(\d+),M([01]),S(\d+)\.\.(\d+),'
+                  r'B(\d+)\.\.(\d+)(?:,N([MNCH]))?$')
+_LTL_SHAPES = {'M': 'moore', 'N': 'von_neumann', 'C': 'circular',
+               'H': 'hex'}
+
 
 def get_at(world, coord):
     """ Return a value from the world at the coordinate or None."""
@@ -16,7 +42,7 @@ def get_at(world, coord):
 
 
 def coordinates(world):
-    """ Yield each Coordinate and cell from world.
+    """ Return an iterator over each Coordinate and cell from world.
 
     >>> world = Grid(3, 3)
     >>> world[0, 1] = 1
@@ -26,7 +52,7 @@ def coordinates(world):
     >>> world[2, 1] = 1
     >>> world[1, 2] = 1
     >>> for coord, cell in coordinates(world):
-    ...     print coord, cell
+    ...     print(coord, cell)
     Coordinate(x=0, y=0) 0
     Coordinate(x=1, y=0) 1
     Coordinate(x=2, y=0) 0
@@ -37,9 +63,7 @@ def coordinates(world):
     Coordinate(x=1, y=2) 1
     Coordinate(x=2, y=2) 0
     """
-    for y in range(world.height):
-        for x in range(world.width):
-            yield (Coordinate(x, y), world[x, y])
+    return zip(map(Coordinate._make, world.iter_coordinates()), world)
 
 
 def neighbours(world, coord):
@@ -84,7 +108,139 @@ def neighbours(world, coord):
     return sum(filter(lambda x: x is not None, cells))
 
 
-def step(world):
+def neighbourhood(radius=1, shape='moore', centre=False):
+    """
+    Return the mask of the cells within *radius* of a cell.
+
+    The mask is a square list of rows of 1s and 0s with the cell in
+    the middle, as for :py:meth:`horton.grid.Grid.convolve`. *shape*
+    is one of:
+
+    - ``'moore'``, the square around the cell
+    - ``'von_neumann'``, the diamond within *radius* steps
+    - ``'circular'``, the disc within a distance of *radius*
+    - ``'hex'``, the hexagon within *radius* steps on a grid of axial
+      hexagonal co-ordinates
+
+    The cell itself is only part of its neighbourhood with *centre*.
+    Any other mask, including one of weights other than 1, can be used
+    as a :py:class:`Rule` neighbourhood as well.
+
+    >>> neighbourhood(1, 'von_neumann')
+    [[0, 1, 0], [1, 0, 1], [0, 1, 0]]
+    >>> neighbourhood(1, 'hex', centre=True)
+    [[0, 1, 1], [1, 1, 1], [1, 1, 0]]
+    """
+    shapes = {'moore': lambda dx, dy: True,
+              'von_neumann': lambda dx, dy: abs(dx) + abs(dy) <= radius,
+              'circular': lambda dx, dy: dx * dx + dy * dy <= radius * radius,
+              'hex': lambda dx, dy: abs(dx + dy) <= radius}
+    if shape not in shapes:
+        raise ValueError("Unknown neighbourhood shape: %r" % shape)
+    if radius < 1:
+        raise ValueError("The radius must be at least 1")
+    inside = shapes[shape]
+    span = range(-radius, radius + 1)
+    return [[1 if inside(dx, dy) and (centre or dx or dy) else 0
+             for dx in span] for dy in span]
+
+
+def parse_rule(text):
+    """
+    Return the :py:class:`Rule` written in Larger than Life notation.
+
+    The notation gives the radius, the number of states, whether the
+    cell counts itself, the survival and birth ranges and the shape of
+    the neighbourhood, which is Moore unless it ends with ``NN`` for
+    von Neumann, ``NC`` for circular or ``NH`` for hexagonal.
+
+    >>> bosco = parse_rule('R5,C0,M1,S34..58,B34..45,NM')
+    >>> bosco.survival, bosco.birth, len(bosco.neighbourhood)
+    (range(34, 59), range(34, 46), 11)
+    """
+    match = _LTL.match(text.upper().replace(' ', ''))
+    if match is None:
+        raise ValueError("Not a Larger than Life rule: %r" % text)
+    radius, states, middle, s1, s2, b1, b2, shape = match.groups()
+    return Rule(birth=range(int(b1), int(b2) + 1),
+                survival=range(int(s1), int(s2) + 1),
+                neighbourhood=neighbourhood(int(radius),
+                                            _LTL_SHAPES[shape or 'M'],
+                                            middle == '1'),
+                states=max(int(states), 2))
+
+
+def _runs(mask):
+    """ Return the runs of equal, nonzero weights in *mask* as tuples
+    of a row offset, the first and last column offsets and a weight.
+    """
+    height = len(mask)
+    width = len(mask[0]) if mask else 0
+    if (height % 2 == 0 or width % 2 == 0 or
+            any(len(row) != width for row in mask)):
+        raise ValueError("A neighbourhood must be a rectangle of odd "
+                         "dimensions")
+    ry, rx = height // 2, width // 2
+    runs = []
+    for ky, row in enumerate(mask):
+        kx = 0
+        for weight, group in groupby(row):
+            n = len(list(group))
+            if weight:
+                runs.append((ky - ry, kx - rx, kx + n - 1 - rx, weight))
+            kx += n
+    if not runs:
+        raise ValueError("A neighbourhood must hold at least one cell")
+    return runs
+
+
+def _rule_masks(world, rule):
+    """ Return the masks *world* counts the neighbourhood of *rule*
+    with, one for each kind of row."""
+    mask = rule.neighbourhood
+    if mask is None:
+        mask = neighbourhood()
+    _runs(mask)  # Reject a malformed mask before it is converted.
+    return world._row_masks(mask)
+
+
+def _rule_cells(values, width, height, wraps, masks, rule, first=0):
+    """ Return the flat list of cells *values*, *height* rows from row
+    *first* of a world, after one generation of *rule*."""
+    weights = rule.weights if rule.weights is not None else {1: 1}
+    counted = [weights.get(cell, 0) for cell in values]
+    sums = backends.op('neighbourhood_sums')
+    # Grids whose rows are not all alike, such as offset hexagonal
+    # grids, need a mask for each kind of row.
+    every = [sums(counted, width, height, _runs(m), wraps) for m in masks]
+    if len(every) == 1:
+        counts = every[0]
+    else:
+        counts = []
+        for y in range(height):
+            counts.extend(every[(first + y) % len(every)]
+                          [y * width:(y + 1) * width])
+    birth, survival, states = rule.birth, rule.survival, rule.states
+    dying = 2 % states
+    cells = []
+    for count, cell in zip(counts, values):
+        if cell == 0:
+            cells.append(1 if count in birth else 0)
+        elif cell == 1:
+            cells.append(1 if count in survival else dying)
+        else:
+            cells.append((cell + 1) % states)
+    return cells
+
+
+def _rule_step(world, rule):
+    """ Return the flat list of cells of *world* after one generation of
+    *rule*."""
+    return _rule_cells(world._grid, world.width, world.height, world.wraps,
+                       _rule_masks(world, rule), rule)
+
+
+def step(world, rule=None):
     """
     Returns a new version of the world by applying the rules of the
     game to the old one.
@@ -104,34 +260,119 @@ def step(world):
     1 1 1
     0 0 0
 
+    The new world is the same type of Grid as the old one, so a Torus
+    keeps wrapping around its edges.
+
+    With a :py:class:`Rule`, the world follows that rule instead.
+    Neighbourhoods are counted from running sums along their rows, so
+    larger than life rules of a large radius stay practical. Worlds
+    with a rule of their own, such as a
+    :py:class:`horton.hex.HexGrid`, follow it unless given another, and
+    read the masks of their rules in their own co-ordinates.
+
+    >>> seeds = Rule(birth={2}, survival=set())
+    >>> Grid.pprint(step(gen_2, seeds))
+    1 0 1
+    0 0 0
+    1 0 1
+
     :param world: A Grid object representing the world
+    :param rule: An optional Rule to step the world with
     :returns: A new Grid object representing a new world advanced by one
               step
     """
-    new_world = Grid.copy(world)
-    for coord, cell in coordinates(world):
-        ns = neighbours(world, coord)
-        x, y = (coord.x, coord.y)
-        if cell == 1:
-            if ns < 2:
-                new_world[x, y] = 0
-            if ns == 2 or ns == 3:
-                new_world[x, y] = 1
-            if ns > 3:
-                new_world[x, y] = 0
-        else:
-            if ns == 3:
-                new_world[x, y] = 1
-            else:
-                new_world[x, y] = 0
-    return new_world
+    if rule is None:
+        rule = getattr(world, 'life_rule', None)
+    if rule is not None:
+        return world._from_values(_rule_step(world, rule))
+    return world._from_values(backends.op('life_step')(
+        world._grid, world.width, world.height, world.wraps))
+
+
+def step_rows(world, out, rows=256, rule=None):
+    """
+    Write the next generation of *world* into *out*, a band of *rows*
+    rows at a time.
+
+    Only a few bands of the world are held in memory at once, so this
+    steps worlds too large to copy, such as a
+    :py:class:`horton.disk.DiskGrid`, into another grid of the same
+    size. *out* must not be *world*. The world follows *rule*, or its
+    own rule, as with :py:func:`step`.
 
+    >>> world = Grid.from_array(3, 3, [0, 0, 0, 1, 1, 1, 0, 0, 0])
+    >>> out = Grid(3, 3)
+    >>> step_rows(world, out, rows=1)
+    >>> out == step(world)
+    True
 
-def generations(num, starting_world):
+    :param world: A Grid object representing the world
+    :param out: A Grid of the same dimensions to write the result to
+    :param rows: The number of rows to step at once
+    :param rule: An optional Rule to step the world with
+    """
+    assert world.dimensions == out.dimensions
+    assert out is not world
+    width, height, wraps = world.width, world.height, world.wraps
+    if rule is None:
+        rule = getattr(world, 'life_rule', None)
+    if rule is None:
+        reach = 1
+        life_step = backends.op('life_step')
+
+        def advance(values, n, first):
+            return life_step(values, width, n, wraps)
+    else:
+        masks = _rule_masks(world, rule)
+        reach = len(masks[0]) // 2
+
+        def advance(values, n, first):
+            return _rule_cells(values, width, n, wraps, masks, rule, first)
+
+    def wrapped(ys):
+        return [[world[x, y % height] for x in range(width)] for y in ys]
+
+    # The rows read so far and not yet done with, from row *top*. A
+    # Torus starts and ends with the rows it wraps around to.
+    lines = wrapped(range(-reach, 0)) if wraps and height else []
+    top = -len(lines)
+    waiting = []
+
+    def flush(y, n):
+        nonlocal top
+        start = max(y - reach, top) - top
+        stop = min(y + n + reach - top, len(lines))
+        values = list(chain.from_iterable(lines[start:stop]))
+        result = advance(values, stop - start, top + start)
+        skip = (y - top - start) * width
+        out.apply_patch([(y * width, list(result[skip:skip + n * width]))])
+        done = max(y + n - reach - top, 0)
+        del lines[:done]
+        top += done
+
+    for y, values in world.iter_row_chunks(rows):
+        values = list(values)
+        lines.extend(values[x:x + width] for x in range(0, len(values),
+                                                         width))
+        waiting.append((y, len(values) // width))
+        while waiting and top + len(lines) >= sum(waiting[0]) + reach:
+            flush(*waiting.pop(0))
+    if wraps:
+        lines.extend(wrapped(range(height, height + reach)))
+    for band in waiting:
+        flush(*band)
+
+
+def generations(num, starting_world, stepper=None, checkpoint=None):
     """ Yield successive generations starting from starting_world.
 
     The first generation is starting_world followed by successive
-    applications of the 'step' function.
+    applications of the 'step' function, or of *stepper* if given.
+
+    With a :py:class:`horton.checkpoint.Checkpointer`, the world is
+    saved every *checkpoint.every* generations while the run goes on.
+    If the checkpoint file already exists, the run resumes from the
+    generation saved in it instead of from starting_world.
 
     >>> seed = Grid(3, 3)
     >>> seed[0, 1] = 1
@@ -155,12 +396,28 @@ def generations(num, starting_world):
 
    :param num: The number of generations to yield
    :param starting_world: The initial world to kick off with
+   :param stepper: A function from one world to the next
+   :param checkpoint: A Checkpointer to save and resume the run with
    :returns: A generator that yields successive generations of starting_world
     """
-    world = Grid.copy(starting_world)
-    for generation in xrange(num):
-        yield generation, world
-        world = step(world)
+    if stepper is None:
+        stepper = step
+    start = 0
+    restored = checkpoint.load() if checkpoint is not None else None
+    if restored is not None:
+        start, world = restored
+    else:
+        world = type(starting_world).copy(starting_world)
+    try:
+        for generation in range(start, num):
+            if (checkpoint is not None and generation != start and
+                    generation % checkpoint.every == 0):
+                checkpoint.save(generation, world)
+            yield generation, world
+            world = stepper(world)
+    finally:
+        if checkpoint is not None:
+            checkpoint.flush()
 
 
 if __name__ == '__main__':
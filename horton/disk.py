@@ -0,0 +1,408 @@
+"""
+Grids kept in a file instead of in memory.
+
+A :py:class:`DiskGrid` stores its cells as square tiles of machine
+values in a memory-mapped file. Only a bounded number of tiles are
+held in memory at once, so a world can be far larger than the memory
+of the machine working on it, as long as it is visited a band of rows
+at a time with :py:meth:`DiskGrid.iter_row_chunks` and written back
+with :py:meth:`Grid.apply_patch`, as :py:func:`horton.conway.step_rows`
+does.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import weakref
+from array import array
+from collections import OrderedDict
+from operator import eq
+
+from horton.grid import Grid, _content_hash
+
+
+MAGIC = b'HRTNDISK'
+
+# Magic, width, height, tile size and typecode, padded to 64 bytes.
+_HEADER = struct.Struct('<8sQQIc')
+_DATA_OFFSET = 64
+
+
+def _remove(mapped, f, path):
+    """ Close the map and file of a temporary grid and remove it."""
+    mapped.close()
+    f.close()
+    os.remove(path)
+
+
+class DiskGrid(Grid):
+    """
+    A Grid stored as tiles in a memory-mapped file.
+
+    Cells are machine values of a single :py:mod:`array` *typecode*
+    and the file holds square tiles of *tile_size* cells a side. The
+    tiles used most recently, up to *cache_tiles* of them, are kept in
+    memory. Writes go to those copies and a changed tile is only
+    written back to the file when it leaves the cache, on
+    :py:meth:`DiskGrid.flush` or on :py:meth:`DiskGrid.close`.
+
+    The file is created at *path*, or if *path* is None as a temporary
+    file removed on close or when the grid is garbage collected. A new file is sparse where the file
+    system allows it, so a grid of zeros costs next to no disk until
+    it is written. Reopen an existing file with
+    :py:meth:`DiskGrid.open`.
+
+    Operations that need every cell at once, such as arithmetic or
+    :py:meth:`Grid.convolve`, still work but read the whole grid into
+    memory and return an ordinary :py:class:`Grid`.
+
+    >>> g = DiskGrid(1000, 1000, tile_size=100, cache_tiles=4)
+    >>> g[999, 999] = 7
+    >>> g[999, 999], g[0, 0]
+    (7, 0)
+    >>> g.close()
+    """
+
+    def __init__(self, width, height, value=0, typecode='b', tile_size=256,
+                 cache_tiles=64, path=None):
+        if tile_size < 1:
+            raise ValueError("Tiles must hold at least one cell")
+        temporary = path is None
+        if temporary:
+            fd, path = tempfile.mkstemp(suffix='.horton')
+            os.close(fd)
+        tiles_x = (width - 1) // tile_size + 1 if width else 0
+        tiles_y = (height - 1) // tile_size + 1 if height else 0
+        tile_bytes = tile_size * tile_size * array(typecode).itemsize
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, width, height, tile_size,
+                                 typecode.encode('ascii')))
+            f.truncate(_DATA_OFFSET + tiles_x * tiles_y * tile_bytes)
+        self._attach(path, cache_tiles, False)
+        self._temporary = None
+        if temporary:
+            self._temporary = weakref.finalize(self, _remove, self._mmap,
+                                               self._file, path)
+        if value:
+            self.fill(value)
+
+    @classmethod
+    def open(cls, path, cache_tiles=64, readonly=False):
+        """ Return a DiskGrid over the existing file at *path*.
+
+        Writing to a *readonly* grid raises TypeError.
+        """
+        g = cls.__new__(cls)
+        g._attach(path, cache_tiles, readonly)
+        g._temporary = None
+        return g
+
+    @classmethod
+    def copy(cls, other):
+        """
+        Return a new DiskGrid, in a temporary file, as a copy of *other*.
+        """
+        if not isinstance(other, DiskGrid):
+            return super(DiskGrid, cls).copy(other)
+        g = cls(other.width, other.height, typecode=other.typecode,
+                tile_size=other.tile_size, cache_tiles=other.cache_tiles)
+        for y, values in other.iter_row_chunks(other.tile_size):
+            g._write(y * other.width, values)
+        return g
+
+    def _attach(self, path, cache_tiles, readonly):
+        if cache_tiles < 1:
+            raise ValueError("The cache must hold at least one tile")
+        self.path = path
+        self.cache_tiles = cache_tiles
+        self.readonly = readonly
+        self._file = open(path, 'rb' if readonly else 'r+b')
+        header = self._file.read(_HEADER.size)
+        if len(header) < _HEADER.size or not header.startswith(MAGIC):
+            self._file.close()
+            raise ValueError("{0} is not a horton disk grid".format(path))
+        _, self.width, self.height, self.tile_size, typecode = (
+            _HEADER.unpack(header))
+        self.typecode = typecode.decode('ascii')
+        size = self.tile_size
+        self._tiles_x = (self.width - 1) // size + 1 if self.width else 0
+        self._tile_bytes = size * size * array(self.typecode).itemsize
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ if readonly
+                               else mmap.ACCESS_WRITE)
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._coordinates = None
+
+    def _offset(self, key):
+        tx, ty = key
+        return _DATA_OFFSET + (ty * self._tiles_x + tx) * self._tile_bytes
+
+    def _tile(self, key):
+        """ Return the cached tile *key*, reading it in if needed."""
+        cache = self._cache
+        try:
+            tile = cache[key]
+        except KeyError:
+            offset = self._offset(key)
+            tile = array(self.typecode)
+            tile.frombytes(self._mmap[offset:offset + self._tile_bytes])
+            cache[key] = tile
+            while len(cache) > self.cache_tiles:
+                self._evict()
+            return tile
+        cache.move_to_end(key)
+        return tile
+
+    def _evict(self):
+        key, tile = self._cache.popitem(last=False)
+        if key in self._dirty:
+            self._write_tile(key, tile)
+
+    def _write_tile(self, key, tile):
+        offset = self._offset(key)
+        self._mmap[offset:offset + self._tile_bytes] = tile.tobytes()
+        self._dirty.discard(key)
+
+    def _check_writable(self):
+        if self.readonly:
+            raise TypeError("The grid is read-only")
+
+    def flush(self):
+        """ Write every changed tile back to the file."""
+        for key in list(self._dirty):
+            self._write_tile(key, self._cache[key])
+        if not self.readonly:
+            self._mmap.flush()
+
+    def close(self):
+        """ Flush and close the file, removing it if it is temporary.
+
+        The grid must not be used afterwards.
+        """
+        if self._mmap is None:
+            return
+        if self._temporary is not None:
+            self._temporary()
+        else:
+            self.flush()
+            self._mmap.close()
+            self._file.close()
+        self._mmap = None
+        self._cache = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def _grid(self):
+        """ Return the cells as a flat, row-major list."""
+        return self._rows(0, self.height)
+
+    @_grid.setter
+    def _grid(self, cells):
+        assert len(cells) == self.width * self.height
+        self._write(0, cells)
+
+    def _rows(self, start, stop):
+        """ Return the cells of the rows from *start* up to *stop* as
+        a flat, row-major list.
+
+        Each row of tiles is read once for all of its rows in the
+        band, even when it is wider than the cache.
+        """
+        size = self.tile_size
+        width = self.width
+        stop = min(stop, self.height)
+        cells = []
+        y = start
+        while y < stop:
+            ty, first = divmod(y, size)
+            last = min(stop - ty * size, size)
+            tiles = [(self._tile((tx, ty)), min(size, width - tx * size))
+                     for tx in range(self._tiles_x)]
+            for ly in range(first, last):
+                offset = ly * size
+                for tile, n in tiles:
+                    cells.extend(tile[offset:offset + n])
+            y = ty * size + last
+        return cells
+
+    def _tile_rows(self):
+        """ Yield the key of each tile, one tile at a time, with the
+        offset in the tile, the flat index and the length of each of
+        its rows inside the grid.
+        """
+        size = self.tile_size
+        width, height = self.width, self.height
+        for ty in range((height - 1) // size + 1 if height else 0):
+            for tx in range(self._tiles_x):
+                n = min(size, width - tx * size)
+                yield (tx, ty), [(ly * size, (ty * size + ly) * width +
+                                  tx * size, n)
+                                 for ly in range(min(size,
+                                                     height - ty * size))]
+
+    def _write(self, start, values):
+        """ Write the flat *values* from the flat index *start* on.
+
+        The values are gathered by tile first, so that every tile is
+        read and written back once, whatever the size of the cache.
+        """
+        self._check_writable()
+        size = self.tile_size
+        width = self.width
+        typecode = self.typecode
+        runs = OrderedDict()
+        done = 0
+        while done < len(values):
+            y, x = divmod(start + done, width)
+            ty, ly = divmod(y, size)
+            tx, lx = divmod(x, size)
+            n = min(size - lx, width - x, len(values) - done)
+            runs.setdefault((tx, ty), []).append((ly * size + lx, done, n))
+            done += n
+        for key, segments in runs.items():
+            tile = self._tile(key)
+            for offset, first, n in segments:
+                tile[offset:offset + n] = array(typecode,
+                                                values[first:first + n])
+            self._dirty.add(key)
+
+    def _from_values(self, values):
+        """ Return a new ordinary Grid holding *values*."""
+        if not isinstance(values, array):
+            values = list(values)
+        return Grid.from_array(self.width, self.height, values, copy=False)
+
+    def _store(self, values):
+        """ Replace every value in the grid with *values*."""
+        self._write(0, values)
+        self._notify(None, None)
+
+    def fill(self, value):
+        """ Set every cell to *value*, one tile at a time."""
+        self._check_writable()
+        size = self.tile_size
+        data = (array(self.typecode, [value]) * (size * size)).tobytes()
+        tiles_y = (self.height - 1) // size + 1 if self.height else 0
+        for ty in range(tiles_y):
+            for tx in range(self._tiles_x):
+                offset = self._offset((tx, ty))
+                self._mmap[offset:offset + self._tile_bytes] = data
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._notify(None, None)
+
+    def flood_fill(self, start, value, connectivity=4):
+        """ Set the region of equal, connected cells around *start* to
+        *value*.
+
+        The whole grid is read into memory to fill it. Return the
+        number of cells filled.
+        """
+        self._check_writable()
+        grid = Grid.from_array(self.width, self.height, self._grid,
+                               copy=False)
+        filled = grid.flood_fill(start, value, connectivity)
+        if filled:
+            self._store(grid._grid)
+        return filled
+
+    def iter_row_chunks(self, rows=64):
+        """ Yield the values of *rows* rows at a time.
+
+        Only one band of rows is held in a list at once, and each tile
+        is read once for a band however small the cache is.
+        """
+        if rows < 1:
+            raise ValueError("A chunk must hold at least one row")
+        for y in range(0, self.height, rows):
+            yield y, self._rows(y, y + rows)
+
+    def apply_patch(self, patch):
+        """ Apply a changeset produced by :py:meth:`Grid.diff`."""
+        size = len(self)
+        for start, values in patch:
+            if start < 0 or start + len(values) > size:
+                raise KeyError("Patch run at {0} is outside the grid".format(
+                    start))
+            self._write(start, values)
+        self._notify(None, None)
+
+    def __iter__(self):
+        """ Return an iterator over the values, a row of tiles at a
+        time."""
+        for _, values in self.iter_row_chunks(self.tile_size):
+            for value in values:
+                yield value
+
+    def __hash__(self):
+        """ Return a hash of the values in the grid, as for
+        :py:meth:`Grid.__hash__`, computed a tile at a time.
+        """
+        h = self._hash
+        if h is None:
+            h = 0
+            for key, rows in self._tile_rows():
+                tile = self._tile(key)
+                for offset, idx, n in rows:
+                    h ^= _content_hash(tile[offset:offset + n], idx)
+            self._hash = h
+        return h
+
+    def _same_values(self, other):
+        if len(self) != len(other):
+            return False
+        if (isinstance(other, DiskGrid) and
+                other.dimensions == self.dimensions and
+                other.tile_size == self.tile_size):
+            for key, rows in self._tile_rows():
+                ours, theirs = self._tile(key), other._tile(key)
+                for offset, _, n in rows:
+                    if ours[offset:offset + n] != theirs[offset:offset + n]:
+                        return False
+            return True
+        return all(map(eq, self, other))
+
+    def __contains__(self, value):
+        """ Return True of *value* can be found in the grid."""
+        return any(value == cell for cell in self)
+
+    def __get_coordinate__(self, x, y):
+        if not self._is_valid_location(x, y):
+            raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                x, y))
+        size = self.tile_size
+        tx, lx = divmod(x, size)
+        ty, ly = divmod(y, size)
+        return self._tile((tx, ty))[ly * size + lx]
+
+    def __setitem__(self, *args):
+        """ Set an item in the grid to a value.
+
+        *The first argument is an (x, y) tuple and the second is the value.*
+        """
+        if not self._is_valid_location(*args[0]):
+            raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                *args[0]))
+        self._check_writable()
+        x, y = args[0]
+        size = self.tile_size
+        tx, lx = divmod(x, size)
+        ty, ly = divmod(y, size)
+        key = (tx, ty)
+        tile = self._tile(key)
+        offset = ly * size + lx
+        self._assign(tile, offset, y * self.width + x, args[1])
+        self._dirty.add(key)
+        if self._watchers:
+            self._notify(x, y)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
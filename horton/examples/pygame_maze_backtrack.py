@@ -1,9 +1,8 @@
 import pygame
-import random
 
 from functools import partial
-from horton.grid import Grid
-from horton.render.pg import render_grid
+from horton.maze import backtracker, NORTH, EAST, SOUTH, WEST
+from horton.render.pg import SpriteCache, render_grid
 from pygame.locals import *
 
 
@@ -15,86 +14,35 @@ MAZE_WALL_COLOUR = (0, 0, 0)
 FONT_COLOUR = (0, 0, 255)
 
 
-# We can store any Python object in a Grid.  Most maze generation
-# algorithms use a cell object with four "walls" in the typical
-# cardinal directions.
-
-default_cell = {'north': True,
-                'south': True,
-                'east': True,
-                'west': True,
-                'visited': False}
-
-# We then need to tell Horton's pygame renderer how to draw our Cell
-# objects.  Horton just needs a function that takes a
+# horton.maze generates mazes as a Grid of wall masks.  Each cell is
+# an integer whose bits tell us which of its four walls, in the
+# typical cardinal directions, are still standing.
+#
+# We then need to tell Horton's pygame renderer how to draw our
+# cells.  Horton just needs a function that takes a
 # pygame.surface.Surface, a cell object from the Grid, and some
 # arguments to tell it where to draw the cell: x, y, width, and
 # height.  We pass this function to render_grid.
 
 def draw_maze_cell(surface, cell, x, y, width, height):
     draw_line = partial(pygame.draw.line, surface, MAZE_WALL_COLOUR)
-    if cell['north']:
+    if cell & NORTH:
         draw_line((x, y), (x + width, y), 2)
-    if cell['east']:
+    if cell & EAST:
         draw_line((x + width, y), (x + width, y + height), 2)
-    if cell['south']:
+    if cell & SOUTH:
         draw_line((x, y + height), (x + width + 1, y + height), 2)
-    if cell['west']:
+    if cell & WEST:
         draw_line((x, y), (x, y + height), 2)
 
 
-# And of course our maze-generation algorithm...
-
-def unvisited_neighbours(grid, location):
-    x, y = location
-    offsets = [(0, -1), (1, 0),
-               (0, 1), (-1, 0)]
-    return [(x + offset_x, y + offset_y)
-            for offset_x, offset_y in offsets
-            if grid._is_valid_location(x + offset_x,
-                                       y + offset_y)
-            and grid[x + offset_x, y + offset_y]['visited'] == False]
-
-
-def remove_wall_between(source, target, grid):
-    sx, sy = source
-    tx, ty = target
-
-    if sx == tx:
-        if sy > ty:
-            grid[source]['north'] = False
-            grid[target]['south'] = False
-        else:
-            grid[source]['south'] = False
-            grid[target]['north'] = False
-    elif sy == ty:
-        if sx > tx:
-            grid[source]['west'] = False
-            grid[target]['east'] = False
-        else:
-            grid[source]['east'] = False
-            grid[target]['west'] = False
+def generate_maze():
+    return backtracker(MAZE_ROWS, MAZE_COLS)
 
 
-def generate_maze():
-    grid = Grid(MAZE_ROWS, MAZE_COLS, value=default_cell)
-    stack = []
-    current_cell = random.choice(grid.coordinates)
-    grid[current_cell]['visited'] = True
-    stack.append(current_cell)
-
-    while stack:
-        ns = unvisited_neighbours(grid, current_cell)
-        if ns:
-            n = random.choice(ns)
-            remove_wall_between(current_cell, n, grid)
-            stack.append(current_cell)
-            current_cell = n
-            grid[current_cell]['visited'] = True
-        else:
-            current_cell = stack.pop()
-
-    return grid
+# There are only 16 combinations of walls, so each is drawn once and
+# then blitted for every cell that has it.
+maze_sprites = SpriteCache(draw_maze_cell)
 
 
 def draw_maze(surface, maze):
@@ -103,7 +51,7 @@ def draw_maze(surface, maze):
                 (SCREEN_W / 2) - (MAZE_W / 2),
                 (SCREEN_H / 2) - (MAZE_H / 2),
                 MAZE_W, MAZE_H,
-                render_cell=draw_maze_cell)
+                sprites=maze_sprites)
 
 # Demo setup
 
@@ -1,9 +1,8 @@
 import pygame
-import random
 
 from functools import partial
-from horton.grid import Grid
-from horton.render.pg import render_grid
+from horton.maze import prim, NORTH, EAST, SOUTH, WEST
+from horton.render.pg import SpriteCache, render_grid
 from pygame.locals import *
 
 
@@ -13,90 +12,27 @@ MAZE_W, MAZE_H = (400, 400)
 MAZE_ROWS, MAZE_COLS = (40, 40)
 MAZE_WALL_COLOUR = (0, 0, 0)
 FONT_COLOUR = (0, 0, 255)
-INTERIOR = 0
-FRONTIER = 1
-
-
-default_cell = {'north': True,
-                'south': True,
-                'east': True,
-                'west': True,
-                'set': None}
 
 
 def draw_maze_cell(surface, cell, x, y, width, height):
     draw_line = partial(pygame.draw.line, surface, MAZE_WALL_COLOUR)
-    if cell['north']:
+    if cell & NORTH:
         draw_line((x, y), (x + width, y), 2)
-    if cell['east']:
+    if cell & EAST:
         draw_line((x + width, y), (x + width, y + height), 2)
-    if cell['south']:
+    if cell & SOUTH:
         draw_line((x, y + height), (x + width + 1, y + height), 2)
-    if cell['west']:
+    if cell & WEST:
         draw_line((x, y), (x, y + height), 2)
 
 
-def is_interior(grid, x, y):
-     return (grid._is_valid_location(x, y) and
-             grid[x, y]['set'] == INTERIOR)
-
-
-def is_unvisited(grid, x, y):
-    return (grid._is_valid_location(x, y) and
-            grid[x, y]['set'] is None)
-
-
-def neighbours(grid, location, pred=lambda g, x, y: True):
-    x, y = location
-    offsets = [(0, -1), (1, 0),
-               (0, 1), (-1, 0)]
-    return [(x + offset_x, y + offset_y)
-            for offset_x, offset_y in offsets
-            if pred(grid, x + offset_x, y + offset_y)]
-
-
-def remove_wall_between(source, target, grid):
-    sx, sy = source
-    tx, ty = target
-
-    if sx == tx:
-        if sy > ty:
-            grid[source]['north'] = False
-            grid[target]['south'] = False
-        else:
-            grid[source]['south'] = False
-            grid[target]['north'] = False
-    elif sy == ty:
-        if sx > tx:
-            grid[source]['west'] = False
-            grid[target]['east'] = False
-        else:
-            grid[source]['east'] = False
-            grid[target]['west'] = False
+def generate_maze():
+    return prim(MAZE_ROWS, MAZE_COLS)
 
 
-def generate_maze():
-    grid = Grid(MAZE_ROWS, MAZE_COLS, default_cell)
-    frontier = []
-    start_cell = random.choice(grid.coordinates)
-    grid[start_cell]['set'] = INTERIOR
-    ns = neighbours(grid, start_cell, is_unvisited)
-    for n in ns:
-        grid[n]['set'] = FRONTIER
-    frontier.extend(ns)
-
-    while frontier:
-        frontier_cell = frontier.pop(random.randrange(len(frontier)))
-        interior_cell = random.choice(
-            neighbours(grid, frontier_cell, is_interior))
-        remove_wall_between(interior_cell, frontier_cell, grid)
-        grid[frontier_cell]['set'] = INTERIOR
-        new_frontier_cells = neighbours(grid, frontier_cell, is_unvisited)
-        for nfc in new_frontier_cells:
-            grid[nfc]['set'] = FRONTIER
-            frontier.append(nfc)
-
-    return grid
+# There are only 16 combinations of walls, so each is drawn once and
+# then blitted for every cell that has it.
+maze_sprites = SpriteCache(draw_maze_cell)
 
 
 def draw_maze(surface, maze):
@@ -105,7 +41,7 @@ def draw_maze(surface, maze):
                 (SCREEN_W / 2) - (MAZE_W / 2),
                 (SCREEN_H / 2) - (MAZE_H / 2),
                 MAZE_W, MAZE_H,
-                render_cell=draw_maze_cell)
+                sprites=maze_sprites)
 
 # Demo setup
 
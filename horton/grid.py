@@ -1,7 +1,144 @@
+import random
 import weakref
 
-from collections import Mapping
-from copy import copy, deepcopy
+from array import array
+from collections import namedtuple
+from collections.abc import Mapping
+from copy import deepcopy
+from functools import reduce
+from itertools import compress, count, repeat
+from math import log
+from operator import add, eq, ge, gt, le, lt, mul, ne, sub, truediv, xor
+
+from horton import backends
+
+
+def _rng(rng):
+    """ Return *rng* if it is a :py:class:`random.Random`, a new one
+    seeded with it otherwise, or the shared generator of the
+    :py:mod:`random` module if it is None.
+    """
+    if rng is None:
+        return random
+    if isinstance(rng, random.Random):
+        return rng
+    return random.Random(rng)
+
+
+Components = namedtuple("Components", "labels count sizes bounds")
+
+_OFFSETS = {4: ((0, -1), (1, 0), (0, 1), (-1, 0)),
+            8: ((0, -1), (1, -1), (1, 0), (1, 1),
+                (0, 1), (-1, 1), (-1, 0), (-1, -1))}
+
+
+def _find(parent, idx):
+    while parent[idx] != idx:
+        parent[idx] = parent[parent[idx]]
+        idx = parent[idx]
+    return idx
+
+
+def _union(parent, a, b):
+    a, b = _find(parent, a), _find(parent, b)
+    if a != b:
+        if a < b:
+            parent[b] = a
+        else:
+            parent[a] = b
+
+
+def _wrapped_extent(positions, size):
+    """ Return the first position and length of the shortest run, on a
+    circle of *size* positions, that covers all of *positions*.
+    """
+    positions = sorted(positions)
+    gap, start = size - positions[-1] + positions[0], positions[0]
+    for a, b in zip(positions, positions[1:]):
+        if b - a > gap:
+            gap, start = b - a, b
+    return start, size - gap + 1
+
+
+def _flood_fill(cells, width, height, x, y, value, diagonal, wraps):
+    """ Fill the flat *cells* around *x*, *y* and return the number of
+    cells filled."""
+    target = cells[y * width + x]
+    if target == value:
+        return 0
+    filled = 0
+    reach = 1 if diagonal else 0
+    stack = [(x, y)]
+    while stack:
+        x, y = stack.pop()
+        row = y * width
+        if cells[row + x] != target:
+            continue
+        left = right = x
+        while (right - left + 1 < width and (left > 0 or wraps) and
+               cells[row + (left - 1) % width] == target):
+            left -= 1
+        while (right - left + 1 < width and (right < width - 1 or wraps) and
+               cells[row + (right + 1) % width] == target):
+            right += 1
+        for n in range(left, right + 1):
+            cells[row + n % width] = value
+        filled += right - left + 1
+
+        first, last = left - reach, right + reach
+        if not wraps:
+            first, last = max(first, 0), min(last, width - 1)
+        for ny in (y - 1, y + 1):
+            if wraps:
+                ny %= height
+            elif not 0 <= ny < height:
+                continue
+            above = ny * width
+            in_run = False
+            for n in range(first, last + 1):
+                if cells[above + n % width] == target:
+                    if not in_run:
+                        stack.append((n % width, ny))
+                        in_run = True
+                else:
+                    in_run = False
+    return filled
+
+
+def _content_hash(values, start=0):
+    """ Return the XOR of the hashes of every flat index, counted from
+    *start*, and value."""
+    return reduce(xor, map(hash, enumerate(values, start)), 0)
+
+
+def _changed_runs(ours, theirs, offset=0):
+    """ Return the runs of cells where *theirs* differs from *ours*, as
+    pairs of the flat index of the first cell, counted from *offset*,
+    and a list of the new values.
+    """
+    changed = compress(count(), map(ne, ours, theirs))
+    runs = []
+    start = end = None
+    for idx in changed:
+        if idx != end:
+            if start is not None:
+                runs.append((start + offset, list(theirs[start:end])))
+            start = idx
+        end = idx + 1
+    if start is not None:
+        runs.append((start + offset, list(theirs[start:end])))
+    return runs
+
+
+def _like(storage, values):
+    """ Return *values* in a form that can be assigned to a slice of
+    *storage*.
+    """
+    if isinstance(storage, array):
+        return array(storage.typecode, values)
+    if isinstance(storage, memoryview):
+        return array(storage.format, values)
+    return values
 
 
 class GridSliceProxy(object):
@@ -37,10 +174,14 @@ class Grid(Mapping):
     representing co-ordinates in the Grid.
     """
 
+    wraps = False
+    _watchers = ()
+    _hash = None
+
     def __init__(self, width, height, value=0):
         self.width = width
         self.height = height
-        self._grid = [copy(value) for _ in range(width * height)]
+        self._grid = backends.op('fill')(width * height, value)
         self._coordinates = None
 
     @classmethod
@@ -49,7 +190,7 @@ class Grid(Mapping):
         Return a new Grid as a copy of *other*.
         """
         g = cls(other.width, other.height)
-        g._grid = deepcopy(other._grid)
+        g._grid = backends.op('copy')(other._grid)
         return g
 
     @classmethod
@@ -62,6 +203,17 @@ class Grid(Mapping):
         g._grid = a
         return g
 
+    @classmethod
+    def typed(cls, width, height, typecode, value=0):
+        """ Create a Grid whose values are stored in an array of the
+        given *typecode*.
+
+        See the :py:mod:`array` module for the available typecodes.
+        """
+        return cls.from_array(width, height,
+                              array(typecode, [value]) * (width * height),
+                              copy=False)
+
     @staticmethod
     def pprint(grid):
         """ Pretty print a Grid object."""
@@ -78,14 +230,49 @@ class Grid(Mapping):
     def coordinates(self):
         """ Return the list of coordinates.
 
-        *This value is cached internally after the initial call*.
+        *A new list is built on every call unless it is cached with*
+        :py:meth:`Grid.cache_coordinates`. *Loop over*
+        :py:meth:`Grid.iter_coordinates` *instead to avoid holding one
+        tuple for every cell.*
         """
-        if self._coordinates:
-            return self._coordinates
-        else:
-            self._coordinates = [(x, y) for y in range(self.height)
-                                 for x in range(self.width)]
+        if self._coordinates is not None:
             return self._coordinates
+        return list(self.iter_coordinates())
+
+    def cache_coordinates(self, enabled=True):
+        """ Keep the list of coordinates for as long as the grid
+        lives, or release it if *enabled* is false.
+        """
+        if not enabled:
+            self._coordinates = None
+        elif self._coordinates is None:
+            self._coordinates = list(self.iter_coordinates())
+
+    def iter_coordinates(self):
+        """ Yield successive co-ordinates in row-major order.
+
+        >>> list(Grid(2, 2).iter_coordinates())
+        [(0, 0), (1, 0), (0, 1), (1, 1)]
+        """
+        xs = range(self.width)
+        for y in range(self.height):
+            for x in xs:
+                yield (x, y)
+
+    def iter_indices(self, predicate=None):
+        """ Return an iterator over the flat, row-major indices of the
+        cells.
+
+        *With a predicate, only yield the indices of the values for
+        which it is true.*
+
+        >>> g = Grid.from_array(3, 1, [0, 1, 1])
+        >>> list(g.iter_indices(bool))
+        [1, 2]
+        """
+        if predicate is None:
+            return iter(range(len(self)))
+        return compress(count(), map(predicate, iter(self)))
 
     @property
     def values(self):
@@ -94,12 +281,84 @@ class Grid(Mapping):
 
     def items(self):
         """ Return a list of co-ordinate, value pairs."""
-        return zip(self.coordinates, self.values)
+        return list(self.iter_items())
 
     def iter_items(self):
-        """ Yield successive co-ordinate, value pairs."""
-        for coordinate in self.coordinates:
-            yield (coordinate, self.__getitem__(coordinate))
+        """ Return an iterator over successive co-ordinate, value
+        pairs."""
+        return zip(self.iter_coordinates(), iter(self))
+
+    def iter_row_chunks(self, rows=64):
+        """ Yield the values of *rows* rows at a time.
+
+        Each chunk is a pair of the first row and a flat sequence of
+        the values of that row and the ones below it. The last chunk
+        may hold fewer rows.
+
+        >>> g = Grid.from_array(2, 3, [1, 2,
+        ...                            3, 4,
+        ...                            5, 6])
+        >>> [(y, list(values)) for y, values in g.iter_row_chunks(2)]
+        [(0, [1, 2, 3, 4]), (2, [5, 6])]
+        """
+        if rows < 1:
+            raise ValueError("A chunk must hold at least one row")
+        width = self.width
+        for y in range(0, self.height, rows):
+            yield y, self._grid[y * width:(y + rows) * width]
+
+    def diff(self, other):
+        """ Return the changes needed to turn this grid into *other*.
+
+        The changeset is a list of runs. Each run is a tuple of the
+        flat index of the first changed cell and a list of the new
+        values of the consecutive cells that follow it.
+
+        >>> a = Grid(3, 1)
+        >>> b = Grid.from_array(3, 1, [0, 1, 1])
+        >>> a.diff(b)
+        [(1, [1, 1])]
+        """
+        self._check_comparable(other)
+        return _changed_runs(self._grid, other._grid)
+
+    def _check_comparable(self, other):
+        if not isinstance(other, Grid):
+            raise TypeError("Can only compare a Grid with another Grid")
+        if self.dimensions != other.dimensions:
+            raise ValueError("The grids have different dimensions")
+
+    def apply_patch(self, patch):
+        """ Apply a changeset produced by :py:meth:`Grid.diff`."""
+        size = len(self._grid)
+        for start, values in patch:
+            end = start + len(values)
+            if start < 0 or end > size:
+                raise KeyError("Patch run at {0} is outside the grid".format(
+                    start))
+            self._grid[start:end] = _like(self._grid, values)
+        self._notify(None, None)
+
+    def watch(self, callback):
+        """ Call *callback* with the co-ordinate of every cell that is
+        set from now on.
+
+        Operations that replace many cells at once call it with
+        ``(None, None)`` instead.
+        """
+        if not self._watchers:
+            self._watchers = []
+        self._watchers.append(callback)
+
+    def unwatch(self, callback):
+        """ Stop calling a *callback* added with :py:meth:`Grid.watch`."""
+        self._watchers.remove(callback)
+
+    def _notify(self, x, y):
+        if x is None:
+            self._hash = None
+        for callback in self._watchers:
+            callback(x, y)
 
     def get(self, x, y, default=None):
         """ Return a value at *x*, *y*.
@@ -126,35 +385,513 @@ class Grid(Mapping):
         """ Return True if equal to *other*.
 
         Two grids are considered equal if every value in the grids are
-        equal.
+        equal. Grids whose hashes are already known and differ are
+        unequal without comparing their values. A grid is never equal
+        to anything but another grid.
         """
-        assert isinstance(other, Grid)
-        return self._grid == other._grid
+        if not isinstance(other, Grid):
+            return NotImplemented
+        if other is self:
+            return True
+        if (self._hash is not None and other._hash is not None and
+                self._hash != other._hash):
+            return False
+        return self._same_values(other)
+
+    def _same_values(self, other):
+        """ Return True if every value equals the matching value of
+        *other*."""
+        ours, theirs = self._grid, other._grid
+        if type(ours) is not type(theirs):
+            return (len(ours) == len(theirs) and
+                    all(map(eq, ours, theirs)))
+        return ours == theirs
+
+    def __hash__(self):
+        """ Return a hash of the values in the grid.
+
+        The hash combines a hash of the index and value of every cell
+        with XOR, as Zobrist hashing does for board games. Once it has
+        been computed, setting a cell updates it from the old and new
+        values of just that cell, while operations that replace many
+        cells at once leave it to be computed again when next asked
+        for. Grids that are equal have equal hashes, so grids can key
+        caches of results, but a grid must not change while it is a key
+        of a dict or a member of a set.
+
+        >>> a = Grid.from_array(2, 1, [0, 1])
+        >>> b = Grid(2, 1)
+        >>> b[1, 0] = 1
+        >>> hash(a) == hash(b)
+        True
+        """
+        h = self._hash
+        if h is None:
+            h = self._hash = _content_hash(self)
+        return h
+
+    def _rehash(self, idx, old, new):
+        """ Update a known hash after the cell at flat index *idx*
+        changes from *old* to *new*."""
+        self._hash ^= hash((idx, old)) ^ hash((idx, new))
+
+    def _assign(self, storage, offset, idx, value):
+        """ Store *value* at *offset* of *storage*, which holds the
+        cell at flat index *idx*, keeping a known hash up to date.
+        """
+        if self._hash is None:
+            storage[offset] = value
+        else:
+            old = storage[offset]
+            storage[offset] = value
+            self._rehash(idx, old, storage[offset])
+
+    def _combine(self, other, op, reflected=False):
+        """ Return the list of *op* applied to each value and the
+        matching value of *other*, or to *other* itself if it is not a
+        Grid.
+
+        With *reflected* the arguments of *op* are swapped.
+        """
+        if isinstance(other, Grid):
+            assert self.dimensions == other.dimensions
+            other = other._grid
+        return backends.op('combine')(self._grid, other, op, reflected)
+
+    def _from_values(self, values):
+        """ Return a new grid of the same type and options holding
+        *values*."""
+        return self.__class__.from_array(self.width, self.height, values,
+                                         copy=False, **self._options())
+
+    def _options(self):
+        """ Return the keyword arguments, beyond the dimensions and the
+        values, that :py:meth:`Grid.from_array` needs to rebuild a grid
+        like this one.
+        """
+        return {}
+
+    def _row_masks(self, mask):
+        """ Return the masks to count the neighbourhood *mask* with, one
+        for each row in turn.
+
+        Every row of a Grid is alike, so the mask is used as it is.
+        """
+        return [mask]
+
+    def convolve(self, kernel, boundary=None):
+        """ Return a new grid of the weighted sums of each cell's
+        neighbourhood.
+
+        *kernel* is a Grid or a list of rows with odd dimensions whose
+        centre lines up with each cell. It is applied as given, without
+        flipping. *boundary* decides what lies beyond the edges:
+        ``'zero'``, ``'clamp'`` to the nearest edge cell or ``'wrap'``
+        around. It defaults to ``'wrap'`` for a Torus and ``'zero'``
+        otherwise.
+
+        Kernels whose rows are all multiples of one row are applied as
+        two one-dimensional passes.
+
+        >>> g = Grid.from_array(3, 3, [0, 0, 0,
+        ...                            0, 1, 0,
+        ...                            0, 0, 0])
+        >>> Grid.pprint(g.convolve([[0, 1, 0],
+        ...                         [1, 2, 1],
+        ...                         [0, 1, 0]]))
+        0 1 0
+        1 2 1
+        0 1 0
+        """
+        if isinstance(kernel, Grid):
+            kernel = [[kernel[x, y] for x in range(kernel.width)]
+                      for y in range(kernel.height)]
+        else:
+            kernel = [list(row) for row in kernel]
+        kheight = len(kernel)
+        kwidth = len(kernel[0]) if kernel else 0
+        if (kheight % 2 == 0 or kwidth % 2 == 0 or
+                any(len(row) != kwidth for row in kernel)):
+            raise ValueError("A kernel must be a rectangle of odd "
+                             "dimensions")
+        if boundary is None:
+            boundary = 'wrap' if self.wraps else 'zero'
+        if boundary not in ('zero', 'clamp', 'wrap'):
+            raise ValueError("Unknown boundary: %r" % boundary)
+
+        return self._from_values(backends.op('convolve')(
+            self._grid, self.width, self.height, kernel, boundary))
+
+    def label_components(self, predicate=None, connectivity=4):
+        """ Label the connected regions of cells for which *predicate*
+        is true.
+
+        Without a predicate, cells that are true are labelled. Cells
+        connect to the 4 cells beside them or, with a *connectivity*
+        of 8, also to the cells diagonal to them. On a Torus, regions
+        connect across the edges.
+
+        Return a :py:class:`Components` tuple of:
+
+        - *labels*: a grid of integers, 0 for unlabelled cells and
+          from 1 to *count* for the cells of each region.
+        - *count*: the number of regions.
+        - *sizes*: the number of cells in each region, indexed by
+          label. ``sizes[0]`` is the number of unlabelled cells.
+        - *bounds*: the (x1, y1, x2, y2) corners of the bounding box
+          of each region, indexed by label. ``bounds[0]`` is None. The
+          box of a region that wraps around a Torus extends past its
+          edge, like a wrapped Torus slice.
+
+        >>> g = Grid.from_array(4, 3, [1, 1, 0, 0,
+        ...                            0, 0, 0, 1,
+        ...                            1, 0, 1, 1])
+        >>> components = g.label_components()
+        >>> Grid.pprint(components.labels)
+        1 1 0 0
+        0 0 0 2
+        3 0 2 2
+        >>> components.sizes
+        [6, 2, 3, 1]
+        >>> components.bounds[2]
+        (2, 1, 3, 2)
+        """
+        if connectivity not in _OFFSETS:
+            raise ValueError("Connectivity must be 4 or 8")
+        width, height = self.width, self.height
+        size = width * height
+        values = self._grid
+        if predicate is None:
+            mask = bytearray(1 if v else 0 for v in values)
+        else:
+            mask = bytearray(1 if v else 0 for v in map(predicate, values))
+
+        # Connect each cell to the neighbours that come before it in
+        # row-major order, then, on a Torus, across the edges.
+        parent = array('l', range(size))
+        backward = ((-1, 0), (0, -1), (-1, -1), (1, -1))
+        backward = backward[:2] if connectivity == 4 else backward
+        for idx in compress(range(size), mask):
+            x, y = idx % width, idx // width
+            for dx, dy in backward:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and ny >= 0:
+                    n = ny * width + nx
+                    if mask[n]:
+                        _union(parent, idx, n)
+        if self.wraps:
+            border = set((x, y) for x in range(width) for y in (0, height - 1))
+            border.update((x, y) for x in (0, width - 1) for y in range(height))
+            for x, y in border:
+                if not mask[y * width + x]:
+                    continue
+                for dx, dy in _OFFSETS[connectivity]:
+                    nx, ny = (x + dx) % width, (y + dy) % height
+                    if mask[ny * width + nx]:
+                        _union(parent, y * width + x, ny * width + nx)
+
+        labels = array('l', [0]) * size
+        roots = {}
+        sizes = [size]
+        xs, ys = [None], [None]
+        for idx in compress(range(size), mask):
+            root = _find(parent, idx)
+            label = roots.get(root)
+            if label is None:
+                label = roots[root] = len(sizes)
+                sizes.append(0)
+                xs.append(set())
+                ys.append(set())
+            labels[idx] = label
+            sizes[label] += 1
+            sizes[0] -= 1
+            xs[label].add(idx % width)
+            ys[label].add(idx // width)
+
+        bounds = [None]
+        for label in range(1, len(sizes)):
+            if self.wraps:
+                x1, w = _wrapped_extent(xs[label], width)
+                y1, h = _wrapped_extent(ys[label], height)
+                bounds.append((x1, y1, x1 + w - 1, y1 + h - 1))
+            else:
+                bounds.append((min(xs[label]), min(ys[label]),
+                               max(xs[label]), max(ys[label])))
+
+        cls = Torus if self.wraps else Grid
+        return Components(cls.from_array(width, height, labels, copy=False),
+                          len(sizes) - 1, sizes, bounds)
+
+    def flood_fill(self, start, value, connectivity=4):
+        """ Set the region of equal, connected cells around *start* to
+        *value*.
+
+        The region is filled one horizontal run of cells at a time,
+        without recursion. On a Torus it spreads across the edges.
+        Return the number of cells filled.
+
+        >>> g = Grid.from_array(3, 3, [0, 1, 0,
+        ...                            0, 1, 0,
+        ...                            0, 0, 1])
+        >>> g.flood_fill((0, 0), 2)
+        4
+        >>> Grid.pprint(g)
+        2 1 0
+        2 1 0
+        2 2 1
+        """
+        if connectivity not in _OFFSETS:
+            raise ValueError("Connectivity must be 4 or 8")
+        x, y = start
+        if self.wraps:
+            x, y = x % self.width, y % self.height
+        elif not self._is_valid_location(x, y):
+            raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                x, y))
+        filled = _flood_fill(self._grid, self.width, self.height, x, y,
+                             value, connectivity == 8, self.wraps)
+        if filled:
+            self._notify(None, None)
+        return filled
+
+    def _store(self, values):
+        """ Replace every value in the grid with *values*."""
+        self._grid[:] = _like(self._grid, values)
+        self._notify(None, None)
+
+    def fill(self, value):
+        """ Set every cell to *value*.
+
+        >>> g = Grid(3, 1)
+        >>> g.fill(7)
+        >>> Grid.pprint(g)
+        7 7 7
+        """
+        self._store(backends.op('fill')(len(self), value))
+
+    def randomize(self, p=0.5, rng=None):
+        """ Set each cell to 1 with probability *p* and to 0 otherwise.
+
+        Random numbers are only drawn for the cells that get the less
+        likely value, by skipping a geometrically distributed number
+        of cells between them, so sparse soups are quick to seed.
+        *rng* is a :py:class:`random.Random` or a seed for a new one.
+
+        >>> g = Grid(100, 100)
+        >>> g.randomize(0.25, rng=1)
+        >>> g.count()
+        2487
+        """
+        if not 0 <= p <= 1:
+            raise ValueError("p must be between 0 and 1")
+        rng = _rng(rng)
+        if p <= 0.5:
+            rare, common, q = 1, 0, p
+        else:
+            rare, common, q = 0, 1, 1 - p
+        size = len(self)
+        values = backends.op('fill')(size, common)
+        if q:
+            scale = 1.0 / log(1.0 - q)
+            idx = int(log(1.0 - rng.random()) * scale)
+            while idx < size:
+                values[idx] = rare
+                idx += 1 + int(log(1.0 - rng.random()) * scale)
+        self._store(values)
+
+    def random_coordinate(self, rng=None):
+        """ Return the co-ordinate of a cell chosen at random.
+
+        *rng* is a :py:class:`random.Random` or a seed for a new one.
+        """
+        idx = _rng(rng).randrange(len(self))
+        return (idx % self.width, idx // self.width)
+
+    def sample(self, k, predicate=None, rng=None):
+        """ Return *k* distinct co-ordinates chosen at random.
+
+        With a *predicate*, only cells whose value it accepts are
+        chosen. Cells are drawn and tested one at a time, and all the
+        accepted cells are only gathered if they turn out to be too
+        rare to find that way. Raise ValueError if fewer than *k* cells
+        are accepted.
+
+        >>> g = Grid.from_array(3, 2, [0, 1, 0,
+        ...                            1, 0, 0])
+        >>> sorted(g.sample(2, predicate=bool, rng=1))
+        [(0, 1), (1, 0)]
+        """
+        rng = _rng(rng)
+        size = len(self)
+        width = self.width
+        if k < 0:
+            raise ValueError("Sample size must not be negative")
+        if predicate is None:
+            if k > size:
+                raise ValueError("Sample larger than the grid")
+            indices = rng.sample(range(size), k)
+        else:
+            indices = []
+            tried = set()
+            cell = self.__get_coordinate__
+            for _ in range(4 * k + 16):
+                if len(indices) == k:
+                    break
+                idx = rng.randrange(size)
+                if idx in tried:
+                    continue
+                tried.add(idx)
+                if predicate(cell(idx % width, idx // width)):
+                    indices.append(idx)
+            if len(indices) < k:
+                accepted = list(compress(range(size),
+                                         map(predicate, self._grid)))
+                if k > len(accepted):
+                    raise ValueError("Sample larger than the accepted cells")
+                indices = rng.sample(accepted, k)
+        return [(idx % width, idx // width) for idx in indices]
 
     def __add__(self, other):
         """ Return a grid whose values are comprised by adding the
         values of two grids together.
+
+        *other* may also be a single value which is added to every
+        cell.
         """
-        assert isinstance(other, Grid)
-        assert self.dimensions == other.dimensions
+        return self._from_values(self._combine(other, add))
 
-        g = Grid(*self.dimensions)
-        for idx, val in enumerate(self._grid):
-            g._grid[idx] = val + other._grid[idx]
+    def __radd__(self, other):
+        return self._from_values(self._combine(other, add, reflected=True))
 
-        return g
+    def __iadd__(self, other):
+        self._store(self._combine(other, add))
+        return self
 
     def __sub__(self, other):
         """ Return a grid whose values are comprised by subtracting
         the values from one by the other."""
-        assert isinstance(other, Grid)
-        assert self.dimensions == other.dimensions
+        return self._from_values(self._combine(other, sub))
 
-        g = Grid(*self.dimensions)
-        for idx, val in enumerate(self._grid):
-            g._grid[idx] = val - other._grid[idx]
+    def __rsub__(self, other):
+        return self._from_values(self._combine(other, sub, reflected=True))
 
-        return g
+    def __isub__(self, other):
+        self._store(self._combine(other, sub))
+        return self
+
+    def __mul__(self, other):
+        """ Return a grid whose values are the product of the values
+        of two grids or of each value and a scalar."""
+        return self._from_values(self._combine(other, mul))
+
+    def __rmul__(self, other):
+        return self._from_values(self._combine(other, mul, reflected=True))
+
+    def __imul__(self, other):
+        self._store(self._combine(other, mul))
+        return self
+
+    def __truediv__(self, other):
+        """ Return a grid whose values are the quotient of the values
+        of two grids or of each value and a scalar."""
+        return self._from_values(self._combine(other, truediv))
+
+    def __rtruediv__(self, other):
+        return self._from_values(self._combine(other, truediv, reflected=True))
+
+    def __itruediv__(self, other):
+        self._store(self._combine(other, truediv))
+        return self
+
+    def __lt__(self, other):
+        """ Return a grid of booleans, True where a value is less than
+        *other*."""
+        return self._from_values(self._combine(other, lt))
+
+    def __le__(self, other):
+        """ Return a grid of booleans, True where a value is less than
+        or equal to *other*."""
+        return self._from_values(self._combine(other, le))
+
+    def __gt__(self, other):
+        """ Return a grid of booleans, True where a value is greater
+        than *other*."""
+        return self._from_values(self._combine(other, gt))
+
+    def __ge__(self, other):
+        """ Return a grid of booleans, True where a value is greater
+        than or equal to *other*."""
+        return self._from_values(self._combine(other, ge))
+
+    def eq(self, other):
+        """ Return a grid of booleans, True where a value is equal to
+        *other*.
+
+        *Unlike* ``==`` *this compares cell by cell.*
+        """
+        return self._from_values(self._combine(other, eq))
+
+    def ne(self, other):
+        """ Return a grid of booleans, True where a value is not equal
+        to *other*."""
+        return self._from_values(self._combine(other, ne))
+
+    def mask(self, predicate):
+        """ Return a grid of booleans, True where *predicate* is true
+        for a value."""
+        return self._from_values([bool(v) for v in map(predicate, self._grid)])
+
+    def where(self, mask, other):
+        """ Return a grid holding this grid's values where *mask* is
+        true and the values of *other* elsewhere.
+
+        *other* may be a Grid or a single value.
+
+        >>> g = Grid.from_array(3, 1, [1, 5, 9])
+        >>> Grid.pprint(g.where(g > 4, 0))
+        0 5 9
+        """
+        assert self.dimensions == mask.dimensions
+        if isinstance(other, Grid):
+            assert self.dimensions == other.dimensions
+            others = other._grid
+        else:
+            others = repeat(other, len(self))
+        return self._from_values([v if m else o for v, m, o in
+                                  zip(self._grid, mask._grid, others)])
+
+    def sum(self):
+        """ Return the sum of the values."""
+        return sum(self._grid)
+
+    def count(self, predicate=None):
+        """ Return the number of values for which *predicate* is true.
+
+        *Without a predicate, count the values that are true.*
+        """
+        if predicate is None:
+            return sum(1 for v in self._grid if v)
+        return sum(1 for v in map(predicate, self._grid) if v)
+
+    def min(self):
+        """ Return the smallest value."""
+        return min(self._grid)
+
+    def max(self):
+        """ Return the largest value."""
+        return max(self._grid)
+
+    def argmin(self):
+        """ Return the co-ordinate of the first smallest value."""
+        values = self._grid
+        idx = min(range(len(values)), key=values.__getitem__)
+        return (idx % self.width, idx // self.width)
+
+    def argmax(self):
+        """ Return the co-ordinate of the first largest value."""
+        values = self._grid
+        idx = max(range(len(values)), key=values.__getitem__)
+        return (idx % self.width, idx // self.width)
 
     def __iter__(self):
         """ Return an iterator over the values."""
@@ -208,11 +945,14 @@ class Grid(Mapping):
             raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
                 *args[0]))
         x, y = args[0]
+        idx = y * self.width + x
         try:
-            self._grid[y * self.width + x] = args[1]
+            self._assign(self._grid, idx, idx, args[1])
         except IndexError:
             raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
                 *args[0]))
+        if self._watchers:
+            self._notify(x, y)
 
 
 class Torus(Grid):
@@ -220,25 +960,81 @@ class Torus(Grid):
     A Grid whose edges are connected.
     """
 
+    wraps = True
+
+    def shift(self, dx, dy):
+        """ Return a new Torus with every value moved by *dx*, *dy*.
+
+        Values that move past an edge re-enter from the opposite one.
+
+        >>> t = Torus.from_array(3, 2, [1, 2, 3,
+        ...                             4, 5, 6])
+        >>> Grid.pprint(t.shift(1, 1))
+        6 4 5
+        3 1 2
+        """
+        width, height = self.width, self.height
+        dx %= width
+        cells = self._grid
+        values = []
+        for y in range(height):
+            start = ((y - dy) % height) * width
+            row = cells[start:start + width]
+            values.extend(row[width - dx:])
+            values.extend(row[:width - dx])
+        return self._from_values(values)
+
+    def __init__(self, width, height, value=0):
+        super(Torus, self).__init__(width, height, value)
+        # Wrapped column indexes and row offsets for co-ordinates from
+        # -width to 2 * width - 1 and -height to 2 * height - 1, as
+        # negative indexes count back from the end of the tables.
+        self._columns = list(range(width)) * 2
+        self._rows = list(range(0, width * height, width)) * 2
+
     def __getitem__(self, *args):
         """ Return an item from the grid.
 
-        *The first argument is an (x, y) tuple.*
+        *The first argument is an (x, y) tuple.* Co-ordinates outside
+        the grid wrap around to the opposite edge. Slices may also
+        extend past the edges.
         """
-        x = args[0][0] % self.width
-        y = args[0][1] % self.height
+        x, y = args[0]
+        if isinstance(x, slice):
+            return Grid.__getitem__(self, *args)
+        try:
+            return self._grid[self._rows[y] + self._columns[x]]
+        except IndexError:
+            return self._grid[(y % self.height) * self.width
+                              + x % self.width]
 
-        return self._grid[y * self.height + x]
+    def __get_coordinate__(self, x, y):
+        try:
+            return self._grid[self._rows[y] + self._columns[x]]
+        except IndexError:
+            return self._grid[(y % self.height) * self.width
+                              + x % self.width]
+
+    def __get_slice__(self, topleft, bottomright):
+        if topleft > bottomright:
+            raise ValueError("The first slice should be the top-left "
+                             "coordinate of the sub-grid")
+        return GridSliceProxy(self, topleft, bottomright)
 
     def __setitem__(self, *args):
         """ Set an item in the grid to a value.
 
         *The first argument is an (x, y) tuple and the second is a
         value.*"""
-        x = args[0][0] % self.width
-        y = args[0][1] % self.height
-
-        self._grid[y * self.height + x] = args[1]
+        x, y = args[0]
+        try:
+            x, row = self._columns[x], self._rows[y]
+        except IndexError:
+            x, row = x % self.width, (y % self.height) * self.width
+        idx = row + x
+        self._assign(self._grid, idx, idx, args[1])
+        if self._watchers:
+            self._notify(x, row // self.width)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,238 @@
+"""
+Grids of hexagonal cells.
+
+A :py:class:`HexGrid` keeps its cells in the same flat, row-major
+storage as a :py:class:`horton.grid.Grid`, so everything that works on
+the values of a Grid works on it too. What changes is which cells are
+neighbours. Each cell has six, found in a table built once per grid,
+and the stepper in :py:mod:`horton.conway`, the searches in
+:py:mod:`horton.path` and the renderer in :py:mod:`horton.render.pg`
+all use them.
+
+Cells are pointy-topped. Storage co-ordinates ``(x, y)`` are columns
+and rows, and their meaning depends on the *layout*:
+
+- ``'axial'``: *x* and *y* are the axial co-ordinates *q* and *r*, and
+  the grid is a parallelogram leaning to the right.
+- ``'odd-r'``: the grid is a rectangle whose odd rows are shifted
+  half a cell to the right.
+- ``'even-r'``: the grid is a rectangle whose even rows are shifted
+  half a cell to the right.
+"""
+from array import array
+from copy import deepcopy
+
+from horton import conway
+from horton.grid import Grid, Torus
+
+
+LAYOUTS = ('axial', 'odd-r', 'even-r')
+
+# The axial offsets of the six neighbours, from east round to
+# south-east.
+DIRECTIONS = ((1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1))
+
+
+class HexGrid(Grid):
+    """
+    A Grid of hexagonal cells.
+
+    >>> g = HexGrid(4, 3, layout='odd-r')
+    >>> sorted(g.neighbours(1, 1))
+    [(0, 1), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2)]
+    >>> g.distance((0, 0), (3, 2))
+    4
+    """
+
+    # The Game of Life usually played on hexagons, B2/S34.
+    life_rule = conway.Rule(birth={2}, survival={3, 4},
+                            neighbourhood=conway.neighbourhood(1, 'hex'))
+
+    def __init__(self, width, height, value=0, layout='axial'):
+        if layout not in LAYOUTS:
+            raise ValueError("Unknown layout: %r" % layout)
+        if self.wraps and layout != 'axial' and height % 2:
+            raise ValueError("A wrapping {0} grid needs an even number of "
+                             "rows".format(layout))
+        super(HexGrid, self).__init__(width, height, value)
+        self.layout = layout
+        self._table = None
+
+    @classmethod
+    def copy(cls, other):
+        """
+        Return a new HexGrid as a copy of *other*, in the same layout
+        if it is a HexGrid.
+        """
+        return cls.from_array(other.width, other.height, other._grid,
+                              layout=getattr(other, 'layout', 'axial'))
+
+    @classmethod
+    def from_array(cls, width, height, arr, copy=True, layout='axial'):
+        """ Create a HexGrid in *layout* from an array."""
+        assert len(arr) == width * height, ("Array dimensions do not "
+                                            "match length of array.")
+        g = cls(width, height, layout=layout)
+        g._grid = deepcopy(arr) if copy else arr
+        return g
+
+    @classmethod
+    def typed(cls, width, height, typecode, value=0, layout='axial'):
+        """ Create a HexGrid in *layout* whose values are stored in an
+        array of the given *typecode*.
+        """
+        return cls.from_array(width, height,
+                              array(typecode, [value]) * (width * height),
+                              copy=False, layout=layout)
+
+    def _options(self):
+        return {'layout': self.layout}
+
+    def to_axial(self, x, y):
+        """ Return the axial co-ordinates of the cell at *x*, *y*."""
+        if self.layout == 'odd-r':
+            return (x - (y - (y & 1)) // 2, y)
+        if self.layout == 'even-r':
+            return (x - (y + (y & 1)) // 2, y)
+        return (x, y)
+
+    def from_axial(self, q, r):
+        """ Return the storage co-ordinates of the cell at axial *q*,
+        *r*."""
+        if self.layout == 'odd-r':
+            return (q + (r - (r & 1)) // 2, r)
+        if self.layout == 'even-r':
+            return (q + (r + (r & 1)) // 2, r)
+        return (q, r)
+
+    def _offset(self, dq, dr, parity):
+        """ Return the storage offset of the cell *dq*, *dr* away in
+        axial co-ordinates from a cell in a row of *parity*."""
+        if self.layout == 'odd-r':
+            return (dq + (dr + parity - ((parity + dr) & 1)) // 2, dr)
+        if self.layout == 'even-r':
+            return (dq + (dr + ((parity + dr) & 1) - parity) // 2, dr)
+        return (dq, dr)
+
+    def _row_masks(self, mask):
+        """ Return the storage masks that cover the axial neighbourhood
+        *mask*, one for each row parity of an offset layout."""
+        if self.layout == 'axial':
+            return [mask]
+        ry, rx = len(mask) // 2, len(mask[0]) // 2
+        masks = []
+        for parity in (0, 1):
+            taps = [(self._offset(kx - rx, ky - ry, parity), weight)
+                    for ky, row in enumerate(mask)
+                    for kx, weight in enumerate(row) if weight]
+            reach = max([abs(dx) for (dx, _), _ in taps] + [0])
+            shifted = [[0] * (2 * reach + 1) for _ in range(2 * ry + 1)]
+            for (dx, dy), weight in taps:
+                shifted[dy + ry][dx + reach] = weight
+            masks.append(shifted)
+        return masks
+
+    def neighbour_table(self):
+        """ Return the flat indices of the six neighbours of every
+        cell, as an array of ``6 * len(grid)`` indices.
+
+        The neighbours of the cell at flat index *i* are at
+        ``6 * i`` up to ``6 * i + 5``, in the order of
+        :py:data:`DIRECTIONS`, with -1 for a neighbour off the edge of a
+        grid that does not wrap. The table is built once and kept.
+        """
+        if self._table is not None:
+            return self._table
+        width, height, wraps = self.width, self.height, self.wraps
+        offsets = [[self._offset(dq, dr, parity) for dq, dr in DIRECTIONS]
+                   for parity in (0, 1)]
+        table = array('l')
+        for y in range(height):
+            row_offsets = offsets[y & 1]
+            for x in range(width):
+                for dx, dy in row_offsets:
+                    nx, ny = x + dx, y + dy
+                    if wraps:
+                        nx, ny = nx % width, ny % height
+                    elif not (0 <= nx < width and 0 <= ny < height):
+                        table.append(-1)
+                        continue
+                    table.append(ny * width + nx)
+        self._table = table
+        return table
+
+    def neighbours(self, x, y):
+        """ Return the co-ordinates of the neighbours of *x*, *y*."""
+        if self.wraps:
+            x, y = x % self.width, y % self.height
+        elif not self._is_valid_location(x, y):
+            raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                x, y))
+        width = self.width
+        idx = 6 * (y * width + x)
+        return [(n % width, n // width)
+                for n in self.neighbour_table()[idx:idx + 6] if n >= 0]
+
+    def _periods(self):
+        """ Return the axial offsets that a wrapping grid repeats
+        after."""
+        if self.layout == 'axial':
+            return (self.width, 0), (0, self.height)
+        return (self.width, 0), (-(self.height // 2), self.height)
+
+    def distance(self, a, b):
+        """ Return the number of steps between the cells at *a* and
+        *b*, across the edges of a wrapping grid."""
+        q1, r1 = self.to_axial(*a)
+        q2, r2 = self.to_axial(*b)
+        dq, dr = q2 - q1, r2 - r1
+        if not self.wraps:
+            return (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+        (aq, ar), (bq, br) = self._periods()
+        best = None
+        for i in range(-2, 3):
+            for j in range(-2, 3):
+                q, r = dq + i * aq + j * bq, dr + i * ar + j * br
+                d = (abs(q) + abs(r) + abs(q + r)) // 2
+                if best is None or d < best:
+                    best = d
+        return best
+
+    def hex_position(self, x, y):
+        """ Return the top-left corner of the box around the cell at
+        *x*, *y*, in units of the box's width and height.
+
+        Rows overlap by a quarter of a box, where the points of the
+        hexagons in one row fit between those of the next.
+        """
+        if self.layout == 'odd-r':
+            u = x + 0.5 * (y & 1)
+        elif self.layout == 'even-r':
+            u = x + 0.5 * (1 - (y & 1))
+        else:
+            u = x + 0.5 * y
+        return (u, 0.75 * y)
+
+    @property
+    def hex_extent(self):
+        """ Return the width and height of the whole grid in units of
+        the box around a cell."""
+        if self.layout == 'axial':
+            width = self.width + 0.5 * (self.height - 1)
+        else:
+            width = self.width + 0.5
+        return (width, 0.75 * (self.height - 1) + 1)
+
+
+class HexTorus(HexGrid, Torus):
+    """
+    A HexGrid whose edges are connected.
+
+    A wrapping grid in an offset layout needs an even number of rows,
+    so that rows keep their shift across the top and bottom edges.
+    """
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
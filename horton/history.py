@@ -0,0 +1,186 @@
+from array import array
+from itertools import chain
+
+from horton.grid import Grid
+
+
+def _computed(grid):
+    """ Return whether the flat cells of *grid* are built on each read
+    of :py:attr:`Grid._grid` rather than stored."""
+    return isinstance(getattr(type(grid), '_grid', None), property)
+
+
+def _typecode(grid):
+    """ Return the :py:mod:`array` typecode *grid* stores its values
+    with, or None if they are not typed."""
+    typecode = getattr(grid, 'typecode', None)
+    if typecode is None and not _computed(grid):
+        typecode = getattr(grid._grid, 'typecode', None)
+    return typecode
+
+
+def _reader(grid):
+    """ Return a function that returns the flat cells of *grid* from a
+    start up to an end index as a tuple.
+
+    Grids whose cells are not stored in one flat sequence are read a
+    cell at a time rather than built whole.
+    """
+    if _computed(grid):
+        get, width = grid.__get_coordinate__, grid.width
+        return lambda start, end: tuple(get(idx % width, idx // width)
+                                        for idx in range(start, end))
+    values = grid._grid
+    return lambda start, end: tuple(values[start:end])
+
+
+class History(object):
+    """
+    A timeline of Grid snapshots.
+
+    Each recorded generation is stored as a tuple of immutable chunks
+    of the flat grid storage. A chunk that did not change since the
+    previous generation is shared with it rather than copied, so a
+    long run of a mostly-still world costs little more than its first
+    frame.
+
+    The History watches the grid it recorded last. Recording the same
+    grid again only reads the chunks written since, while a different
+    grid, or one changed by an operation that replaces many cells at
+    once, is compared chunk by chunk with the previous generation.
+    Call :py:meth:`History.close` to stop watching.
+
+    Snapshots are rebuilt with the last recorded grid's
+    :py:meth:`Grid._from_values`, so they keep its type and options,
+    and in typed storage of the same typecode as the grid they were
+    recorded from.
+
+    Cells are shared between snapshots by reference, so a History
+    should only be used with grids of immutable values.
+
+    >>> world = Grid(3, 1)
+    >>> history = History(chunk_size=2)
+    >>> history.record(world)
+    0
+    >>> world[2, 0] = 1
+    >>> history.record(world)
+    1
+    >>> Grid.pprint(history[0])
+    0 0 0
+    >>> Grid.pprint(history[1])
+    0 0 1
+    """
+
+    def __init__(self, chunk_size=4096):
+        assert chunk_size > 0
+        self.chunk_size = chunk_size
+        self._snapshots = []
+        self._typecodes = []
+        self._template = None
+        self._watched = None
+        self._dirty = None
+        self._dimensions = None
+
+    def __len__(self):
+        """ Return the number of recorded generations."""
+        return len(self._snapshots)
+
+    def __getitem__(self, generation):
+        """ Return a new Grid holding the state at *generation*."""
+        chunks = self._snapshots[generation]
+        typecode = self._typecodes[generation]
+        values = chain.from_iterable(chunks)
+        if typecode is None:
+            values = list(values)
+        else:
+            values = array(typecode, values)
+        return self._template._from_values(values)
+
+    def record(self, grid):
+        """ Append the state of *grid* and return its generation.
+
+        *Every grid recorded must have the same dimensions.* Grids
+        are rebuilt with the type and options, such as the chunk size
+        of a :py:class:`horton.chunked.ChunkedGrid`, of the last.
+        """
+        if self._dimensions is None:
+            self._dimensions = grid.dimensions
+        assert grid.dimensions == self._dimensions, (
+            "History only records grids of the same dimensions.")
+
+        read = _reader(grid)
+        size = self.chunk_size
+        total = len(grid)
+        previous = self._snapshots[-1] if self._snapshots else None
+        if grid is self._watched and self._dirty is not None:
+            chunks = list(previous)
+            for n in self._dirty:
+                chunks[n] = read(n * size, min(n * size + size, total))
+        else:
+            chunks = []
+            for n, start in enumerate(range(0, total, size)):
+                chunk = read(start, min(start + size, total))
+                if previous is not None and previous[n] == chunk:
+                    chunk = previous[n]
+                chunks.append(chunk)
+            self._watch(grid)
+        self._dirty = set()
+        self._template = grid
+        self._snapshots.append(tuple(chunks))
+        self._typecodes.append(_typecode(grid))
+        return len(self._snapshots) - 1
+
+    def _watch(self, grid):
+        if grid is self._watched:
+            return
+        self.close()
+        grid.watch(self._changed)
+        self._watched = grid
+
+    def _changed(self, x, y):
+        if self._dirty is None:
+            return
+        if x is None:
+            self._dirty = None
+        else:
+            self._dirty.add((y * self._dimensions[0] + x) // self.chunk_size)
+
+    def close(self):
+        """ Stop watching the grid recorded last."""
+        if self._watched is not None:
+            self._watched.unwatch(self._changed)
+            self._watched = None
+        self._dirty = None
+
+    def rewind(self, generation):
+        """ Discard every generation after *generation*.
+
+        Return the Grid at *generation*.
+        """
+        grid = self[generation]
+        if generation < 0:
+            generation += len(self._snapshots)
+        del self._snapshots[generation + 1:]
+        del self._typecodes[generation + 1:]
+        self._dirty = None
+        return grid
+
+    def branch(self, generation):
+        """ Return a new History that shares this one up to
+        *generation*.
+
+        Recording into the branch does not affect this timeline.
+        """
+        if generation < 0:
+            generation += len(self._snapshots)
+        history = self.__class__(self.chunk_size)
+        history._template = self._template
+        history._dimensions = self._dimensions
+        history._snapshots = self._snapshots[:generation + 1]
+        history._typecodes = self._typecodes[:generation + 1]
+        return history
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,211 @@
+"""
+Maze generators.
+
+Each generator returns a :py:class:`horton.grid.Grid` of wall masks:
+every cell is an integer whose bits say which of its four walls are
+still standing. Test a wall with ``cell & NORTH`` and so on.
+
+All generators take an optional *rng*, either a :py:class:`random.Random`
+instance or a seed for a new one, so a maze can be reproduced exactly.
+"""
+from array import array
+
+from horton.grid import Grid, _rng
+
+
+NORTH = 1
+EAST = 2
+SOUTH = 4
+WEST = 8
+ALL_WALLS = NORTH | EAST | SOUTH | WEST
+
+OPPOSITE = {NORTH: SOUTH, EAST: WEST, SOUTH: NORTH, WEST: EAST}
+
+
+def _walls(width, height):
+    assert width > 0 and height > 0
+    return array('B', [ALL_WALLS]) * (width * height)
+
+
+def _to_grid(width, height, walls):
+    return Grid.from_array(width, height, walls, copy=False)
+
+
+def _carve(walls, width, idx, direction):
+    """ Remove the wall in *direction* from the cell at *idx* and the
+    matching wall of the cell beyond it.
+    """
+    if direction == NORTH:
+        other = idx - width
+    elif direction == SOUTH:
+        other = idx + width
+    elif direction == EAST:
+        other = idx + 1
+    else:
+        other = idx - 1
+    walls[idx] &= ~direction
+    walls[other] &= ~OPPOSITE[direction]
+
+
+def _neighbours(width, size, idx):
+    """ Return the (direction, index) pairs of the cells next to *idx*."""
+    x = idx % width
+    ns = []
+    if idx >= width:
+        ns.append((NORTH, idx - width))
+    if x < width - 1:
+        ns.append((EAST, idx + 1))
+    if idx < size - width:
+        ns.append((SOUTH, idx + width))
+    if x > 0:
+        ns.append((WEST, idx - 1))
+    return ns
+
+
+def backtracker(width, height, rng=None):
+    """ Return a maze carved by an iterative recursive-backtracker.
+
+    Recursive-backtracker mazes have long, winding corridors.
+
+    >>> maze = backtracker(4, 3, rng=42)
+    >>> maze.dimensions
+    (4, 3)
+    """
+    rng = _rng(rng)
+    walls = _walls(width, height)
+    size = width * height
+    visited = bytearray(size)
+    current = rng.randrange(size)
+    visited[current] = 1
+    stack = [current]
+    while stack:
+        current = stack[-1]
+        ns = [(d, n) for d, n in _neighbours(width, size, current)
+              if not visited[n]]
+        if not ns:
+            stack.pop()
+            continue
+        direction, n = ns[int(rng.random() * len(ns))]
+        _carve(walls, width, current, direction)
+        visited[n] = 1
+        stack.append(n)
+    return _to_grid(width, height, walls)
+
+
+def prim(width, height, rng=None):
+    """ Return a maze grown by the randomized Prim's algorithm.
+
+    Prim's mazes branch often and have many short dead ends.
+    """
+    rng = _rng(rng)
+    walls = _walls(width, height)
+    size = width * height
+    unvisited, frontier_cell, interior = 0, 1, 2
+    state = bytearray(size)
+    frontier = []
+
+    def grow(idx):
+        state[idx] = interior
+        for _, n in _neighbours(width, size, idx):
+            if state[n] == unvisited:
+                state[n] = frontier_cell
+                frontier.append(n)
+
+    grow(rng.randrange(size))
+    while frontier:
+        # Swap a random frontier cell to the end so removing it is O(1).
+        pick = int(rng.random() * len(frontier))
+        frontier[pick], frontier[-1] = frontier[-1], frontier[pick]
+        cell = frontier.pop()
+        ns = [d for d, n in _neighbours(width, size, cell)
+              if state[n] == interior]
+        _carve(walls, width, cell, ns[int(rng.random() * len(ns))])
+        grow(cell)
+    return _to_grid(width, height, walls)
+
+
+def kruskal(width, height, rng=None):
+    """ Return a maze built by the randomized Kruskal's algorithm.
+
+    Every wall between two cells is visited in random order and
+    removed if the cells are not yet connected, which is tracked with
+    a union-find structure.
+    """
+    rng = _rng(rng)
+    walls = _walls(width, height)
+    size = width * height
+    parent = list(range(size))
+
+    def find(idx):
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    # Each edge is encoded as idx * 2, for the wall to the east, or
+    # idx * 2 + 1, for the wall to the south.
+    edges = [idx * 2 for idx in range(size) if idx % width < width - 1]
+    edges.extend(idx * 2 + 1 for idx in range(size - width))
+    rng.shuffle(edges)
+    remaining = size - 1
+    for edge in edges:
+        idx, south = divmod(edge, 2)
+        other = idx + width if south else idx + 1
+        a, b = find(idx), find(other)
+        if a == b:
+            continue
+        parent[b] = a
+        _carve(walls, width, idx, SOUTH if south else EAST)
+        remaining -= 1
+        if not remaining:
+            break
+    return _to_grid(width, height, walls)
+
+
+def eller(width, height, rng=None):
+    """ Return a maze built row by row with Eller's algorithm.
+
+    Only the sets of the current row are kept, so the memory used
+    besides the maze itself is proportional to its width.
+    """
+    rng = _rng(rng)
+    walls = _walls(width, height)
+    sets = list(range(width))
+    members = dict((x, [x]) for x in range(width))
+    next_set = width
+    for y in range(height):
+        row = y * width
+        last = y == height - 1
+        for x in range(width - 1):
+            a, b = sets[x], sets[x + 1]
+            if a == b or not (last or rng.random() < 0.5):
+                continue
+            _carve(walls, width, row + x, EAST)
+            if len(members[a]) < len(members[b]):
+                a, b = b, a
+            for m in members[b]:
+                sets[m] = a
+            members[a].extend(members.pop(b))
+        if last:
+            break
+
+        below = [None] * width
+        for s in sorted(members):
+            xs = members[s]
+            rng.shuffle(xs)
+            for x in xs[:1 + int(rng.random() * len(xs))]:
+                _carve(walls, width, row + x, SOUTH)
+                below[x] = s
+        members = {}
+        for x in range(width):
+            if below[x] is None:
+                below[x] = next_set
+                next_set += 1
+            members.setdefault(below[x], []).append(x)
+        sets = below
+    return _to_grid(width, height, walls)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,693 @@
+"""
+Shortest paths over a Grid.
+
+A :py:class:`PathFinder` answers repeated queries over one grid. It
+keeps its search state in flat arrays indexed by ``y * width + x``
+which are reused, not cleared, from one query to the next.
+"""
+import heapq
+
+from array import array
+from collections import deque
+from math import sqrt
+
+from horton.grid import Grid, Torus
+from horton.hex import HexGrid
+from horton.maze import NORTH, EAST, SOUTH, WEST
+
+
+SQRT2 = sqrt(2)
+INFINITY = float('inf')
+
+_ORTHOGONAL = ((0, -1, NORTH), (1, 0, EAST), (0, 1, SOUTH), (-1, 0, WEST))
+_DIAGONAL = ((1, -1), (1, 1), (-1, 1), (-1, -1))
+
+
+def _is_open(cell):
+    return not cell
+
+
+class PathFinder(object):
+    """
+    Find shortest paths between co-ordinates of a Grid.
+
+    By default a cell can be walked on when its value is false, so a
+    grid of zeros for floors and ones for obstacles works as-is. Pass
+    *passable* to decide otherwise.
+
+    If *walls* is true, the grid holds wall masks like those made by
+    :py:mod:`horton.maze` and every cell can be walked on, but not
+    through its walls.
+
+    *cost*, if given, returns the cost of stepping onto a cell from
+    its value. Otherwise every step costs one. With *diagonal*, moves
+    to the eight surrounding cells are allowed, as long as neither
+    adjacent side is blocked; a diagonal step costs the square root of
+    two times as much.
+
+    A Torus is searched across its edges. On a
+    :py:class:`horton.hex.HexGrid` each step is to one of the six
+    neighbouring hexagons, and neither *walls* nor *diagonal* apply.
+    The finder caches which cells are open, so call
+    :py:meth:`PathFinder.refresh` after changing the grid.
+
+    >>> from horton.grid import Grid
+    >>> world = Grid.from_array(3, 3, [0, 1, 0,
+    ...                                0, 1, 0,
+    ...                                0, 0, 0])
+    >>> finder = PathFinder(world)
+    >>> finder.bfs((0, 0), (2, 0))
+    [(0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0)]
+    """
+
+    def __init__(self, grid, passable=None, cost=None, walls=False,
+                 diagonal=False):
+        self.grid = grid
+        self.passable = passable if passable is not None else _is_open
+        self.cost = cost
+        if isinstance(grid, HexGrid):
+            if walls:
+                raise ValueError("Wall masks are not supported on "
+                                 "hexagonal grids")
+            self._table = grid.neighbour_table()
+        else:
+            self._table = None
+        self.walls = walls
+        self.diagonal = diagonal and not walls and self._table is None
+        size = len(grid)
+        self._g = array('d', [0.0]) * size
+        self._parent = array('l', [-1]) * size
+        self._seen = array('l', [0]) * size
+        self._closed = array('l', [0]) * size
+        self._stamp = 0
+        self._jumped = False
+        self.refresh()
+
+    def refresh(self):
+        """ Re-read which cells are open, and their costs, from the
+        grid."""
+        values = self.grid._grid
+        if self.walls:
+            self._open = bytearray([1]) * len(values)
+            self._masks = values
+        else:
+            passable = self.passable
+            self._open = bytearray(1 if passable(v) else 0 for v in values)
+            self._masks = None
+        if self.cost is not None:
+            self._costs = array('d', map(self.cost, values))
+            self._min_cost = min(self._costs) if self._costs else 1
+        else:
+            self._costs = None
+            self._min_cost = 1
+
+    def bfs(self, start, goal):
+        """ Return the path with the fewest steps from *start* to
+        *goal* as a list of co-ordinates, or None if there is none.
+
+        Step costs are ignored.
+        """
+        return self._find(start, goal, self._bfs)
+
+    def dijkstra(self, start, goal):
+        """ Return the cheapest path from *start* to *goal*, or None."""
+        return self._find(start, goal, self._dijkstra)
+
+    def astar(self, start, goal, heuristic=None):
+        """ Return the cheapest path from *start* to *goal*, or None.
+
+        *heuristic*, if given, is called with two co-ordinates and must
+        never overestimate the cost between them. The default is the
+        Manhattan distance, or the octile distance with diagonal moves,
+        scaled by the cheapest step.
+        """
+        if heuristic is None:
+            search = self._astar
+        else:
+            def search(source, goals):
+                width = self.grid.width
+                target, = goals
+                goal = (target % width, target // width)
+                return self._astar(source, goals, lambda idx: heuristic(
+                    (idx % width, idx // width), goal))
+        return self._find(start, goal, search)
+
+    def jps(self, start, goal):
+        """ Return the shortest path from *start* to *goal* found by
+        Jump Point Search, or None.
+
+        Jump Point Search only expands the cells where a path may turn,
+        which makes it much faster than A* on open grids. It requires
+        uniform step costs and a square grid that does not wrap and has
+        no wall masks.
+        """
+        if (self.walls or self.cost is not None or self.grid.wraps or
+                self._table is not None):
+            raise ValueError("Jump Point Search needs uniform costs on a "
+                             "square grid without walls or wrapping")
+        return self._find(start, goal, self._jps)
+
+    def find_paths(self, queries, method='astar'):
+        """ Return the path for each (start, goal) pair in *queries*.
+
+        *method* names one of the search methods. Queries for ``'bfs'``
+        and ``'dijkstra'`` that share a start are answered by a single
+        search.
+        """
+        queries = list(queries)
+        if method not in ('bfs', 'dijkstra'):
+            find = getattr(self, method)
+            return [find(start, goal) for start, goal in queries]
+
+        search = self._bfs if method == 'bfs' else self._dijkstra
+        by_start = {}
+        for n, (start, goal) in enumerate(queries):
+            by_start.setdefault(self._index(start), []).append(
+                (n, self._index(goal)))
+        paths = [None] * len(queries)
+        for source, targets in by_start.items():
+            goals = set(goal for _, goal in targets
+                        if self._open[goal] and self._open[source])
+            if not goals:
+                continue
+            search(source, goals)
+            for n, goal in targets:
+                if goal in goals and self._closed[goal] == self._stamp:
+                    paths[n] = self._path(source, goal)
+        return paths
+
+    def _find(self, start, goal, search):
+        source, target = self._index(start), self._index(goal)
+        if not (self._open[source] and self._open[target]):
+            return None
+        search(source, set([target]))
+        if self._closed[target] != self._stamp:
+            return None
+        return self._path(source, target)
+
+    def _index(self, coordinate):
+        x, y = coordinate
+        grid = self.grid
+        if grid.wraps:
+            x, y = x % grid.width, y % grid.height
+        elif not grid._is_valid_location(x, y):
+            raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                x, y))
+        return y * grid.width + x
+
+    def _begin(self):
+        """ Start a new query and return its stamp.
+
+        A cell's search state is only valid for the query whose stamp it
+        was marked with, so nothing has to be cleared between queries.
+        """
+        self._stamp += 1
+        if self._stamp == 2 ** 31 - 1:
+            size = len(self._seen)
+            self._seen = array('l', [0]) * size
+            self._closed = array('l', [0]) * size
+            self._stamp = 1
+        return self._stamp
+
+    def _path(self, source, target):
+        width = self.grid.width
+        parent = self._parent
+        indices = [target]
+        while indices[-1] != source:
+            indices.append(parent[indices[-1]])
+        indices.reverse()
+        if self._jumped:
+            indices = self._fill_jumps(indices)
+        return [(idx % width, idx // width) for idx in indices]
+
+    def _neighbours(self, idx):
+        """ Return (index, distance) pairs for the open cells that can
+        be reached from *idx* in one step."""
+        is_open = self._open
+        table = self._table
+        if table is not None:
+            return [(n, 1) for n in table[6 * idx:6 * idx + 6]
+                    if n >= 0 and is_open[n]]
+        grid = self.grid
+        width, height = grid.width, grid.height
+        wraps = grid.wraps
+        masks = self._masks
+        x, y = idx % width, idx // width
+        result = []
+        for dx, dy, wall in _ORTHOGONAL:
+            nx, ny = x + dx, y + dy
+            if wraps:
+                nx, ny = nx % width, ny % height
+            elif not (0 <= nx < width and 0 <= ny < height):
+                continue
+            if masks is not None and masks[idx] & wall:
+                continue
+            n = ny * width + nx
+            if is_open[n]:
+                result.append((n, 1))
+        if self.diagonal:
+            for dx, dy in _DIAGONAL:
+                nx, ny = x + dx, y + dy
+                if wraps:
+                    nx, ny = nx % width, ny % height
+                elif not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                n = ny * width + nx
+                if (is_open[n] and is_open[y * width + nx] and
+                        is_open[ny * width + x]):
+                    result.append((n, SQRT2))
+        return result
+
+    def _bfs(self, source, goals):
+        stamp = self._begin()
+        self._jumped = False
+        seen, closed, parent = self._seen, self._closed, self._parent
+        remaining = len(goals)
+        seen[source] = stamp
+        parent[source] = -1
+        queue = deque([source])
+        while queue:
+            idx = queue.popleft()
+            closed[idx] = stamp
+            if idx in goals:
+                remaining -= 1
+                if not remaining:
+                    return
+            for n, _ in self._neighbours(idx):
+                if seen[n] != stamp:
+                    seen[n] = stamp
+                    parent[n] = idx
+                    queue.append(n)
+
+    def _dijkstra(self, source, goals):
+        self._astar(source, goals, lambda idx: 0)
+
+    def _astar(self, source, goals, heuristic=None):
+        stamp = self._begin()
+        self._jumped = False
+        if heuristic is None:
+            target, = goals
+            heuristic = self._distance_to(target)
+        seen, closed = self._seen, self._closed
+        g, parent, costs = self._g, self._parent, self._costs
+        remaining = len(goals)
+        seen[source] = stamp
+        g[source] = 0.0
+        parent[source] = -1
+        heap = [(heuristic(source), source)]
+        while heap:
+            _, idx = heapq.heappop(heap)
+            if closed[idx] == stamp:
+                continue
+            closed[idx] = stamp
+            if idx in goals:
+                remaining -= 1
+                if not remaining:
+                    return
+            base = g[idx]
+            for n, distance in self._neighbours(idx):
+                if closed[n] == stamp:
+                    continue
+                step = distance * costs[n] if costs is not None else distance
+                cost = base + step
+                if seen[n] != stamp or cost < g[n]:
+                    seen[n] = stamp
+                    g[n] = cost
+                    parent[n] = idx
+                    heapq.heappush(heap, (cost + heuristic(n), n))
+
+    def _distance_to(self, target):
+        """ Return the default heuristic for paths ending at *target*."""
+        grid = self.grid
+        width, height, wraps = grid.width, grid.height, grid.wraps
+        tx, ty = target % width, target // width
+        scale = self._min_cost
+        diagonal = self.diagonal
+        if self._table is not None:
+            distance = grid.distance
+            return lambda idx: scale * distance((idx % width, idx // width),
+                                                (tx, ty))
+
+        def heuristic(idx):
+            dx = abs(idx % width - tx)
+            dy = abs(idx // width - ty)
+            if wraps:
+                dx = min(dx, width - dx)
+                dy = min(dy, height - dy)
+            if diagonal:
+                return scale * (max(dx, dy) + (SQRT2 - 1) * min(dx, dy))
+            return scale * (dx + dy)
+        return heuristic
+
+    def _walkable(self, x, y):
+        grid = self.grid
+        return (0 <= x < grid.width and 0 <= y < grid.height and
+                self._open[y * grid.width + x] == 1)
+
+    def _jump(self, x, y, dx, dy, goal):
+        """ Return the first jump point reached by moving from *x*, *y*
+        in the direction *dx*, *dy*, or None."""
+        walkable = self._walkable
+        diagonal = self.diagonal
+        while True:
+            if not walkable(x, y):
+                return None
+            if (x, y) == goal:
+                return x, y
+            if dx and dy:
+                if (self._jump(x + dx, y, dx, 0, goal) is not None or
+                        self._jump(x, y + dy, 0, dy, goal) is not None):
+                    return x, y
+            elif dx:
+                if ((walkable(x, y - 1) and not walkable(x - dx, y - 1)) or
+                        (walkable(x, y + 1) and not walkable(x - dx, y + 1))):
+                    return x, y
+            else:
+                if ((walkable(x - 1, y) and not walkable(x - 1, y - dy)) or
+                        (walkable(x + 1, y) and not walkable(x + 1, y - dy))):
+                    return x, y
+                if not diagonal and (
+                        self._jump(x + 1, y, 1, 0, goal) is not None or
+                        self._jump(x - 1, y, -1, 0, goal) is not None):
+                    return x, y
+            if diagonal and not (walkable(x + dx, y) and
+                                 walkable(x, y + dy)):
+                return None
+            x, y = x + dx, y + dy
+
+    def _directions(self, x, y, parent):
+        """ Return the directions worth jumping in from *x*, *y* when
+        arriving from *parent*."""
+        walkable = self._walkable
+        if parent is None:
+            directions = [(dx, dy) for dx, dy, _ in _ORTHOGONAL
+                          if walkable(x + dx, y + dy)]
+            if self.diagonal:
+                directions.extend(
+                    (dx, dy) for dx, dy in _DIAGONAL
+                    if walkable(x + dx, y) and walkable(x, y + dy))
+            return directions
+
+        px, py = parent
+        dx = (x > px) - (x < px)
+        dy = (y > py) - (y < py)
+        directions = []
+        if not self.diagonal:
+            if dx:
+                directions = [(0, -1), (0, 1), (dx, 0)]
+            else:
+                directions = [(-1, 0), (1, 0), (0, dy)]
+            return [(ox, oy) for ox, oy in directions
+                    if walkable(x + ox, y + oy)]
+
+        if dx and dy:
+            vertical, horizontal = walkable(x, y + dy), walkable(x + dx, y)
+            if vertical:
+                directions.append((0, dy))
+            if horizontal:
+                directions.append((dx, 0))
+            if vertical and horizontal:
+                directions.append((dx, dy))
+        elif dx:
+            ahead, down, up = (walkable(x + dx, y), walkable(x, y + 1),
+                               walkable(x, y - 1))
+            if ahead:
+                directions.append((dx, 0))
+                if down:
+                    directions.append((dx, 1))
+                if up:
+                    directions.append((dx, -1))
+            if down:
+                directions.append((0, 1))
+            if up:
+                directions.append((0, -1))
+        else:
+            ahead, right, left = (walkable(x, y + dy), walkable(x + 1, y),
+                                  walkable(x - 1, y))
+            if ahead:
+                directions.append((0, dy))
+                if right:
+                    directions.append((1, dy))
+                if left:
+                    directions.append((-1, dy))
+            if right:
+                directions.append((1, 0))
+            if left:
+                directions.append((-1, 0))
+        return directions
+
+    def _jps(self, source, goals):
+        stamp = self._begin()
+        self._jumped = True
+        width = self.grid.width
+        target, = goals
+        goal = (target % width, target // width)
+        heuristic = self._distance_to(target)
+        seen, closed = self._seen, self._closed
+        g, parent = self._g, self._parent
+        seen[source] = stamp
+        g[source] = 0.0
+        parent[source] = -1
+        heap = [(heuristic(source), source)]
+        while heap:
+            _, idx = heapq.heappop(heap)
+            if closed[idx] == stamp:
+                continue
+            closed[idx] = stamp
+            if idx == target:
+                return
+            x, y = idx % width, idx // width
+            previous = parent[idx]
+            origin = (None if previous == -1 else
+                      (previous % width, previous // width))
+            for dx, dy in self._directions(x, y, origin):
+                point = self._jump(x + dx, y + dy, dx, dy, goal)
+                if point is None:
+                    continue
+                jx, jy = point
+                n = jy * width + jx
+                if closed[n] == stamp:
+                    continue
+                steps = max(abs(jx - x), abs(jy - y))
+                cost = g[idx] + (steps * SQRT2 if dx and dy else steps)
+                if seen[n] != stamp or cost < g[n]:
+                    seen[n] = stamp
+                    g[n] = cost
+                    parent[n] = idx
+                    heapq.heappush(heap, (cost + heuristic(n), n))
+
+    def _fill_jumps(self, points):
+        """ Return the cells along the straight lines between
+        consecutive jump points."""
+        width = self.grid.width
+        cells = points[:1]
+        for a, b in zip(points, points[1:]):
+            x, y = a % width, a // width
+            bx, by = b % width, b // width
+            dx = (bx > x) - (bx < x)
+            dy = (by > y) - (by < y)
+            while (x, y) != (bx, by):
+                x, y = x + dx, y + dy
+                cells.append(y * width + x)
+        return cells
+
+
+class FlowField(object):
+    """
+    The distance from every cell of a Grid to the nearest of a set of
+    goals.
+
+    The field is computed in a single search outward from all the
+    goals at once. It is kept in :py:attr:`FlowField.distances`, a
+    Grid of floats that holds ``inf`` where no goal can be reached.
+    Any number of agents can then follow it towards the goals with
+    :py:meth:`FlowField.next_step`.
+
+    The field watches its grid. When a cell is set, only the distances
+    that depended on it are repaired. Cells that become blocked or more
+    expensive invalidate the part of the field that led through them.
+    Cells that become open or cheaper improve the field from where they
+    are. Changes to wall masks recompute the whole field, as do
+    operations that replace many cells at once. Call
+    :py:meth:`FlowField.close` to stop watching the grid.
+
+    The *passable*, *cost*, *walls* and *diagonal* arguments mean the
+    same as for :py:class:`PathFinder`.
+
+    >>> world = Grid.from_array(3, 2, [0, 1, 0,
+    ...                                0, 0, 0])
+    >>> field = FlowField(world, [(2, 0)])
+    >>> Grid.pprint(field.distances)
+    4.0 inf 0.0
+    3.0 2.0 1.0
+    >>> field.next_step(0, 0)
+    (0, 1)
+    >>> world[1, 0] = 0
+    >>> Grid.pprint(field.distances)
+    2.0 1.0 0.0
+    3.0 2.0 1.0
+    """
+
+    def __init__(self, grid, goals, passable=None, cost=None, walls=False,
+                 diagonal=False):
+        self.grid = grid
+        self._finder = PathFinder(grid, passable, cost, walls, diagonal)
+        self._goals = set(self._finder._index(goal) for goal in goals)
+        cls = Torus if grid.wraps else Grid
+        self.distances = cls.typed(grid.width, grid.height, 'd', INFINITY)
+        self._parent = array('l', [-1]) * len(grid)
+        self.recompute()
+        grid.watch(self._changed)
+
+    def close(self):
+        """ Stop repairing the field when the grid changes."""
+        self.grid.unwatch(self._changed)
+
+    def distance(self, x, y):
+        """ Return the cost of the cheapest path from *x*, *y* to a
+        goal."""
+        return self.distances[x, y]
+
+    def next_step(self, x, y):
+        """ Return the co-ordinate to move to from *x*, *y* to get
+        closer to a goal.
+
+        Return None at a goal or where no goal can be reached.
+        """
+        idx = self._finder._index((x, y))
+        distance = self.distances._grid[idx]
+        if distance == 0 or distance == INFINITY:
+            return None
+        width = self.grid.width
+        best = min(self._neighbours(idx), key=lambda pair: pair[1])
+        return (best[0] % width, best[0] // width)
+
+    def recompute(self):
+        """ Compute the whole field from scratch."""
+        self._finder.refresh()
+        distances, parent = self.distances._grid, self._parent
+        distances[:] = array('d', [INFINITY]) * len(distances)
+        parent[:] = array('l', [-1]) * len(parent)
+        is_open = self._finder._open
+        seeds = []
+        for goal in self._goals:
+            if is_open[goal]:
+                distances[goal] = 0.0
+                seeds.append(goal)
+        self._propagate(seeds)
+        self.distances._notify(None, None)
+
+    def _weight(self, idx, distance):
+        """ Return the cost of stepping onto *idx* over *distance*."""
+        costs = self._finder._costs
+        return distance * costs[idx] if costs is not None else distance
+
+    def _neighbours(self, idx):
+        """ Return (index, distance through it) pairs for the cells next
+        to *idx*."""
+        distances = self.distances._grid
+        return [(n, distances[n] + self._weight(n, step))
+                for n, step in self._finder._neighbours(idx)]
+
+    def _propagate(self, seeds):
+        """ Lower the distances around *seeds* until nothing improves."""
+        finder = self._finder
+        distances, parent = self.distances._grid, self._parent
+        heap = [(distances[idx], idx) for idx in seeds]
+        heapq.heapify(heap)
+        while heap:
+            distance, idx = heapq.heappop(heap)
+            if distance > distances[idx]:
+                continue
+            for n, step in finder._neighbours(idx):
+                candidate = distance + self._weight(idx, step)
+                if candidate < distances[n]:
+                    distances[n] = candidate
+                    parent[n] = idx
+                    heapq.heappush(heap, (candidate, n))
+
+    def _changed(self, x, y):
+        finder = self._finder
+        if x is None or finder.walls:
+            self.recompute()
+            return
+        idx = y * self.grid.width + x
+        value = self.grid.__get_coordinate__(x, y)
+        was_open = finder._open[idx]
+        is_open = 1 if finder.passable(value) else 0
+        finder._open[idx] = is_open
+        worse = was_open and not is_open
+        better = is_open and not was_open
+        if finder._costs is not None:
+            old_cost, new_cost = finder._costs[idx], finder.cost(value)
+            finder._costs[idx] = new_cost
+            finder._min_cost = min(finder._min_cost, new_cost)
+            worse = worse or new_cost > old_cost
+            better = is_open and (better or new_cost < old_cost)
+
+        distances, parent = self.distances._grid, self._parent
+        seeds = []
+        # Diagonal moves may not cut the corner of a blocked cell, so
+        # opening or closing a cell also changes the diagonal moves
+        # between the cells on either side of it.
+        sides = []
+        if finder.diagonal and is_open != was_open:
+            sides = [n for n, step in finder._neighbours(idx) if step == 1]
+        if worse:
+            invalid = self._descendants(idx)
+            if not is_open:
+                invalid.append(idx)
+                for n in sides:
+                    if parent[n] in sides:
+                        invalid.append(n)
+                        invalid.extend(self._descendants(n))
+            for cell in invalid:
+                distances[cell] = INFINITY
+                parent[cell] = -1
+            for cell in invalid:
+                if finder._open[cell] and self._settle(cell):
+                    seeds.append(cell)
+        if better:
+            self._settle(idx)
+            seeds.append(idx)
+            seeds.extend(n for n in sides if distances[n] < INFINITY)
+        self._propagate(seeds)
+        self.distances._notify(None, None)
+
+    def _descendants(self, idx):
+        """ Return every cell whose distance was reached through
+        *idx*."""
+        parent = self._parent
+        found = []
+        stack = [idx]
+        while stack:
+            cell = stack.pop()
+            for n, _ in self._finder._neighbours(cell):
+                if parent[n] == cell:
+                    found.append(n)
+                    stack.append(n)
+        return found
+
+    def _settle(self, idx):
+        """ Give *idx* the best distance offered by its neighbours.
+
+        Return True if it can reach a goal.
+        """
+        distances = self.distances._grid
+        if idx in self._goals:
+            distances[idx] = 0.0
+            self._parent[idx] = -1
+            return True
+        best, through = INFINITY, -1
+        for n, step in self._finder._neighbours(idx):
+            candidate = distances[n] + self._weight(n, step)
+            if candidate < best:
+                best, through = candidate, n
+        distances[idx] = best
+        self._parent[idx] = through
+        return best < INFINITY
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,231 @@
+"""
+Grids of cells with several named fields.
+
+A :py:class:`RecordGrid` stores each field of its cells as a separate
+typed :py:class:`horton.grid.Grid`, a structure of arrays rather than
+an array of structures. A cell costs only the machine values of its
+fields, and a whole field can be read, combined or convolved like any
+other Grid.
+"""
+from collections import namedtuple
+from collections.abc import Mapping
+
+from horton.grid import Grid
+
+
+Field = namedtuple("Field", "name typecode default")
+
+
+def _field(spec):
+    """ Return a Field from a Field, a (name, typecode) pair or a
+    (name, typecode, default) triple.
+    """
+    if len(spec) == 2:
+        spec = tuple(spec) + (0,)
+    return Field(*spec)
+
+
+class Cell(object):
+    """
+    A view of one cell of a :py:class:`RecordGrid`.
+
+    Fields are read and written as attributes or items. A Cell holds
+    no values of its own, so it always shows the current state of the
+    grid.
+    """
+
+    __slots__ = ('_grid', '_idx')
+
+    def __init__(self, grid, idx):
+        object.__setattr__(self, '_grid', grid)
+        object.__setattr__(self, '_idx', idx)
+
+    def __getitem__(self, name):
+        return self._grid._fields[name]._grid[self._idx]
+
+    def __setitem__(self, name, value):
+        self._grid._set(name, self._idx, value)
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name not in self._grid._fields:
+            raise AttributeError(name)
+        self[name] = value
+
+    def __eq__(self, other):
+        if isinstance(other, Cell):
+            other = other.record()
+        return self.record() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def record(self):
+        """ Return the values of the fields as a namedtuple."""
+        return self._grid.record(self._idx % self._grid.width,
+                                 self._idx // self._grid.width)
+
+    def __repr__(self):
+        return "Cell({0})".format(", ".join(
+            "{0}={1!r}".format(name, self[name])
+            for name in self._grid.fields))
+
+
+class RecordGrid(Mapping):
+    """
+    A Grid whose cells are records of named, typed fields.
+
+    *schema* is a sequence of ``(name, typecode)`` or
+    ``(name, typecode, default)`` entries. Each typecode is one of the
+    :py:mod:`array` typecodes, or None to keep any Python object in
+    that field. Defaults are 0 unless given.
+
+    Indexing the grid with a co-ordinate returns a :py:class:`Cell`
+    view, and assigning a mapping or a sequence of field values to a
+    co-ordinate sets the whole record.
+
+    >>> rooms = RecordGrid(3, 2, [('north', 'B', 1), ('visited', 'b')])
+    >>> rooms[1, 0].north
+    1
+    >>> rooms[1, 0].north = 0
+    >>> rooms.field('north')[1, 0]
+    0
+    >>> rooms[2, 1] = {'visited': 1}
+    >>> rooms.record(2, 1)
+    Record(north=1, visited=1)
+    >>> rooms.field('visited').count()
+    1
+    """
+
+    def __init__(self, width, height, schema):
+        self.width = width
+        self.height = height
+        self.schema = tuple(_field(spec) for spec in schema)
+        self.fields = tuple(f.name for f in self.schema)
+        if len(set(self.fields)) != len(self.fields):
+            raise ValueError("Field names must be unique")
+        self.Record = namedtuple("Record", self.fields)
+        self._fields = {}
+        for f in self.schema:
+            if f.typecode is None:
+                self._fields[f.name] = Grid(width, height, f.default)
+            else:
+                self._fields[f.name] = Grid.typed(width, height, f.typecode,
+                                                  f.default)
+
+    @classmethod
+    def copy(cls, other):
+        """
+        Return a new RecordGrid as a copy of *other*.
+        """
+        g = cls(other.width, other.height, other.schema)
+        for name in other.fields:
+            g._fields[name] = Grid.copy(other._fields[name])
+        return g
+
+    @property
+    def dimensions(self):
+        """ Return the dimensions tuple."""
+        return (self.width, self.height)
+
+    def field(self, name):
+        """ Return the Grid holding the field *name* of every cell.
+
+        The Grid shares its storage with this one, so writing to it
+        changes the cells.
+        """
+        return self._fields[name]
+
+    def record(self, x, y):
+        """ Return the fields of the cell at *x*, *y* as a namedtuple."""
+        idx = self._index(x, y)
+        return self.Record._make(self._fields[name]._grid[idx]
+                                 for name in self.fields)
+
+    def iter_records(self):
+        """ Yield the record of every cell in row-major order."""
+        make = self.Record._make
+        for values in zip(*(self._fields[name]._grid
+                            for name in self.fields)):
+            yield make(values)
+
+    def _index(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                x, y))
+        return y * self.width + x
+
+    def _set(self, name, idx, value):
+        field = self._fields[name]
+        field._assign(field._grid, idx, idx, value)
+        if field._watchers:
+            field._notify(idx % self.width, idx // self.width)
+
+    def __len__(self):
+        """ Return the number of cells."""
+        return self.width * self.height
+
+    def __iter__(self):
+        """ Return an iterator over a Cell view of every cell."""
+        return (Cell(self, idx) for idx in range(len(self)))
+
+    def __contains__(self, record):
+        """ Return True if a cell holds the field values *record*."""
+        return any(r == tuple(record) for r in self.iter_records())
+
+    def __eq__(self, other):
+        """ Return True if *other* has the same fields and every cell
+        holds the same values.
+        """
+        if not isinstance(other, RecordGrid):
+            return NotImplemented
+        return (self.dimensions == other.dimensions and
+                self.fields == other.fields and
+                all(self._fields[n] == other._fields[n]
+                    for n in self.fields))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __getitem__(self, coordinate):
+        """ Return a Cell view of the cell at the (x, y) *coordinate*."""
+        x, y = coordinate
+        return Cell(self, self._index(x, y))
+
+    def __setitem__(self, coordinate, record):
+        """ Set the fields of the cell at the (x, y) *coordinate*.
+
+        *record* is a mapping from field names to values, which leaves
+        other fields alone, or a sequence of a value for every field.
+        """
+        x, y = coordinate
+        idx = self._index(x, y)
+        if isinstance(record, Cell):
+            record = record.record()
+        if isinstance(record, Mapping):
+            unknown = set(record) - set(self.fields)
+            if unknown:
+                raise KeyError("Unknown fields: {0}".format(
+                    ", ".join(sorted(unknown))))
+            for name, value in record.items():
+                self._set(name, idx, value)
+        else:
+            record = tuple(record)
+            if len(record) != len(self.fields):
+                raise ValueError("Expected {0} field values, got {1}".format(
+                    len(self.fields), len(record)))
+            for name, value in zip(self.fields, record):
+                self._set(name, idx, value)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
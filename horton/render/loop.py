@@ -0,0 +1,169 @@
+"""
+Run a simulation at its own pace, apart from whatever draws it.
+
+:py:class:`Simulation` steps a world on a background thread and
+always keeps the latest finished generation ready for a renderer to
+pick up. A renderer that falls behind simply skips the generations it
+missed. Nothing here depends on pygame; see
+:py:class:`horton.render.pg.Runner` for the pygame loop built on it.
+"""
+import threading
+import time
+from collections import deque
+
+
+class RateMeter(object):
+    """
+    Count events per second over a sliding *window* of seconds.
+
+    >>> meter = RateMeter(window=1.0, clock=iter([0.0, 0.5, 1.0]).__next__)
+    >>> meter.tick(); meter.tick(); meter.tick()
+    >>> meter.rate
+    2.0
+    """
+
+    def __init__(self, window=1.0, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._times = deque()
+
+    def tick(self):
+        """ Record one event now."""
+        now = self.clock()
+        times = self._times
+        times.append(now)
+        while now - times[0] > self.window:
+            times.popleft()
+
+    @property
+    def rate(self):
+        """ Return the events per second over the last window."""
+        times = self._times
+        if len(times) < 2:
+            return 0.0
+        elapsed = times[-1] - times[0]
+        return (len(times) - 1) / elapsed if elapsed > 0 else 0.0
+
+
+class Simulation(object):
+    """
+    Step *world* with *step* on a background thread.
+
+    *rate* is the target number of ticks per second, or None to step
+    as fast as possible. If a tick runs late the schedule starts again
+    from now rather than running extra ticks to catch up.
+
+    *step* takes a world and returns the next one. Returning a new
+    world each tick, as :py:func:`horton.conway.step` does, means a
+    renderer never sees a generation half-way through being written.
+    If *step* or a change raises on the background thread, the thread
+    stops and the exception is raised again by the next call to
+    :py:meth:`Simulation.latest` or :py:meth:`Simulation.stop`.
+
+    >>> from horton.conway import step
+    >>> from horton.grid import Grid
+    >>> blinker = Grid.from_array(3, 3, [0, 0, 0, 1, 1, 1, 0, 0, 0])
+    >>> sim = Simulation(blinker, step)
+    >>> sim.run_ticks(2)
+    >>> sim.latest()[0]
+    2
+    """
+
+    def __init__(self, world, step, rate=None):
+        self.step = step
+        self.rate = rate
+        self.meter = RateMeter()
+        self._latest = (0, world)
+        self._changes = deque()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._error = None
+
+    @property
+    def running(self):
+        """ Return True while the background thread is stepping."""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def ticks_per_second(self):
+        """ Return the measured ticks per second."""
+        return self.meter.rate
+
+    def latest(self):
+        """ Return the latest generation number and world."""
+        with self._lock:
+            self._raise_error()
+            return self._latest
+
+    def apply(self, change):
+        """ Call *change* with the world before the next tick.
+
+        *change* returns the world to carry on with, so input handlers
+        can edit the world without racing the simulation thread.
+        """
+        self._changes.append(change)
+
+    def tick(self):
+        """ Advance the world by one generation on this thread."""
+        generation, world = self._latest
+        while self._changes:
+            world = self._changes.popleft()(world)
+        world = self.step(world)
+        with self._lock:
+            self._latest = (generation + 1, world)
+        self.meter.tick()
+
+    def run_ticks(self, count):
+        """ Advance the world by *count* generations on this thread."""
+        for _ in range(count):
+            self.tick()
+
+    def start(self):
+        """ Start stepping on a background thread."""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name="horton-simulation")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stop the background thread after its current tick."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._raise_error()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        clock = time.monotonic
+        deadline = clock()
+        while not self._stopping.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                with self._lock:
+                    self._error = e
+                return
+            if self.rate:
+                deadline += 1.0 / self.rate
+                delay = deadline - clock()
+                if delay < 0:
+                    deadline = clock()
+                elif self._stopping.wait(delay):
+                    break
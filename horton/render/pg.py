@@ -1,5 +1,16 @@
+from math import ceil
+
 import pygame
 
+from horton import backends
+from horton.hex import HexGrid
+from horton.render.loop import RateMeter, Simulation
+
+# Packs raw bytes into a new Surface; named frombytes from pygame 2.1.3.
+_frombytes = getattr(pygame.image, 'frombytes', None)
+if _frombytes is None:
+    _frombytes = pygame.image.fromstring
+
 
 def draw_cell(surface, cell, x, y, width, height):
     if cell:
@@ -10,16 +21,106 @@ def draw_cell(surface, cell, x, y, width, height):
     pygame.draw.rect(surface, colour, pygame.Rect(x, y, width, height))
 
 
-def render_grid(surface, grid, x, y, width, height, padding=0, render_cell=draw_cell):
+def _hexagon(x, y, width, height):
+    """ Return the corners of the pointy-topped hexagon that fills the
+    box at *x*, *y*."""
+    return [(x + width / 2, y), (x + width, y + height / 4),
+            (x + width, y + 3 * height / 4), (x + width / 2, y + height),
+            (x, y + 3 * height / 4), (x, y + height / 4)]
+
+
+def draw_hex_cell(surface, cell, x, y, width, height):
+    """ Draw *cell* as a hexagon filling the box at *x*, *y*, coloured
+    the way :py:func:`draw_cell` colours it."""
+    if cell:
+        colour = (0, 0, 0)
+    else:
+        colour = (255, 255, 255)
+
+    pygame.draw.polygon(surface, colour, _hexagon(x, y, width, height))
+
+
+class SpriteCache(object):
+    """
+    Cells drawn once per distinct key and reused as sprites.
+
+    *render_cell* draws a cell the way :py:func:`draw_cell` does and
+    *key* maps a cell to what decides how it looks, the cell itself by
+    default. The first cell with a new key is drawn onto its own
+    transparent sprite, and every later cell with that key reuses it.
+    Sprites have a *margin* of pixels on every side for strokes that
+    spill past the edges of the cell.
+
+    All sprites are dropped whenever cells are drawn at a different
+    size, for example after the view is resized.
+    """
+
+    def __init__(self, render_cell=draw_cell, key=None, margin=2):
+        self.render_cell = render_cell
+        self.key = key
+        self.margin = margin
+        self._size = None
+        self._sprites = {}
+
+    def __len__(self):
+        """ Return the number of sprites drawn at the current size."""
+        return len(self._sprites)
+
+    def clear(self):
+        """ Drop every sprite."""
+        self._sprites = {}
+
+    def sprite(self, cell, width, height):
+        """ Return the sprite of *cell* drawn *width* by *height*."""
+        if self._size != (width, height):
+            self._size = (width, height)
+            self.clear()
+        key = cell if self.key is None else self.key(cell)
+        try:
+            return self._sprites[key]
+        except KeyError:
+            margin = self.margin
+            sprite = pygame.Surface((int(ceil(width)) + 2 * margin,
+                                     int(ceil(height)) + 2 * margin),
+                                    pygame.SRCALPHA)
+            self.render_cell(sprite, cell, margin, margin, width, height)
+            self._sprites[key] = sprite
+            return sprite
+
+
+def render_grid(surface, grid, x, y, width, height, padding=0,
+                render_cell=draw_cell, sprites=None):
+    """ Draw *grid* into the rectangle at *x*, *y* of *surface*.
+
+    Each cell is drawn by *render_cell*, or, given a
+    :py:class:`SpriteCache` as *sprites*, blitted from the sprite of
+    its key in a single batch.
+
+    The cells of a :py:class:`horton.hex.HexGrid` are laid out as
+    hexagons and drawn by :py:func:`draw_hex_cell` unless another
+    *render_cell* is given, each into the box around its hexagon.
+    """
     assert grid.width > 0
     assert grid.height > 0
 
+    if isinstance(grid, HexGrid):
+        if render_cell is draw_cell:
+            render_cell = draw_hex_cell
+        _render_hex_grid(surface, grid, x, y, width, height, padding,
+                         render_cell, sprites)
+        return
+
     cell_width = (width / grid.width)
     cell_height = (height / grid.height)
 
     cell_width = cell_width if cell_width > 1 else 1
     cell_height = cell_height if cell_height > 1 else 1
 
+    if sprites is not None:
+        _blit_sprites(surface, grid, x + padding, y + padding,
+                      cell_width, cell_height, padding, sprites)
+        return
+
     for grid_x in range(grid.width):
         for grid_y in range(grid.height):
             screen_x = x + (grid_x * cell_width)
@@ -28,3 +129,167 @@ def render_grid(surface, grid, x, y, width, height, padding=0, render_cell=draw_
             render_cell(surface, grid[grid_x, grid_y],
                         screen_x + padding, screen_y + padding,
                         cell_width - (padding * 2), cell_height - (padding * 2))
+
+
+def _blit_sprites(surface, grid, x, y, cell_width, cell_height, padding,
+                  sprites):
+    inner_width = cell_width - (padding * 2)
+    inner_height = cell_height - (padding * 2)
+    sprite = sprites.sprite
+    margin = sprites.margin
+    x -= margin
+    y -= margin
+    batch = [(sprite(cell, inner_width, inner_height),
+              (int(x + grid_x * cell_width), int(y + grid_y * cell_height)))
+             for (grid_x, grid_y), cell in grid.iter_items()]
+    _blit(surface, batch)
+
+
+def _render_hex_grid(surface, grid, x, y, width, height, padding,
+                     render_cell, sprites):
+    extent_width, extent_height = grid.hex_extent
+    cell_width = max(width / extent_width, 1)
+    cell_height = max(height / extent_height, 1)
+    inner_width = cell_width - (padding * 2)
+    inner_height = cell_height - (padding * 2)
+    position = grid.hex_position
+    corners = [(x + u * cell_width + padding, y + v * cell_height + padding)
+               for u, v in (position(grid_x, grid_y)
+                            for grid_x, grid_y in grid.iter_coordinates())]
+    if sprites is None:
+        for (screen_x, screen_y), cell in zip(corners, grid):
+            render_cell(surface, cell, screen_x, screen_y,
+                        inner_width, inner_height)
+        return
+    sprite = sprites.sprite
+    margin = sprites.margin
+    _blit(surface, [(sprite(cell, inner_width, inner_height),
+                     (int(screen_x - margin), int(screen_y - margin)))
+                    for (screen_x, screen_y), cell in zip(corners, grid)])
+
+
+def _blit(surface, batch):
+    if hasattr(surface, 'blits'):
+        surface.blits(batch, doreturn=False)
+    else:
+        for image, position in batch:
+            surface.blit(image, position)
+
+
+def grid_surface(grid, colours=None, default=(0, 0, 0)):
+    """ Return a Surface with one pixel for each cell of *grid*.
+
+    *colours* maps cell values to ``(r, g, b)`` tuples and every other
+    value is drawn in *default*. By default 0 is white and everything
+    else black, as :py:func:`draw_cell` draws them. Scale the result
+    with :py:func:`pygame.transform.scale` to draw large grids far
+    faster than cell by cell.
+    """
+    if colours is None:
+        colours = {0: (255, 255, 255)}
+    data = backends.op('pixels')(grid._grid, colours, default)
+    return _frombytes(data, grid.dimensions, 'RGB')
+
+
+def zoomed_surface(summary, level, colours=None, default=(0, 0, 0),
+                   reduce='max'):
+    """ Return a Surface with one pixel for each block of ``2 ** level``
+    by ``2 ** level`` cells of a :py:class:`horton.summary.Summary`.
+
+    Each block is coloured by the *reduce* of its cells, as for
+    :py:meth:`horton.summary.Summary.level`, so with ``'max'`` a block
+    shows black if any of its cells is alive. *colours* and *default*
+    are as for :py:func:`grid_surface`.
+    """
+    return grid_surface(summary.level(level, reduce), colours, default)
+
+
+def draw_world(surface, world):
+    """ Clear *surface* to white and draw *world* across all of it."""
+    surface.fill((255, 255, 255))
+    width, height = surface.get_size()
+    render_grid(surface, world, 0, 0, width, height)
+
+
+class Runner(object):
+    """
+    A pygame loop that draws a :py:class:`horton.render.loop.Simulation`
+    at its own frame rate.
+
+    The simulation steps *world* with *step* on a background thread at
+    *tick_rate* ticks per second, or as fast as it can if that is None.
+    The display shows the latest finished generation at up to
+    *frame_rate* frames per second. When drawing falls behind, the
+    generations it missed are never drawn, and when stepping falls
+    behind, the last generation is not drawn again.
+
+    *draw* is called with the surface and the world to draw a frame
+    and defaults to :py:func:`draw_world`. *on_event* is called with
+    every pygame event except QUIT, which stops the loop. Use
+    :py:meth:`Runner.apply` to change the world from an event handler.
+    An exception raised by *step* stops the loop and is raised again
+    from :py:meth:`Runner.run`.
+    """
+
+    def __init__(self, surface, world, step, tick_rate=None, frame_rate=60,
+                 draw=draw_world, on_event=None):
+        self.surface = surface
+        self.simulation = Simulation(world, step, tick_rate)
+        self.frame_rate = frame_rate
+        self.draw = draw
+        self.on_event = on_event
+        self.frames = RateMeter()
+        self.dropped = 0
+        self.running = False
+        self._drawn = None
+
+    @property
+    def ticks_per_second(self):
+        """ Return the measured simulation ticks per second."""
+        return self.simulation.ticks_per_second
+
+    @property
+    def frames_per_second(self):
+        """ Return the measured frames drawn per second."""
+        return self.frames.rate
+
+    def apply(self, change):
+        """ Call *change* with the world before the next tick and carry
+        on with the world it returns.
+        """
+        self.simulation.apply(change)
+
+    def redraw(self):
+        """ Draw the latest generation again on the next frame, for
+        example after changing how it is drawn.
+        """
+        self._drawn = None
+
+    def stop(self):
+        """ Leave the loop after the current frame."""
+        self.running = False
+
+    def run(self):
+        """ Run the loop until QUIT or :py:meth:`Runner.stop`."""
+        clock = pygame.time.Clock()
+        self._drawn = None
+        self.running = True
+        self.simulation.start()
+        try:
+            while self.running:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        self.running = False
+                    elif self.on_event is not None:
+                        self.on_event(event)
+                generation, world = self.simulation.latest()
+                if generation != self._drawn:
+                    if self._drawn is not None:
+                        self.dropped += max(generation - self._drawn - 1, 0)
+                    self.draw(self.surface, world)
+                    pygame.display.flip()
+                    self.frames.tick()
+                    self._drawn = generation
+                clock.tick(self.frame_rate)
+        finally:
+            self.simulation.stop()
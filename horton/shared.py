@@ -0,0 +1,296 @@
+"""
+Grids whose cells live in shared memory.
+
+A :py:class:`SharedGrid` keeps its cells in a
+:py:class:`multiprocessing.shared_memory.SharedMemory` block, so other
+processes can attach to the same cells instead of receiving a copy.
+Pickling a SharedGrid, for example to hand it to a process pool,
+only sends its :py:class:`SharedGridHandle`: the name of the block,
+the dimensions and the typecode of the cells.
+
+The process that creates a SharedGrid owns the block. The block is
+destroyed when :py:meth:`SharedGrid.unlink` is called, or otherwise
+when the grid that created it is garbage collected, so keep that grid
+until every process is done with the cells.
+"""
+import os
+import weakref
+from array import array
+from collections import namedtuple
+
+from horton._optional import optional
+from horton.grid import Grid, _content_hash, _like
+
+
+SharedGridHandle = namedtuple("SharedGridHandle", "name width height typecode")
+
+# The lock given to use_lock, for grids unpickled without their own.
+_process_lock = None
+
+
+def use_lock(lock):
+    """ Give every SharedGrid unpickled from now on in this process
+    *lock*, in place of a lock that could not be pickled with it.
+
+    Locks made by :py:mod:`multiprocessing`, other than those of a
+    :py:func:`multiprocessing.Manager`, can only reach another process
+    as it starts, so hand the lock to a process pool through its
+    initializer::
+
+        lock = multiprocessing.RLock()
+        g = SharedGrid(1000, 1000, lock=lock)
+        with multiprocessing.Pool(initializer=use_lock,
+                                  initargs=(lock,)) as pool:
+            pool.map(work, [g] * 8)
+    """
+    global _process_lock
+    _process_lock = lock
+
+
+def _portable(lock):
+    """ Return True if *lock* can be pickled right now."""
+    synchronize = optional('multiprocessing.synchronize')
+    if synchronize is None or not isinstance(lock, synchronize.SemLock):
+        return True
+    from multiprocessing.context import get_spawning_popen
+    return get_spawning_popen() is not None
+
+
+def _shared_memory():
+    from multiprocessing import shared_memory
+    return shared_memory
+
+
+def _attach_block(name):
+    """ Return the existing shared memory block *name* without asking
+    the resource tracker to destroy it when this process exits.
+    """
+    SharedMemory = _shared_memory().SharedMemory
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        return SharedMemory(name=name)
+
+
+def _release(view, block, owner):
+    """ Release *view* and close *block*, destroying it as well if it
+    was created by process *owner*.
+    """
+    view.release()
+    block.close()
+    if os.getpid() == owner:
+        block.unlink()
+
+
+class SharedGrid(Grid):
+    """
+    A Grid stored in a block of shared memory.
+
+    The cells are machine values of a single :py:mod:`array`
+    *typecode*, as with :py:meth:`Grid.typed`. A new block is created
+    unless an existing one is attached with
+    :py:meth:`SharedGrid.attach`.
+
+    A *readonly* grid raises TypeError on any write. Given a *lock*,
+    such as a :py:func:`multiprocessing.RLock`, every write holds it,
+    and holding it around several reads and writes makes them atomic
+    with respect to other processes writing through the same lock.
+    A lock from a :py:func:`multiprocessing.Manager` is pickled with
+    the grid. Any other lock is left out when pickling outside of
+    starting a process, and the process that unpickles the grid must
+    have been given it with :py:func:`use_lock`.
+
+    Watchers only hear about writes made in their own process.
+    Arithmetic and other operations that return a new grid return an
+    ordinary :py:class:`Grid`.
+
+    >>> g = SharedGrid(3, 2)
+    >>> other = SharedGrid.attach(g.handle)
+    >>> g[1, 1] = 5
+    >>> other[1, 1]
+    5
+    >>> other.close()
+    >>> g.unlink()
+    """
+
+    def __init__(self, width, height, value=0, typecode='l', lock=None,
+                 readonly=False, _block=None):
+        self.width = width
+        self.height = height
+        self.typecode = typecode
+        self.lock = lock
+        self.readonly = readonly
+        self._coordinates = None
+        size = width * height
+        itemsize = array(typecode).itemsize
+        self._owner = _block is None
+        if _block is None:
+            _block = _shared_memory().SharedMemory(
+                create=True, size=max(size * itemsize, 1))
+        self._block = _block
+        view = _block.buf[:size * itemsize].cast(typecode)
+        if self._owner and size:
+            view[:] = array(typecode, [value]) * size
+        self._grid = view.toreadonly() if readonly else view
+        if readonly:
+            view.release()
+        self._finalizer = weakref.finalize(
+            self, _release, self._grid, _block,
+            os.getpid() if self._owner else None)
+
+    @classmethod
+    def attach(cls, handle, readonly=False, lock=None):
+        """ Return a SharedGrid over the cells of the grid whose
+        :py:attr:`SharedGrid.handle` is *handle*.
+        """
+        name, width, height, typecode = handle
+        return cls(width, height, typecode=typecode, lock=lock,
+                   readonly=readonly, _block=_attach_block(name))
+
+    @classmethod
+    def copy(cls, other):
+        """
+        Return a new SharedGrid as a copy of *other*.
+        """
+        typecode = getattr(other, 'typecode', 'l')
+        return cls.from_array(other.width, other.height, other._grid,
+                              typecode=typecode)
+
+    @classmethod
+    def from_array(cls, width, height, arr, copy=True, typecode='l'):
+        """ Create a SharedGrid holding the values of an array.
+
+        The values are always copied into the shared block.
+        """
+        assert len(arr) == width * height, ("Array dimensions do not "
+                                            "match length of array.")
+        g = cls(width, height, typecode=typecode)
+        if len(arr):
+            g._grid[:] = array(typecode, arr)
+        return g
+
+    @classmethod
+    def typed(cls, width, height, typecode, value=0):
+        """ Create a SharedGrid whose values have the given *typecode*."""
+        return cls(width, height, value, typecode)
+
+    @property
+    def handle(self):
+        """ Return the picklable SharedGridHandle of this grid."""
+        return SharedGridHandle(self._block.name, self.width, self.height,
+                                self.typecode)
+
+    def close(self):
+        """ Stop using the shared block in this process.
+
+        The grid must not be used afterwards.
+        """
+        if self._block is None:
+            return
+        self._grid.release()
+        self._block.close()
+        self._block = None
+
+    def unlink(self):
+        """ Close the grid and destroy the shared block.
+
+        Only the process that created the grid should unlink it.
+        """
+        block = self._block
+        self.close()
+        self._finalizer.detach()
+        if block is not None:
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._owner:
+            self.unlink()
+        else:
+            self.close()
+
+    def __reduce__(self):
+        lock = self.lock
+        if lock is not None and not _portable(lock):
+            return (_attach, (self.handle, self.readonly, None, True))
+        return (_attach, (self.handle, self.readonly, lock))
+
+    def __hash__(self):
+        """ Return a hash of the values in the grid.
+
+        Other processes may change the cells at any time, so the hash
+        is computed afresh every time instead of being kept.
+        """
+        return _content_hash(self._grid)
+
+    def _options(self):
+        return {'typecode': self.typecode}
+
+    def _from_values(self, values):
+        """ Return a new ordinary Grid holding *values*."""
+        if not isinstance(values, array):
+            values = list(values)
+        return Grid.from_array(self.width, self.height, values, copy=False)
+
+    @property
+    def values(self):
+        """ Return a copy of the grid values."""
+        return list(self._grid)
+
+    def _store(self, values):
+        """ Replace every value in the grid with *values*."""
+        if self.lock is None:
+            self._grid[:] = _like(self._grid, values)
+        else:
+            with self.lock:
+                self._grid[:] = _like(self._grid, values)
+        self._notify(None, None)
+
+    def apply_patch(self, patch):
+        """ Apply a changeset produced by :py:meth:`Grid.diff`."""
+        if self.lock is None:
+            return super(SharedGrid, self).apply_patch(patch)
+        with self.lock:
+            return super(SharedGrid, self).apply_patch(patch)
+
+    def flood_fill(self, start, value, connectivity=4):
+        """ Set the region of equal, connected cells around *start* to
+        *value*.
+
+        Return the number of cells filled.
+        """
+        if self.readonly:
+            raise TypeError("The grid is read-only")
+        if self.lock is None:
+            return super(SharedGrid, self).flood_fill(start, value,
+                                                      connectivity)
+        with self.lock:
+            return super(SharedGrid, self).flood_fill(start, value,
+                                                      connectivity)
+
+    def __setitem__(self, *args):
+        """ Set an item in the grid to a value.
+
+        *The first argument is an (x, y) tuple and the second is the value.*
+        """
+        if self.lock is None:
+            return super(SharedGrid, self).__setitem__(*args)
+        with self.lock:
+            return super(SharedGrid, self).__setitem__(*args)
+
+
+def _attach(handle, readonly, lock, inherit=False):
+    if inherit:
+        if _process_lock is None:
+            raise RuntimeError("A SharedGrid with a lock can only be "
+                               "unpickled in a process given the lock "
+                               "with use_lock")
+        lock = _process_lock
+    return SharedGrid.attach(handle, readonly, lock)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
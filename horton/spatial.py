@@ -0,0 +1,220 @@
+"""
+An index of entities placed on the cells of a Grid.
+
+:py:class:`SpatialIndex` buckets entities by square blocks of cells so
+that rectangle, radius and nearest-neighbour queries only look at the
+blocks near the query instead of every cell or every entity.
+"""
+import heapq
+from math import ceil, sqrt
+
+
+class SpatialIndex(object):
+    """
+    A spatial hash of entities keyed to the co-ordinates of a Grid.
+
+    Entities are any hashable objects. Inserting, moving and removing
+    one takes constant time. The index only uses the dimensions of
+    *grid* and whether it wraps, so on a :py:class:`horton.grid.Torus`
+    positions, rectangles and distances all wrap around the edges.
+    Distances are Euclidean.
+
+    >>> from horton.grid import Grid
+    >>> index = SpatialIndex(Grid(20, 20))
+    >>> index.insert('ant', (2, 3))
+    >>> index.insert('bee', (5, 3))
+    >>> index.insert('cat', (15, 15))
+    >>> sorted(index.within((3, 3), 2))
+    ['ant', 'bee']
+    >>> index.nearest((14, 12), k=2)
+    ['cat', 'bee']
+    """
+
+    def __init__(self, grid, bucket_size=8):
+        if bucket_size < 1:
+            raise ValueError("Buckets must hold at least one cell")
+        self.width = grid.width
+        self.height = grid.height
+        self.wraps = grid.wraps
+        self.bucket_size = bucket_size
+        self._columns = (self.width - 1) // bucket_size + 1
+        self._rows = (self.height - 1) // bucket_size + 1
+        self._buckets = {}
+        self._positions = {}
+
+    def __len__(self):
+        """ Return the number of entities in the index."""
+        return len(self._positions)
+
+    def __iter__(self):
+        """ Return an iterator over the entities."""
+        return iter(self._positions)
+
+    def __contains__(self, entity):
+        """ Return True if *entity* is in the index."""
+        return entity in self._positions
+
+    def _location(self, position):
+        x, y = position
+        if self.wraps:
+            return (x % self.width, y % self.height)
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                x, y))
+        return (x, y)
+
+    def _bucket(self, position):
+        size = self.bucket_size
+        return (position[0] // size, position[1] // size)
+
+    def position(self, entity):
+        """ Return the co-ordinate of *entity*."""
+        return self._positions[entity]
+
+    def insert(self, entity, position):
+        """ Place *entity*, which must not be in the index yet, at
+        *position*.
+        """
+        if entity in self._positions:
+            raise ValueError("{0!r} is already in the index".format(entity))
+        position = self._location(position)
+        self._positions[entity] = position
+        self._buckets.setdefault(self._bucket(position), set()).add(entity)
+
+    def move(self, entity, position):
+        """ Move *entity* to *position*."""
+        old = self._positions[entity]
+        position = self._location(position)
+        self._positions[entity] = position
+        key, new_key = self._bucket(old), self._bucket(position)
+        if key != new_key:
+            self._discard(entity, key)
+            self._buckets.setdefault(new_key, set()).add(entity)
+
+    def remove(self, entity):
+        """ Remove *entity* from the index."""
+        self._discard(entity, self._bucket(self._positions.pop(entity)))
+
+    def _discard(self, entity, key):
+        bucket = self._buckets[key]
+        bucket.discard(entity)
+        if not bucket:
+            del self._buckets[key]
+
+    def _spans(self, start, stop, size):
+        """ Return the inclusive ranges of cells within *size* that the
+        inclusive range from *start* to *stop* covers.
+        """
+        if not self.wraps:
+            start, stop = max(start, 0), min(stop, size - 1)
+            return [(start, stop)] if start <= stop else []
+        if stop - start + 1 >= size:
+            return [(0, size - 1)]
+        start, stop = start % size, stop % size
+        if start <= stop:
+            return [(start, stop)]
+        return [(start, size - 1), (0, stop)]
+
+    def at(self, position):
+        """ Return the entities at *position*."""
+        position = self._location(position)
+        bucket = self._buckets.get(self._bucket(position), ())
+        return [e for e in bucket if self._positions[e] == position]
+
+    def in_rect(self, topleft, bottomright):
+        """ Return the entities in the rectangle between the inclusive
+        co-ordinates *topleft* and *bottomright*.
+
+        On a wrapping grid the rectangle may cross the edges.
+        """
+        (x1, y1), (x2, y2) = topleft, bottomright
+        size = self.bucket_size
+        buckets = self._buckets
+        positions = self._positions
+        found = []
+        for ylo, yhi in self._spans(y1, y2, self.height):
+            for xlo, xhi in self._spans(x1, x2, self.width):
+                for by in range(ylo // size, yhi // size + 1):
+                    for bx in range(xlo // size, xhi // size + 1):
+                        for e in buckets.get((bx, by), ()):
+                            x, y = positions[e]
+                            if xlo <= x <= xhi and ylo <= y <= yhi:
+                                found.append(e)
+        return found
+
+    def _distance2(self, a, b):
+        dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+        if self.wraps:
+            dx, dy = min(dx, self.width - dx), min(dy, self.height - dy)
+        return dx * dx + dy * dy
+
+    def within(self, position, radius):
+        """ Return the entities no further than *radius* from
+        *position*.
+        """
+        position = self._location(position)
+        x, y = position
+        reach = int(ceil(radius))
+        limit = radius * radius
+        return [e for e in self.in_rect((x - reach, y - reach),
+                                        (x + reach, y + reach))
+                if self._distance2(position, self._positions[e]) <= limit]
+
+    def _ring(self, bx, by, r):
+        """ Yield the buckets *r* buckets away from *bx*, *by*."""
+        columns, rows = self._columns, self._rows
+        if r == 0:
+            yield (bx, by)
+            return
+        edge = [(bx + dx, by - r) for dx in range(-r, r + 1)]
+        edge += [(bx + dx, by + r) for dx in range(-r, r + 1)]
+        edge += [(bx - r, by + dy) for dy in range(-r + 1, r)]
+        edge += [(bx + r, by + dy) for dy in range(-r + 1, r)]
+        if self.wraps:
+            seen = set()
+            for cx, cy in edge:
+                key = (cx % columns, cy % rows)
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+        else:
+            for cx, cy in edge:
+                if 0 <= cx < columns and 0 <= cy < rows:
+                    yield (cx, cy)
+
+    def nearest(self, position, k=1):
+        """ Return up to *k* entities closest to *position*, nearest
+        first.
+
+        Buckets are searched in growing rings around *position* until
+        no unvisited bucket can hold anything closer.
+        """
+        if k < 1:
+            return []
+        position = self._location(position)
+        bx, by = self._bucket(position)
+        size = self.bucket_size
+        positions = self._positions
+        distance2 = self._distance2
+        last = max(self._columns, self._rows)
+        visited = set()
+        candidates = []
+        for r in range(last + 1):
+            for key in self._ring(bx, by, r):
+                if key in visited:
+                    continue
+                visited.add(key)
+                for e in self._buckets.get(key, ()):
+                    candidates.append((distance2(position, positions[e]), e))
+            if len(candidates) >= k:
+                bound = (r - 1 if self.wraps else r) * size
+                best = heapq.nsmallest(k, candidates, key=lambda c: c[0])
+                if bound > 0 and sqrt(best[-1][0]) <= bound:
+                    return [e for _, e in best]
+        best = heapq.nsmallest(k, candidates, key=lambda c: c[0])
+        return [e for _, e in best]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
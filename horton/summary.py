@@ -0,0 +1,255 @@
+"""
+Summaries of the numbers in a Grid for fast region queries.
+
+A :py:class:`Summary` keeps a summed-area table and a pyramid of
+minimums, maximums and sums over blocks of 2 by 2, 4 by 4, 8 by 8 cells
+and so on. Region sums then take constant time and region extremes
+only look at the blocks along the edges of the region. The coarser
+levels of the pyramid are also small, zoomed-out pictures of the grid.
+"""
+from itertools import accumulate
+from operator import add
+
+from horton.grid import Grid
+
+
+def _halve(values, width, height, pick):
+    """ Return the values of the next level up, combining each block of
+    2 by 2 values with *pick*.
+    """
+    out = []
+    for y in range(0, height, 2):
+        row = values[y * width:(y + 1) * width]
+        if y + 1 < height:
+            row = list(map(pick, row, values[(y + 1) * width:
+                                             (y + 2) * width]))
+        evens = row[0::2]
+        out.extend(map(pick, evens, row[1::2]))
+        if width % 2:
+            out.append(evens[-1])
+    return out
+
+
+class Summary(object):
+    """
+    A summed-area table and min/max pyramid of a numeric Grid.
+
+    The summary watches *grid*. Setting a single cell updates the
+    pyramid along the path from that cell to the top, which takes time
+    proportional to the number of levels, and is kept as a correction
+    to the summed-area table. Once there are more corrections than the
+    width and height of the grid together, the table is rebuilt the
+    next time it is asked for, as is everything after an operation that
+    replaces many cells at once. Call :py:meth:`Summary.close` to stop
+    watching the grid.
+
+    Regions are given as inclusive co-ordinates of their top-left and
+    bottom-right corners and do not wrap, even on a
+    :py:class:`horton.grid.Torus`.
+
+    >>> world = Grid.from_array(4, 3, [1, 2, 3, 4,
+    ...                                5, 6, 7, 8,
+    ...                                9, 0, 1, 2])
+    >>> summary = Summary(world)
+    >>> summary.sum((1, 0), (2, 1))
+    18
+    >>> summary.min((1, 0), (3, 2)), summary.max((0, 0), (1, 2))
+    (0, 9)
+    >>> world[3, 0] = 20
+    >>> summary.max((0, 0), (3, 2)), summary.sum((0, 0), (3, 0))
+    (20, 26)
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self._dirty = True
+        self._sat_dirty = True
+        self._pending = {}
+        grid.watch(self._changed)
+
+    def close(self):
+        """ Stop updating the summary when the grid changes."""
+        self.grid.unwatch(self._changed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def levels(self):
+        """ Return the number of levels in the pyramid, counting the
+        cells themselves as level 0."""
+        self._refresh()
+        return len(self._sizes)
+
+    def _changed(self, x, y):
+        if x is None:
+            self._dirty = True
+            self._sat_dirty = True
+            return
+        if self._dirty:
+            return
+        value = self.grid[x, y]
+        width = self.grid.width
+        cell = y * width + x
+        delta = value - self._cells[cell]
+        self._cells[cell] = value
+        if not self._sat_dirty:
+            pending = self._pending
+            pending[cell] = pending.get(cell, 0) + delta
+            if len(pending) > width + self.grid.height:
+                self._sat_dirty = True
+        for k in range(1, len(self._sizes)):
+            child_width, child_height = self._sizes[k - 1]
+            x0, y0 = x & ~1, y & ~1
+            x, y = x >> 1, y >> 1
+            idx = y * self._sizes[k][0] + x
+            mins, maxs = self._mins[k - 1], self._maxs[k - 1]
+            children = [y1 * child_width + x1
+                        for y1 in range(y0, min(y0 + 2, child_height))
+                        for x1 in range(x0, min(x0 + 2, child_width))]
+            self._mins[k][idx] = min(mins[i] for i in children)
+            self._maxs[k][idx] = max(maxs[i] for i in children)
+            self._sums[k][idx] += delta
+
+    def _refresh(self):
+        if not self._dirty:
+            return
+        grid = self.grid
+        width, height = grid.width, grid.height
+        cells = list(grid._grid)
+        self._cells = cells
+        self._sizes = [(width, height)]
+        self._mins, self._maxs, self._sums = [cells], [cells], [cells]
+        while width > 1 or height > 1:
+            for level, pick in ((self._mins, min), (self._maxs, max),
+                                (self._sums, add)):
+                level.append(_halve(level[-1], width, height, pick))
+            width, height = (width + 1) // 2, (height + 1) // 2
+            self._sizes.append((width, height))
+        self._dirty = False
+
+    def _table(self):
+        """ Return the summed-area table, rebuilding it if needed."""
+        self._refresh()
+        if self._sat_dirty:
+            width, height = self.grid.width, self.grid.height
+            cells = self._cells
+            previous = [0] * (width + 1)
+            table = previous[:]
+            for y in range(height):
+                running = accumulate(cells[y * width:(y + 1) * width])
+                previous = [0] + list(map(add, previous[1:], running))
+                table.extend(previous)
+            self._sat = table
+            self._sat_dirty = False
+            self._pending = {}
+        return self._sat
+
+    def _region(self, topleft, bottomright):
+        (x1, y1), (x2, y2) = topleft, bottomright
+        grid = self.grid
+        for x, y in (topleft, bottomright):
+            if not (0 <= x < grid.width and 0 <= y < grid.height):
+                raise KeyError("({0}, {1}) is an invalid co-ordinate".format(
+                    x, y))
+        if x1 > x2 or y1 > y2:
+            raise ValueError("The first co-ordinate should be the top-left "
+                             "corner of the region")
+        return x1, y1, x2 + 1, y2 + 1
+
+    def sum(self, topleft, bottomright):
+        """ Return the sum of the cells in the region.
+
+        This takes constant time, plus the time to add any cells set
+        since the summed-area table was last built.
+        """
+        x1, y1, x2, y2 = self._region(topleft, bottomright)
+        table = self._table()
+        width = self.grid.width
+        stride = width + 1
+        total = (table[y2 * stride + x2] - table[y1 * stride + x2] -
+                 table[y2 * stride + x1] + table[y1 * stride + x1])
+        for cell, delta in self._pending.items():
+            y, x = divmod(cell, width)
+            if x1 <= x < x2 and y1 <= y < y2:
+                total += delta
+        return total
+
+    def mean(self, topleft, bottomright):
+        """ Return the mean of the cells in the region."""
+        (x1, y1), (x2, y2) = topleft, bottomright
+        return self.sum(topleft, bottomright) / ((x2 - x1 + 1) *
+                                                 (y2 - y1 + 1))
+
+    def _extreme(self, levels, pick, topleft, bottomright):
+        """ Return the *pick* of the region, climbing the pyramid and
+        only looking at the odd rows and columns left over at the
+        edges of each level.
+        """
+        x1, y1, x2, y2 = self._region(topleft, bottomright)
+        found = []
+        for k, values in enumerate(levels):
+            width = self._sizes[k][0]
+            if x2 - x1 < 2 or y2 - y1 < 2 or k == len(levels) - 1:
+                found.extend(values[y * width + x]
+                             for y in range(y1, y2) for x in range(x1, x2))
+                break
+            if x1 & 1:
+                found.extend(values[y * width + x1] for y in range(y1, y2))
+                x1 += 1
+            if x2 & 1:
+                found.extend(values[y * width + x2 - 1]
+                             for y in range(y1, y2))
+                x2 -= 1
+            if y1 & 1:
+                found.extend(values[y1 * width:y1 * width + x2][x1:])
+                y1 += 1
+            if y2 & 1:
+                found.extend(values[(y2 - 1) * width:
+                                    (y2 - 1) * width + x2][x1:])
+                y2 -= 1
+            x1, y1, x2, y2 = x1 >> 1, y1 >> 1, x2 >> 1, y2 >> 1
+        return pick(found)
+
+    def min(self, topleft, bottomright):
+        """ Return the smallest cell in the region."""
+        self._refresh()
+        return self._extreme(self._mins, min, topleft, bottomright)
+
+    def max(self, topleft, bottomright):
+        """ Return the largest cell in the region."""
+        self._refresh()
+        return self._extreme(self._maxs, max, topleft, bottomright)
+
+    def level(self, k, reduce='max'):
+        """ Return level *k* of the pyramid as a Grid.
+
+        Each cell of level *k* summarises a block of ``2 ** k`` by
+        ``2 ** k`` cells with *reduce*, one of ``'min'``, ``'max'`` or
+        ``'sum'``. Blocks at the right and bottom edges may be smaller.
+        Drawing a coarse level is a quick way to show a zoomed-out view
+        of a large grid.
+
+        >>> from horton.grid import Grid
+        >>> world = Grid.from_array(3, 2, [0, 1, 0,
+        ...                                0, 0, 1])
+        >>> Grid.pprint(Summary(world).level(1, 'sum'))
+        1 1
+        """
+        self._refresh()
+        levels = {'min': self._mins, 'max': self._maxs, 'sum': self._sums}
+        if reduce not in levels:
+            raise ValueError("reduce must be one of 'min', 'max' or 'sum'")
+        if not 0 <= k < len(self._sizes):
+            raise ValueError("There is no level {0}".format(k))
+        width, height = self._sizes[k]
+        return Grid.from_array(width, height, list(levels[reduce][k]),
+                               copy=False)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -16,7 +16,8 @@ things.
 setup(
     name="Horton",
     version=__version__,
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
+    python_requires=">=3.8",
 
     install_requires = [
         "sphinx_bootstrap_theme", # for docs
@@ -34,6 +35,7 @@ setup(
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
+        "Programming Language :: Python :: 3",
         "Topic :: Artistic Software",
         "Topic :: Games/Entertainment",
         "Topic :: Software Development :: Libraries",
@@ -0,0 +1,193 @@
+import math
+import os
+import random
+import subprocess
+import sys
+import unittest
+from operator import add, eq, ge, gt, le, lt, mul, ne, sub, truediv
+
+from horton import backends, conway, grid
+from horton.backends import python as reference
+
+
+WIDTH, HEIGHT = 48, 32
+OPERATORS = [add, sub, mul, truediv, lt, le, gt, ge, eq, ne]
+KERNELS = [[[1, 1, 1], [1, 1, 1], [1, 1, 1]],
+           [[0, 1, 0], [1, -4, 1], [0, 1, 0]],
+           [[2, 4, 2], [1, 2, 1], [0, 0, 0]],
+           [[0.5, 0, 1, 0, 0.25]]]
+
+
+def cells(rng, kind):
+    size = WIDTH * HEIGHT
+    if kind == 'bool':
+        return [rng.random() < 0.5 for _ in range(size)]
+    if kind == 'float':
+        return [rng.uniform(-10, 10) for _ in range(size)]
+    return [rng.randint(-9, 9) for _ in range(size)]
+
+
+class Conformance(object):
+    """ Checks that a backend agrees with the reference backend
+    wherever it does not decline the work.
+    """
+
+    backend = None
+
+    def setUp(self):
+        if not backends.is_available(self.backend):
+            self.skipTest("backend {0!r} is not installed".format(
+                self.backend))
+        self.module = backends.load(self.backend)
+        self.rng = random.Random(1)
+
+    def run_both(self, operation, *args):
+        if operation not in backends._backends[self.backend].ops:
+            return
+        result = getattr(self.module, operation)(*args)
+        if result is NotImplemented:
+            return
+        self.assertSameCells(getattr(reference, operation)(*args), result)
+
+    def assertSameCells(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for e, a in zip(expected, actual):
+            if isinstance(e, float) or isinstance(a, float):
+                self.assertTrue(math.isclose(e, a, rel_tol=1e-9,
+                                             abs_tol=1e-9), (e, a))
+            else:
+                self.assertEqual(e, a)
+
+    def test_fill(self):
+        for value in [0, 2.5, None, 'x']:
+            self.run_both('fill', WIDTH * HEIGHT, value)
+
+    def test_copy(self):
+        self.run_both('copy', cells(self.rng, 'int'))
+
+    def test_combine(self):
+        for kind in ['int', 'float', 'bool']:
+            values = cells(self.rng, kind)
+            others = [cells(self.rng, 'int'), cells(self.rng, 'float'),
+                      3, -1.5, True]
+            for op in OPERATORS:
+                for other in others:
+                    for reflected in [False, True]:
+                        divisor = values if reflected else other
+                        if op is truediv and (divisor == 0 or (
+                                isinstance(divisor, list) and 0 in divisor)):
+                            continue
+                        self.run_both('combine', values, other, op,
+                                      reflected)
+
+    def test_combine_division_by_zero(self):
+        if 'combine' not in backends._backends[self.backend].ops:
+            return
+        values = cells(self.rng, 'int')
+        try:
+            result = self.module.combine(values, 0, truediv, False)
+        except ZeroDivisionError:
+            return
+        self.assertIs(result, NotImplemented)
+
+    def test_convolve(self):
+        for kind in ['int', 'float', 'bool']:
+            values = cells(self.rng, kind)
+            for kernel in KERNELS:
+                for boundary in ['zero', 'clamp', 'wrap']:
+                    self.run_both('convolve', values, WIDTH, HEIGHT, kernel,
+                                  boundary)
+
+    def test_neighbourhood_sums(self):
+        masks = [conway.neighbourhood(2), conway.neighbourhood(3, 'hex'),
+                 conway.neighbourhood(2, 'von_neumann', centre=True),
+                 [[0.5, 2, 2, 0, 1]]]
+        for kind in ['int', 'float', 'bool']:
+            values = cells(self.rng, kind)
+            for mask in masks:
+                for wraps in [False, True]:
+                    self.run_both('neighbourhood_sums', values, WIDTH,
+                                  HEIGHT, conway._runs(mask), wraps)
+
+    def test_life_step(self):
+        values = [int(self.rng.random() < 0.3) for _ in range(WIDTH * HEIGHT)]
+        for wraps in [False, True]:
+            self.run_both('life_step', values, WIDTH, HEIGHT, wraps)
+
+    def test_pixels(self):
+        values = [self.rng.randint(0, 3) for _ in range(WIDTH * HEIGHT)]
+        self.run_both('pixels', values,
+                      {0: (255, 255, 255), 1: (255, 0, 0), 2: (0, 0, 255)},
+                      (1, 2, 3))
+
+
+for _name in backends.names():
+    _cls = 'Test{0}Backend'.format(_name.title())
+    globals()[_cls] = type(_cls, (Conformance, unittest.TestCase),
+                           {'backend': _name})
+
+
+def decline(*args):
+    return NotImplemented
+
+
+combine = convolve = decline
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registered = dict(backends._backends)
+
+    def tearDown(self):
+        backends._backends.clear()
+        backends._backends.update(self.registered)
+        backends.use('auto')
+
+    def test_reference_is_always_available(self):
+        self.assertIn('python', backends.available())
+
+    def test_use_reference(self):
+        backends.use('python')
+        self.assertEqual(backends.current(), 'python')
+        self.assertIs(backends.op('combine'), reference.combine)
+
+    def test_unknown_names(self):
+        with self.assertRaises(ValueError):
+            backends.use('nothing')
+        with self.assertRaises(ValueError):
+            backends.op('nothing')
+        with self.assertRaises(ValueError):
+            backends.register('broken', __name__, ['nothing'])
+
+    def test_unavailable_backend(self):
+        backends.register('missing', __name__, ['combine'],
+                          requires=['horton_missing_module'])
+        self.assertNotIn('missing', backends.available())
+        with self.assertRaises(ValueError):
+            backends.use('missing')
+
+    def test_declined_operations_fall_back(self):
+        backends.register('declining', __name__, ['combine', 'convolve'],
+                          priority=100)
+        backends.use('declining')
+        g = grid.Grid.from_array(3, 1, [1, 2, 3])
+        self.assertEqual(list(g + 1), [2, 3, 4])
+        self.assertEqual(list(2 - g), [1, 0, -1])
+        self.assertEqual(list(g.convolve([[1, 1, 1]])), [3, 6, 5])
+
+    def test_missing_operations_fall_back(self):
+        backends.register('declining', __name__, ['combine'], priority=100)
+        backends.use('declining')
+        self.assertIs(backends.op('life_step'), reference.life_step)
+        blinker = grid.Grid.from_array(3, 3, [0, 0, 0, 1, 1, 1, 0, 0, 0])
+        self.assertEqual(list(conway.step(blinker)),
+                         [0, 1, 0, 0, 1, 0, 0, 1, 0])
+
+    def test_environment_selects_backend(self):
+        env = dict(os.environ, HORTON_BACKEND='python')
+        output = subprocess.check_output(
+            [sys.executable, '-c',
+             'from horton import backends; print(backends.current())'],
+            env=env)
+        self.assertEqual(output.decode().strip(), 'python')
@@ -0,0 +1,112 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from horton import conway, grid
+from horton.checkpoint import Checkpointer, dumps, loads
+
+
+def noisy_step(rng):
+    """ Return a stepper that also flips a random cell."""
+    def stepper(world):
+        world = conway.step(world)
+        coordinate = world.random_coordinate(rng)
+        world[coordinate] = 1 - world[coordinate]
+        return world
+    return stepper
+
+
+class TestEncoding(unittest.TestCase):
+
+    def test_round_trip(self):
+        worlds = [grid.Grid.from_array(3, 1, [0, 1, 255]),
+                  grid.Torus.from_array(2, 2, [-1, 2, 3, 4]),
+                  grid.Grid.typed(2, 1, 'd', 0.5),
+                  grid.Grid.from_array(2, 1, ['a', None])]
+        for world in worlds:
+            restored = loads(dumps(world))
+            self.assertTrue(type(restored) is type(world))
+            self.assertEqual(restored, world)
+            self.assertEqual(type(restored._grid), type(world._grid))
+
+    def test_round_trip_keeps_cell_types(self):
+        cells = [[True, False, True], [-300, 0, 70000],
+                 [2 ** 40, -2 ** 40, 1], [2 ** 70, 0, 1], [True, 2, 0]]
+        for values in cells:
+            restored = loads(dumps(grid.Grid.from_array(3, 1, values)))
+            self.assertEqual(restored._grid, values)
+            self.assertEqual([type(v) for v in restored._grid],
+                             [type(v) for v in values])
+
+    def test_encoding_is_compact(self):
+        world = grid.Grid(200, 200)
+        world.randomize(0.01, rng=1)
+        self.assertTrue(len(dumps(world)) < 2000)
+
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            loads(b'nothing to see')
+
+
+class TestCheckpointer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'run.ckpt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_without_checkpoint(self):
+        self.assertEqual(Checkpointer(self.path).load(), None)
+
+    def test_save_and_load(self):
+        rng = random.Random(5)
+        with Checkpointer(self.path, rng=rng) as checkpoint:
+            world = grid.Grid.typed(3, 2, 'b', 1)
+            checkpoint.save(7, world)
+            world[0, 0] = 0
+            expected = rng.random()
+        rng = random.Random(1)
+        generation, restored = Checkpointer(self.path, rng=rng).load()
+        self.assertEqual(generation, 7)
+        self.assertEqual(list(restored), [1] * 6)
+        self.assertEqual(rng.random(), expected)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_write_errors_are_raised(self):
+        path = os.path.join(self.directory, 'missing', 'run.ckpt')
+        checkpoint = Checkpointer(path)
+        checkpoint.save(1, grid.Grid(2, 2))
+        with self.assertRaises(IOError):
+            checkpoint.flush()
+        checkpoint.close()
+
+    def test_generations_resume_exactly(self):
+        seed = grid.Torus(8, 8)
+        seed.randomize(0.4, rng=2)
+        rng = random.Random(3)
+        expected = [list(world) for _, world in
+                    conway.generations(25, seed, noisy_step(rng))]
+
+        rng = random.Random(3)
+        checkpoint = Checkpointer(self.path, every=10, rng=rng)
+        run = conway.generations(25, seed, noisy_step(rng), checkpoint)
+        for generation, world in run:
+            self.assertEqual(list(world), expected[generation])
+            if generation == 17:
+                break
+        run.close()
+        checkpoint.close()
+
+        rng = random.Random(99)
+        checkpoint = Checkpointer(self.path, every=10, rng=rng)
+        resumed = list(conway.generations(25, seed, noisy_step(rng),
+                                          checkpoint))
+        checkpoint.close()
+        self.assertEqual(resumed[0][0], 10)
+        self.assertTrue(isinstance(resumed[0][1], grid.Torus))
+        self.assertEqual([list(world) for _, world in resumed],
+                         expected[10:])
@@ -0,0 +1,161 @@
+import unittest
+
+from horton import grid
+from horton.checkpoint import dumps, loads
+from horton.chunked import ChunkedGrid
+from horton.history import History
+from horton.path import FlowField
+
+
+class TestChunkedGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.g = ChunkedGrid(10, 7, chunk_size=4)
+
+    def test_chunks_are_allocated_lazily(self):
+        self.assertEqual(self.g.allocated_chunks, 0)
+        self.g[9, 6] = 1
+        self.assertEqual(self.g.allocated_chunks, 1)
+        self.g[1, 1] = 0
+        self.assertEqual(self.g.allocated_chunks, 1)
+
+    def test_getitem(self):
+        self.g[5, 6] = 2
+        self.assertEqual(self.g[5, 6], 2)
+        self.assertEqual(self.g[4, 6], 0)
+
+    def test_invalid_location_raises_error(self):
+        with self.assertRaises(KeyError):
+            self.g[10, 0]
+        with self.assertRaises(KeyError):
+            self.g[0, 7] = 1
+
+    def test_flat_values_are_row_major(self):
+        g = grid.Grid(10, 7)
+        for x, y in [(0, 0), (3, 4), (4, 4), (9, 6), (8, 1)]:
+            g[x, y] = x + y
+            self.g[x, y] = x + y
+        self.assertEqual(list(self.g), list(g))
+        self.assertEqual(self.g, g)
+        self.assertEqual(self.g.values, g.values)
+
+    def test_from_array_compacts_uniform_chunks(self):
+        cells = [1] * 70
+        cells[69] = 0
+        g = ChunkedGrid.from_array(10, 7, cells)
+        self.assertEqual(list(g), cells)
+        self.assertEqual(g.allocated_chunks, 1)
+
+    def test_compact(self):
+        self.g[0, 0] = 1
+        self.g[0, 0] = 0
+        self.g[4, 4] = 3
+        for x in range(4, 8):
+            for y in range(4, 7):
+                self.g[x, y] = 3
+        self.assertEqual(self.g.compact(), 2)
+        self.assertEqual(self.g.allocated_chunks, 0)
+        self.assertEqual(self.g[5, 5], 3)
+        self.assertEqual(self.g[3, 3], 0)
+
+    def test_copy(self):
+        self.g[2, 3] = 1
+        g = ChunkedGrid.copy(self.g)
+        g[2, 3] = 2
+        self.assertEqual(self.g[2, 3], 1)
+        self.assertEqual(g.chunk_size, 4)
+
+    def test_iter_chunk_items(self):
+        g = ChunkedGrid(3, 3, chunk_size=2)
+        g[2, 0] = 1
+        self.assertEqual([coord for coord, _ in g.iter_chunk_items()],
+                         [(0, 0), (1, 0), (0, 1), (1, 1),
+                          (2, 0), (2, 1),
+                          (0, 2), (1, 2),
+                          (2, 2)])
+        self.assertEqual(sorted(g.iter_chunk_items()), sorted(g.iter_items()))
+
+    def test_apply_patch(self):
+        other = grid.Grid(10, 7)
+        other[9, 0] = 1
+        other[0, 1] = 1
+        self.g.apply_patch(self.g.diff(other))
+        self.assertEqual(self.g, other)
+
+    def test_inplace_arithmetic(self):
+        self.g[1, 2] = 1
+        self.g += 1
+        self.assertEqual(self.g[1, 2], 2)
+        self.assertEqual(self.g[9, 6], 1)
+        self.assertTrue(isinstance(self.g * 2, ChunkedGrid))
+        self.assertEqual((self.g * 2).chunk_size, 4)
+
+    def test_iter_row_chunks(self):
+        self.g[9, 6] = 1
+        chunks = list(self.g.iter_row_chunks(3))
+        self.assertEqual([y for y, _ in chunks], [0, 3, 6])
+        self.assertEqual(sum((values for _, values in chunks), []),
+                         self.g._grid)
+
+    def test_fill_releases_chunks(self):
+        self.g[1, 2] = 1
+        self.g.fill(3)
+        self.assertEqual(self.g.allocated_chunks, 0)
+        self.assertEqual(list(self.g), [3] * 70)
+        self.g.fill(0)
+        self.assertEqual(self.g._chunks, {})
+
+    def test_hash_follows_setitem(self):
+        hash(self.g)
+        self.g[9, 6] = 1
+        self.g[9, 6] = 2
+        self.g[0, 0] = 0
+        self.assertEqual(hash(self.g), hash(grid.Grid.from_array(
+            10, 7, self.g._grid)))
+
+    def test_reductions_match_grid(self):
+        self.g.fill(2)
+        for x, y, value in [(0, 0, 5), (9, 6, -3), (5, 2, 0), (8, 4, 7)]:
+            self.g[x, y] = value
+        g = grid.Grid.from_array(10, 7, self.g._grid)
+        self.assertEqual(list(self.g), list(g))
+        self.assertEqual(self.g.sum(), g.sum())
+        self.assertEqual(self.g.count(), g.count())
+        self.assertEqual(self.g.count(lambda v: v > 1), 68)
+        self.assertEqual((self.g.min(), self.g.max()), (-3, 7))
+        self.assertEqual(hash(self.g), hash(g))
+        self.assertEqual(g, self.g)
+
+    def test_diff_joins_runs_across_bands(self):
+        other = grid.Grid(10, 7)
+        for x in range(7, 10):
+            other[x, 3] = 1
+        for x in range(0, 4):
+            other[x, 4] = 1
+        other[9, 6] = 2
+        self.assertEqual(self.g.diff(other), [(37, [1] * 7), (69, [2])])
+        self.assertEqual(self.g.diff(other), grid.Grid(10, 7).diff(other))
+
+    def test_rebuilt_with_chunk_size(self):
+        self.g[9, 6] = 1
+        history = History()
+        history.record(self.g)
+        for restored in (history[0], loads(dumps(self.g))):
+            self.assertTrue(isinstance(restored, ChunkedGrid))
+            self.assertEqual(restored.chunk_size, 4)
+            self.assertEqual(restored, self.g)
+
+    def test_flow_field(self):
+        field = FlowField(self.g, [(9, 6)])
+        self.g[9, 5] = 1
+        self.g[8, 6] = 1
+        self.assertEqual(field.distance(0, 0), float('inf'))
+        self.g[8, 6] = 0
+        self.assertEqual(field.distance(0, 0), 15.0)
+
+    def test_flood_fill(self):
+        for y in range(7):
+            self.g[4, y] = 1
+        self.assertEqual(self.g.flood_fill((9, 0), 2), 35)
+        self.assertEqual(self.g[5, 6], 2)
+        self.assertEqual(self.g[3, 6], 0)
@@ -0,0 +1,119 @@
+import random
+import unittest
+
+from horton import conway, grid
+
+
+def brute_force_sums(world, mask):
+    ry, rx = len(mask) // 2, len(mask[0]) // 2
+    sums = []
+    for y in range(world.height):
+        for x in range(world.width):
+            total = 0
+            for ky, row in enumerate(mask):
+                for kx, weight in enumerate(row):
+                    nx, ny = x + kx - rx, y + ky - ry
+                    if world.wraps:
+                        total += weight * world[nx, ny]
+                    elif world._is_valid_location(nx, ny):
+                        total += weight * world[nx, ny]
+            sums.append(total)
+    return sums
+
+
+class TestRules(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(4)
+        self.cells = [int(self.rng.random() < 0.4) for _ in range(19 * 13)]
+
+    def test_neighbourhood_shapes(self):
+        self.assertEqual(conway.neighbourhood(1), [[1, 1, 1],
+                                                   [1, 0, 1],
+                                                   [1, 1, 1]])
+        self.assertEqual(sum(map(sum, conway.neighbourhood(5))), 120)
+        self.assertEqual(sum(map(sum, conway.neighbourhood(
+            3, 'von_neumann'))), 24)
+        self.assertEqual(sum(map(sum, conway.neighbourhood(2, 'hex'))), 18)
+        with self.assertRaises(ValueError):
+            conway.neighbourhood(2, 'octagon')
+        with self.assertRaises(ValueError):
+            conway.neighbourhood(0)
+
+    def test_sums_match_brute_force(self):
+        masks = [conway.neighbourhood(1, centre=True),
+                 conway.neighbourhood(4, 'circular'),
+                 conway.neighbourhood(3, 'hex'),
+                 conway.neighbourhood(7, 'von_neumann'),
+                 [[1, 0, 2], [0, 3, 0], [2, 0, 1]]]
+        for cls in (grid.Grid, grid.Torus):
+            world = cls.from_array(19, 13, self.cells)
+            for mask in masks:
+                self.assertEqual(
+                    conway.backends.op('neighbourhood_sums')(
+                        world._grid, 19, 13, conway._runs(mask),
+                        world.wraps),
+                    brute_force_sums(world, mask))
+
+    def test_conway_rule_matches_step(self):
+        life = conway.Rule(birth={3}, survival={2, 3})
+        for cls in (grid.Grid, grid.Torus):
+            world = cls.from_array(19, 13, self.cells)
+            for _ in range(5):
+                stepped = conway.step(world, life)
+                self.assertEqual(stepped, conway.step(world))
+                self.assertIs(type(stepped), cls)
+                world = stepped
+
+    def test_larger_than_life(self):
+        bosco = conway.parse_rule('R5,C0,M1,S34..58,B34..45,NM')
+        world = grid.Torus.from_array(19, 13, self.cells)
+        counts = brute_force_sums(world, bosco.neighbourhood)
+        expected = [int(n in (bosco.survival if cell else bosco.birth))
+                    for n, cell in zip(counts, self.cells)]
+        self.assertEqual(list(conway.step(world, bosco)), expected)
+
+    def test_step_rows_follows_rule(self):
+        rules = [conway.parse_rule('R2,C0,M1,S6..11,B5..8,NM'),
+                 conway.Rule(birth={2}, survival=set(), states=3,
+                             neighbourhood=conway.neighbourhood(
+                                 1, 'von_neumann'))]
+        for cls in (grid.Grid, grid.Torus):
+            world = cls.from_array(19, 13, self.cells)
+            for rule in rules:
+                expected = conway.step(world, rule)
+                for rows in (1, 2, 5, 13):
+                    out = grid.Grid(19, 13)
+                    conway.step_rows(world, out, rows, rule)
+                    self.assertEqual(list(out), list(expected))
+
+    def test_multiple_states(self):
+        brain = conway.Rule(birth={2}, survival=set(), states=3)
+        world = grid.Grid.from_array(4, 1, [1, 0, 1, 2])
+        self.assertEqual(list(conway.step(world, brain)), [2, 1, 2, 0])
+
+    def test_weights(self):
+        rule = conway.Rule(birth={1.5}, survival=set(), states=3,
+                           weights={1: 1, 2: 0.5})
+        world = grid.Grid.from_array(3, 1, [1, 0, 2])
+        self.assertEqual(list(conway.step(world, rule)), [2, 1, 0])
+
+    def test_parse_rule(self):
+        rule = conway.parse_rule('R2,C3,M0,S1..2,B3..3,NN')
+        self.assertEqual(rule.states, 3)
+        self.assertEqual(rule.birth, range(3, 4))
+        self.assertEqual(rule.neighbourhood,
+                         conway.neighbourhood(2, 'von_neumann'))
+        with self.assertRaises(ValueError):
+            conway.parse_rule('B3/S23')
+
+    def test_invalid_masks(self):
+        world = grid.Grid(3, 3)
+        with self.assertRaises(ValueError):
+            conway.step(world, conway.Rule({3}, {2, 3}, [[1, 1]]))
+        with self.assertRaises(ValueError):
+            conway.step(world, conway.Rule({3}, {2, 3}, [[0]]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+
+from horton import conway, grid
+from horton.disk import DiskGrid
+
+
+class CountingDiskGrid(DiskGrid):
+
+    reads = 0
+
+    def _tile(self, key):
+        if key not in self._cache:
+            self.reads += 1
+        return super(CountingDiskGrid, self)._tile(key)
+
+
+class TestDiskGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'world.horton')
+        self.g = DiskGrid(10, 7, tile_size=4, cache_tiles=2, path=self.path)
+
+    def tearDown(self):
+        self.g.close()
+        shutil.rmtree(self.directory)
+
+    def test_getitem_and_setitem(self):
+        self.g[9, 6] = 3
+        self.g[0, 0] = -1
+        self.assertEqual(self.g[9, 6], 3)
+        self.assertEqual(self.g[0, 0], -1)
+        self.assertEqual(self.g[5, 5], 0)
+
+    def test_invalid_location_raises_error(self):
+        with self.assertRaises(KeyError):
+            self.g[10, 0]
+        with self.assertRaises(KeyError):
+            self.g[0, 7] = 1
+
+    def test_evicted_tiles_are_written_back(self):
+        points = [(0, 0), (5, 0), (9, 0), (0, 4), (5, 4), (9, 6)]
+        for n, point in enumerate(points):
+            self.g[point] = n + 1
+        self.assertLessEqual(len(self.g._cache), 2)
+        for n, point in enumerate(points):
+            self.assertEqual(self.g[point], n + 1)
+
+    def test_flat_values_are_row_major(self):
+        g = grid.Grid(10, 7)
+        for x, y in [(0, 0), (3, 4), (4, 4), (9, 6), (8, 1)]:
+            g[x, y] = x + y
+            self.g[x, y] = x + y
+        self.assertEqual(list(self.g), list(g))
+        self.assertEqual(self.g, g)
+        self.assertEqual([(y, list(values))
+                          for y, values in self.g.iter_row_chunks(3)],
+                         [(y, list(values))
+                          for y, values in g.iter_row_chunks(3)])
+
+    def test_reopen(self):
+        self.g[7, 5] = 9
+        self.g.close()
+        self.g = DiskGrid.open(self.path, readonly=True)
+        self.assertEqual(self.g.dimensions, (10, 7))
+        self.assertEqual(self.g[7, 5], 9)
+        with self.assertRaises(TypeError):
+            self.g[7, 5] = 1
+
+    def test_open_rejects_other_files(self):
+        other = os.path.join(self.directory, 'other')
+        with open(other, 'wb') as f:
+            f.write(b'not a grid' * 10)
+        with self.assertRaises(ValueError):
+            DiskGrid.open(other)
+
+    def test_fill_and_patch(self):
+        self.g[1, 1] = 5
+        self.g.fill(2)
+        self.assertEqual(set(self.g), {2})
+        self.g.apply_patch([(3, [7, 7, 7, 7, 7, 7, 7, 7, 7])])
+        self.assertEqual(list(self.g)[:13], [2, 2, 2] + [7] * 9 + [2])
+
+    def test_arithmetic_returns_a_grid(self):
+        self.g[2, 3] = 4
+        result = self.g * 2
+        self.assertIs(type(result), grid.Grid)
+        self.assertEqual(result[2, 3], 8)
+
+    def test_copy(self):
+        self.g[4, 4] = 6
+        with DiskGrid.copy(self.g) as copied:
+            self.assertEqual(copied, self.g)
+            copied[4, 4] = 0
+            self.assertEqual(self.g[4, 4], 6)
+
+    def test_temporary_file_is_removed(self):
+        g = DiskGrid(3, 3)
+        path = g.path
+        self.assertTrue(os.path.exists(path))
+        g.close()
+        self.assertFalse(os.path.exists(path))
+
+    def test_collected_temporary_file_is_removed(self):
+        paths = [DiskGrid(3, 3).path, DiskGrid.copy(self.g).path]
+        gc.collect()
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+
+    def test_step_rows(self):
+        seed = grid.Grid(10, 7)
+        seed.randomize(rng=3)
+        for cls in (grid.Grid, grid.Torus):
+            world = cls.from_array(10, 7, seed._grid)
+            out = DiskGrid(10, 7, tile_size=4, cache_tiles=2)
+            with out:
+                conway.step_rows(world, out, rows=3)
+                self.assertEqual(out, conway.step(world))
+
+    def test_step_rows_from_disk(self):
+        seed = grid.Grid(10, 7)
+        seed.randomize(rng=5)
+        self.g.apply_patch([(0, seed._grid)])
+        with DiskGrid(10, 7, tile_size=4) as out:
+            conway.step_rows(self.g, out, rows=2)
+            self.assertEqual(out, conway.step(seed))
+
+    def test_bands_read_each_tile_once(self):
+        g = CountingDiskGrid(80, 20, tile_size=10, cache_tiles=2)
+        g.apply_patch([(0, list(range(100)) * 16)])
+        self.assertEqual(g.reads, 16)
+        g.reads = 0
+        bands = list(g.iter_row_chunks(20))
+        self.assertEqual(g.reads, 16)
+        self.assertEqual(bands[0][1], list(range(100)) * 16)
+        g.close()
+
+    def test_hash_and_equality_by_tile(self):
+        for x, y, value in [(9, 6, 3), (0, 0, -1), (4, 3, 2)]:
+            self.g[x, y] = value
+        plain = grid.Grid.from_array(10, 7, list(self.g))
+        other = DiskGrid(10, 7, 5, tile_size=4)
+        other._store(plain._grid)
+        self.assertEqual(hash(self.g), hash(plain))
+        self.assertEqual(self.g, plain)
+        self.assertEqual(plain, self.g)
+        self.assertEqual(self.g, other)
+        other[5, 5] = 1
+        self.assertNotEqual(self.g, other)
+        other.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
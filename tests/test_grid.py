@@ -1,5 +1,5 @@
+import random
 import unittest
-import weakref
 
 from horton import grid
 
@@ -36,7 +36,7 @@ class TestGridSliceProxy(unittest.TestCase):
             self.proxy[-1, -1] = 2
 
     def test_slice_reference_error(self):
-        with self.assertRaises(weakref.ReferenceError):
+        with self.assertRaises(ReferenceError):
             del(self.g)
             self.proxy[1, 1] = 2
 
@@ -146,6 +146,39 @@ class TestGrid(unittest.TestCase):
         g = grid.Grid(2, 2)
         self.assertEqual(g.coordinates, [(0, 0), (1, 0), (0, 1), (1, 1)])
 
+    def test_coordinates_are_not_cached_by_default(self):
+        g = grid.Grid(2, 2)
+        self.assertFalse(g.coordinates is g.coordinates)
+        g.cache_coordinates()
+        self.assertTrue(g.coordinates is g.coordinates)
+        g.cache_coordinates(False)
+        self.assertEqual(g._coordinates, None)
+
+    def test_cache_coordinates_of_empty_grid(self):
+        g = grid.Grid(0, 3)
+        g.cache_coordinates()
+        self.assertEqual(g._coordinates, [])
+        self.assertTrue(g.coordinates is g._coordinates)
+
+    def test_iter_coordinates(self):
+        g = grid.Grid(3, 2)
+        self.assertEqual(list(g.iter_coordinates()), g.coordinates)
+        self.assertEqual(g._coordinates, None)
+
+    def test_iter_indices(self):
+        g = grid.Grid.from_array(2, 2, [0, 3, 0, 4])
+        self.assertEqual(list(g.iter_indices()), [0, 1, 2, 3])
+        self.assertEqual(list(g.iter_indices(lambda v: v > 3)), [3])
+
+    def test_iter_row_chunks(self):
+        g = grid.Grid.from_array(2, 3, list(range(6)))
+        self.assertEqual([(y, list(values))
+                          for y, values in g.iter_row_chunks(1)],
+                         [(0, [0, 1]), (1, [2, 3]), (2, [4, 5])])
+        self.assertEqual([y for y, _ in g.iter_row_chunks()], [0])
+        with self.assertRaises(ValueError):
+            list(g.iter_row_chunks(0))
+
     def test_values(self):
         g = grid.Grid(2, 2)
         g[0, 0] = 2
@@ -194,3 +227,388 @@ class TestGrid(unittest.TestCase):
         sub = self.g[1:1, 2:2]
         sub[0, 0] = "foo"
         self.assertEqual(self.g[1, 1], "foo")
+
+    def test_diff(self):
+        other = grid.Grid.copy(self.g)
+        other[1, 0] = 1
+        other[2, 0] = 2
+        other[4, 4] = 3
+        self.assertEqual(self.g.diff(other),
+                         [(1, [1, 2]), (24, [3])])
+
+    def test_diff_of_equal_grids_is_empty(self):
+        self.assertEqual(self.g.diff(grid.Grid(5, 5)), [])
+
+    def test_diff_rejects_other_values(self):
+        with self.assertRaises(TypeError):
+            self.g.diff([0] * 25)
+        with self.assertRaises(ValueError):
+            self.g.diff(grid.Grid(25, 1))
+
+    def test_apply_patch(self):
+        other = grid.Grid(5, 5, value="foo")
+        other[0, 0] = "bar"
+        self.g.apply_patch(self.g.diff(other))
+        self.assertEqual(self.g, other)
+
+    def test_apply_patch_outside_grid_raises_error(self):
+        with self.assertRaises(KeyError):
+            self.g.apply_patch([(24, [1, 2])])
+
+    def test_grid_scalar_addition(self):
+        self.g[0, 0] = 1
+        g = self.g + 2
+        self.assertEqual(g[0, 0], 3)
+        self.assertEqual(g[1, 1], 2)
+        self.assertEqual((2 + self.g)[0, 0], 3)
+
+    def test_grid_reflected_subtraction(self):
+        self.g[0, 0] = 1
+        self.assertEqual((5 - self.g)[0, 0], 4)
+
+    def test_grid_multiplication(self):
+        self.g[1, 1] = 3
+        g1 = grid.Grid(5, 5, value=2)
+        self.assertEqual((self.g * g1)[1, 1], 6)
+        self.assertEqual((self.g * 3)[1, 1], 9)
+
+    def test_grid_division(self):
+        g = grid.Grid(2, 1, value=3)
+        self.assertEqual(list(g / 2), [1.5, 1.5])
+        self.assertEqual(list(6 / g), [2, 2])
+
+    def test_grid_inplace_addition(self):
+        values = [1, 2, 3, 4]
+        g = grid.Grid.from_array(2, 2, values, copy=False)
+        g += 1
+        self.assertEqual(values, [2, 3, 4, 5])
+        g -= grid.Grid.from_array(2, 2, [1, 1, 1, 1])
+        self.assertEqual(list(g), [1, 2, 3, 4])
+
+    def test_arithmetic_keeps_grid_type(self):
+        t = grid.Torus(2, 2)
+        self.assertTrue(isinstance(t + t, grid.Torus))
+        self.assertTrue(isinstance(t * 2, grid.Torus))
+
+    def test_comparisons(self):
+        g = grid.Grid.from_array(3, 1, [1, 2, 3])
+        self.assertEqual(list(g < 2), [True, False, False])
+        self.assertEqual(list(g >= 2), [False, True, True])
+        self.assertEqual(list(g.eq(2)), [False, True, False])
+        self.assertEqual(list(g.ne(g)), [False, False, False])
+
+    def test_mask_and_where(self):
+        g = grid.Grid.from_array(3, 1, [1, 2, 3])
+        odd = g.mask(lambda v: v % 2)
+        self.assertEqual(list(odd), [True, False, True])
+        self.assertEqual(list(g.where(odd, 0)), [1, 0, 3])
+        self.assertEqual(list(g.where(odd, g * 10)), [1, 20, 3])
+
+    def test_reductions(self):
+        g = grid.Grid.from_array(3, 2, [1, 0, 7,
+                                        -2, 7, 0])
+        self.assertEqual(g.sum(), 13)
+        self.assertEqual(g.count(), 4)
+        self.assertEqual(g.count(lambda v: v > 1), 2)
+        self.assertEqual(g.min(), -2)
+        self.assertEqual(g.max(), 7)
+        self.assertEqual(g.argmax(), (2, 0))
+        self.assertEqual(g.argmin(), (0, 1))
+
+    def test_convolve_zero_boundary(self):
+        g = grid.Grid.from_array(3, 2, [1, 2, 3,
+                                        4, 5, 6])
+        result = g.convolve([[0, 0, 0],
+                             [1, 0, 1],
+                             [0, 0, 0]])
+        self.assertEqual(list(result), [2, 4, 2,
+                                        5, 10, 5])
+
+    def test_convolve_clamp_boundary(self):
+        g = grid.Grid.from_array(3, 1, [1, 2, 3])
+        result = g.convolve([[1, 1, 1]], boundary='clamp')
+        self.assertEqual(list(result), [4, 6, 8])
+
+    def test_convolve_separable_kernel(self):
+        g = grid.Grid.from_array(3, 3, [1, 2, 3,
+                                        4, 5, 6,
+                                        7, 8, 9])
+        result = g.convolve([[1, 2, 1],
+                             [2, 4, 2],
+                             [1, 2, 1]])
+        self.assertEqual(result[1, 1], 80)
+        self.assertEqual(result[0, 0], 4 * 1 + 2 * 2 + 2 * 4 + 5)
+
+    def test_convolve_integer_kernel_stays_exact(self):
+        cells = [(x * 7919 + 104729) ** 2 % 10 ** 7 for x in range(30)]
+        g = grid.Grid.from_array(6, 5, cells)
+        kernel = [[2, 4, 2],
+                  [1, 2, 1],
+                  [0, 0, 0]]
+        expected = [sum(kernel[ky][kx] * g.get(x + kx - 1, y + ky - 1, 0)
+                        for ky in range(3) for kx in range(3))
+                    for y in range(5) for x in range(6)]
+        result = list(g.convolve(kernel))
+        self.assertEqual(result, expected)
+        self.assertTrue(all(type(v) is int for v in result))
+
+    def test_convolve_with_grid_kernel(self):
+        kernel = grid.Grid.from_array(1, 3, [1, 0, 0])
+        g = grid.Grid.from_array(2, 2, [1, 2,
+                                        3, 4])
+        self.assertEqual(list(g.convolve(kernel)), [0, 0, 1, 2])
+
+    def test_convolve_rejects_even_kernel(self):
+        with self.assertRaises(ValueError):
+            self.g.convolve([[1, 1]])
+
+    def test_convolve_rejects_unknown_boundary(self):
+        with self.assertRaises(ValueError):
+            self.g.convolve([[1]], boundary='mirror')
+
+    def test_typed_grid(self):
+        g = grid.Grid.typed(3, 2, 'B', 7)
+        self.assertEqual(g[2, 1], 7)
+        g[2, 1] = 1
+        g += 1
+        self.assertEqual(list(g), [8, 8, 8, 8, 8, 2])
+        self.assertEqual(g, grid.Grid.from_array(3, 2, [8, 8, 8, 8, 8, 2]))
+
+    def test_watch(self):
+        changes = []
+        self.g.watch(lambda x, y: changes.append((x, y)))
+        self.g[1, 2] = 1
+        self.g += 1
+        self.assertEqual(changes, [(1, 2), (None, None)])
+
+    def test_unwatch(self):
+        changes = []
+        self.g.watch(changes.append)
+        self.g.unwatch(changes.append)
+        self.g[1, 2] = 1
+        self.assertEqual(changes, [])
+
+    def test_label_components(self):
+        g = grid.Grid.from_array(4, 3, [1, 0, 0, 1,
+                                        0, 1, 0, 1,
+                                        0, 0, 0, 0])
+        components = g.label_components()
+        self.assertEqual(components.count, 3)
+        self.assertEqual(list(components.labels), [1, 0, 0, 2,
+                                                   0, 3, 0, 2,
+                                                   0, 0, 0, 0])
+        self.assertEqual(components.sizes, [8, 1, 2, 1])
+        self.assertEqual(components.bounds, [None, (0, 0, 0, 0),
+                                             (3, 0, 3, 1), (1, 1, 1, 1)])
+
+    def test_label_components_with_diagonals(self):
+        g = grid.Grid.from_array(3, 2, [1, 0, 1,
+                                        0, 1, 0])
+        components = g.label_components(connectivity=8)
+        self.assertEqual(components.count, 1)
+        self.assertEqual(components.bounds[1], (0, 0, 2, 1))
+
+    def test_label_components_with_predicate(self):
+        g = grid.Grid.from_array(3, 1, ["a", "b", "b"])
+        components = g.label_components(lambda cell: cell == "b")
+        self.assertEqual(list(components.labels), [0, 1, 1])
+
+    def test_label_components_rejects_bad_connectivity(self):
+        with self.assertRaises(ValueError):
+            self.g.label_components(connectivity=6)
+
+    def test_flood_fill(self):
+        g = grid.Grid.from_array(4, 3, [0, 0, 1, 0,
+                                        1, 0, 1, 0,
+                                        0, 0, 1, 0])
+        self.assertEqual(g.flood_fill((1, 0), 5), 5)
+        self.assertEqual(list(g), [5, 5, 1, 0,
+                                   1, 5, 1, 0,
+                                   5, 5, 1, 0])
+
+    def test_flood_fill_large_region(self):
+        g = grid.Grid(300, 300)
+        self.assertEqual(g.flood_fill((150, 150), 1), 90000)
+
+    def test_flood_fill_with_same_value(self):
+        self.assertEqual(self.g.flood_fill((0, 0), 0), 0)
+
+    def test_fill(self):
+        changes = []
+        g = grid.Grid.typed(3, 2, 'b')
+        g.watch(lambda x, y: changes.append((x, y)))
+        g.fill(4)
+        self.assertEqual(list(g), [4] * 6)
+        self.assertEqual(g._grid.typecode, 'b')
+        self.assertEqual(changes, [(None, None)])
+
+    def test_fill_copies_mutable_values(self):
+        g = grid.Grid(2, 1)
+        g.fill([])
+        g[0, 0].append(1)
+        self.assertEqual(g[1, 0], [])
+
+    def test_randomize(self):
+        g = grid.Grid(100, 50)
+        g.randomize(0.3, rng=7)
+        self.assertTrue(set(g) <= set([0, 1]))
+        self.assertTrue(1200 < g.count() < 1800)
+        h = grid.Grid(100, 50)
+        h.randomize(0.3, rng=7)
+        self.assertEqual(g, h)
+        g.randomize(0.9, rng=7)
+        self.assertTrue(4300 < g.count() < 4700)
+
+    def test_randomize_extremes(self):
+        self.g.randomize(0)
+        self.assertEqual(self.g.count(), 0)
+        self.g.randomize(1)
+        self.assertEqual(self.g.count(), len(self.g))
+        with self.assertRaises(ValueError):
+            self.g.randomize(1.5)
+
+    def test_random_coordinate(self):
+        rng = random.Random(3)
+        seen = set(self.g.random_coordinate(rng) for _ in range(500))
+        self.assertEqual(seen, set(self.g.coordinates))
+
+    def test_sample(self):
+        coordinates = self.g.sample(10, rng=5)
+        self.assertEqual(len(set(coordinates)), 10)
+        self.assertTrue(all(self.g._is_valid_location(x, y)
+                            for x, y in coordinates))
+        self.assertEqual(coordinates, self.g.sample(10, rng=5))
+        with self.assertRaises(ValueError):
+            self.g.sample(len(self.g) + 1)
+
+    def test_sample_with_predicate(self):
+        g = grid.Grid(50, 50)
+        g[3, 4] = g[40, 2] = g[7, 49] = 1
+        self.assertEqual(sorted(g.sample(3, predicate=bool, rng=1)),
+                         [(3, 4), (7, 49), (40, 2)])
+        g.fill(1)
+        self.assertEqual(len(set(g.sample(20, predicate=bool))), 20)
+        with self.assertRaises(ValueError):
+            g.sample(1, predicate=lambda cell: cell == 2)
+
+    def test_hash_of_equal_grids(self):
+        a = grid.Grid.from_array(3, 2, [0, 1, 2, 3, 4, 5])
+        b = grid.Grid.typed(3, 2, 'l')
+        for idx, value in enumerate(a._grid):
+            b[idx % 3, idx // 3] = value
+        self.assertEqual(hash(a), hash(b))
+        cache = {a: 'seen'}
+        self.assertEqual(cache[grid.Torus.copy(b)], 'seen')
+
+    def test_hash_follows_setitem(self):
+        rng = random.Random(9)
+        hash(self.g)
+        for _ in range(100):
+            self.g[rng.randrange(3), rng.randrange(3)] = rng.randint(0, 3)
+            self.assertEqual(hash(self.g),
+                             grid._content_hash(list(self.g)))
+
+    def test_bulk_writes_reset_hash(self):
+        before = hash(self.g)
+        self.g.fill(7)
+        self.assertIsNone(self.g._hash)
+        self.assertNotEqual(hash(self.g), before)
+        self.g.apply_patch([(0, [1, 2])])
+        self.assertEqual(hash(self.g), grid._content_hash(list(self.g)))
+
+    def test_eq_short_circuits_on_hash(self):
+        a = grid.Grid(3, 3)
+        b = grid.Grid(3, 3)
+        b[1, 1] = 1
+        hash(a), hash(b)
+        # Different hashes decide before the values are compared.
+        b._grid = a._grid
+        self.assertNotEqual(a, b)
+        self.assertEqual(a, a)
+
+    def test_eq_with_other_types(self):
+        self.assertIs(self.g.__eq__([0] * 25), NotImplemented)
+        self.assertFalse(self.g == [0] * 25)
+        self.assertTrue(self.g != None)
+
+
+class TestTorus(unittest.TestCase):
+
+    def test_convolve_wraps(self):
+        t = grid.Torus.from_array(3, 3, [1, 0, 0,
+                                         0, 0, 0,
+                                         0, 0, 0])
+        result = t.convolve([[1, 1, 1],
+                             [1, 0, 1],
+                             [1, 1, 1]])
+        self.assertTrue(isinstance(result, grid.Torus))
+        self.assertEqual(list(result), [0, 1, 1,
+                                        1, 1, 1,
+                                        1, 1, 1])
+
+    def test_non_square_getitem(self):
+        t = grid.Torus.from_array(3, 2, [1, 2, 3,
+                                         4, 5, 6])
+        self.assertEqual(t[2, 1], 6)
+        self.assertEqual(t[0, 1], 4)
+        self.assertEqual(t[-1, -1], 6)
+        self.assertEqual(t[3, 2], 1)
+        self.assertEqual(t[4, -3], 5)
+
+    def test_non_square_setitem(self):
+        t = grid.Torus(2, 4)
+        t[1, 3] = 1
+        t[-2, 4] = 2
+        self.assertEqual(list(t), [2, 0,
+                                   0, 0,
+                                   0, 0,
+                                   0, 1])
+
+    def test_far_coordinates_wrap(self):
+        t = grid.Torus.from_array(3, 2, [1, 2, 3,
+                                         4, 5, 6])
+        self.assertEqual(t[-7, 5], 6)
+        self.assertEqual(t[31, -20], 2)
+        changes = []
+        t.watch(lambda x, y: changes.append((x, y)))
+        t[-4, 9] = 0
+        t[5, -1] = 0
+        self.assertEqual(changes, [(2, 1), (2, 1)])
+        self.assertEqual(list(t), [1, 2, 3,
+                                   4, 5, 0])
+
+    def test_wrapped_slice(self):
+        t = grid.Torus.from_array(3, 2, [1, 2, 3,
+                                         4, 5, 6])
+        sub = t[2:1, 3:2]
+        self.assertEqual(sub[0, 0], 6)
+        self.assertEqual(sub[1, 0], 4)
+        self.assertEqual(sub[1, 1], 1)
+        sub[1, 1] = 0
+        self.assertEqual(t[0, 0], 0)
+
+    def test_shift(self):
+        t = grid.Torus.from_array(3, 2, [1, 2, 3,
+                                         4, 5, 6])
+        self.assertEqual(list(t.shift(-1, 0)), [2, 3, 1,
+                                                5, 6, 4])
+        self.assertEqual(list(t.shift(0, 3)), [4, 5, 6,
+                                               1, 2, 3])
+        self.assertEqual(t.shift(3, 2), t)
+
+    def test_label_components_wrap(self):
+        t = grid.Torus.from_array(4, 3, [1, 0, 0, 1,
+                                         0, 0, 0, 0,
+                                         1, 0, 0, 0])
+        components = t.label_components()
+        self.assertEqual(components.count, 1)
+        self.assertEqual(components.sizes, [9, 3])
+        self.assertEqual(components.bounds[1], (3, 2, 4, 3))
+        self.assertTrue(isinstance(components.labels, grid.Torus))
+
+    def test_flood_fill_wraps(self):
+        t = grid.Torus.from_array(3, 2, [0, 1, 0,
+                                         1, 1, 1])
+        self.assertEqual(t.flood_fill((0, 0), 2), 2)
+        self.assertEqual(list(t), [2, 1, 2,
+                                   1, 1, 1])
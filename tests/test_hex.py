@@ -0,0 +1,163 @@
+import unittest
+from collections import deque
+
+from horton import conway, grid
+from horton.checkpoint import dumps, loads
+from horton.history import History
+from horton.hex import DIRECTIONS, HexGrid, HexTorus
+from horton.path import FlowField, PathFinder
+
+
+LAYOUTS = ('axial', 'odd-r', 'even-r')
+
+
+def steps_from(world, start):
+    table = world.neighbour_table()
+    steps = {start: 0}
+    queue = deque([start])
+    while queue:
+        idx = queue.popleft()
+        for n in table[6 * idx:6 * idx + 6]:
+            if n >= 0 and n not in steps:
+                steps[n] = steps[idx] + 1
+                queue.append(n)
+    return steps
+
+
+class TestHexGrid(unittest.TestCase):
+
+    def test_neighbours_are_axial_directions(self):
+        for layout in LAYOUTS:
+            g = HexGrid(7, 6, layout=layout)
+            for x, y in [(3, 2), (3, 3)]:
+                q, r = g.to_axial(x, y)
+                self.assertEqual(g.from_axial(q, r), (x, y))
+                expected = [g.from_axial(q + dq, r + dr)
+                            for dq, dr in DIRECTIONS]
+                self.assertEqual(g.neighbours(x, y), expected)
+
+    def test_edges(self):
+        g = HexGrid(4, 4, layout='odd-r')
+        self.assertEqual(sorted(g.neighbours(0, 0)), [(0, 1), (1, 0)])
+        with self.assertRaises(KeyError):
+            g.neighbours(4, 0)
+        t = HexTorus(4, 4, layout='odd-r')
+        self.assertEqual(len(set(t.neighbours(0, 0))), 6)
+        with self.assertRaises(ValueError):
+            HexTorus(4, 3, layout='odd-r')
+        with self.assertRaises(ValueError):
+            HexGrid(4, 3, layout='square')
+
+    def test_distance_matches_table(self):
+        for cls in (HexGrid, HexTorus):
+            for layout in LAYOUTS:
+                g = cls(7, 6, layout=layout)
+                for start in (0, 17, 41):
+                    for idx, steps in steps_from(g, start).items():
+                        self.assertEqual(
+                            g.distance((start % 7, start // 7),
+                                       (idx % 7, idx // 7)), steps)
+
+    def test_layout_survives_copies(self):
+        g = HexTorus.from_array(3, 2, [0, 1, 2, 3, 4, 5], layout='even-r')
+        for other in (HexTorus.copy(g), g + 1, g.shift(1, 0),
+                      HexTorus.typed(3, 2, 'b', layout='even-r')):
+            self.assertIs(type(other), HexTorus)
+            self.assertEqual(other.layout, 'even-r')
+
+    def test_layout_survives_history_and_checkpoints(self):
+        world = HexTorus.from_array(3, 2, [0, 1, 0, 1, 1, 0],
+                                    layout='odd-r')
+        history = History()
+        history.record(world)
+        history.record(conway.step(world))
+        for restored, expected in ((history[0], world),
+                                   (history[1], conway.step(world)),
+                                   (loads(dumps(world)), world)):
+            self.assertIs(type(restored), HexTorus)
+            self.assertEqual(restored.layout, 'odd-r')
+            self.assertEqual(restored, expected)
+            self.assertEqual(restored.neighbours(0, 1),
+                             world.neighbours(0, 1))
+            self.assertEqual(conway.step(restored), conway.step(expected))
+
+    def test_step_counts_six_neighbours(self):
+        for cls in (HexGrid, HexTorus):
+            for layout in LAYOUTS:
+                cells = [(x * 7 + y * 3) % 5 < 2 for x in range(8)
+                         for y in range(6)]
+                world = cls.from_array(8, 6, [int(c) for c in cells],
+                                       layout=layout)
+                table = world.neighbour_table()
+                expected = []
+                for idx, cell in enumerate(world._grid):
+                    n = sum(world._grid[i]
+                            for i in table[6 * idx:6 * idx + 6] if i >= 0)
+                    expected.append(int(n == 2 if cell == 0 else n in (3, 4)))
+                stepped = conway.step(world)
+                self.assertEqual(list(stepped), expected)
+                self.assertEqual(stepped.layout, layout)
+
+    def test_step_larger_hex_neighbourhood(self):
+        rule = conway.Rule({3}, {2, 3}, conway.neighbourhood(2, 'hex'))
+        world = HexTorus.from_array(6, 4, [1, 0, 0, 1, 0, 1] * 4,
+                                    layout='odd-r')
+        coordinates = list(world.iter_coordinates())
+        expected = []
+        for here, cell in zip(coordinates, world):
+            n = sum(world[there] for there in coordinates
+                    if 0 < world.distance(here, there) <= 2)
+            expected.append(int(n == 3 if cell == 0 else n in (2, 3)))
+        self.assertEqual(list(conway.step(world, rule)), expected)
+
+    def test_step_rows_follows_hex_rules(self):
+        cells = [int((x * 7 + y * 3) % 5 < 2) for y in range(8)
+                 for x in range(6)]
+        larger = conway.Rule({3}, {2, 3}, conway.neighbourhood(2, 'hex'))
+        for cls in (HexGrid, HexTorus):
+            for layout in LAYOUTS:
+                world = cls.from_array(6, 8, cells, layout=layout)
+                for rule in (None, larger):
+                    for rows in (1, 3, 8):
+                        out = grid.Grid(6, 8)
+                        conway.step_rows(world, out, rows, rule)
+                        self.assertEqual(list(out),
+                                         list(conway.step(world, rule)))
+
+    def test_square_rules_still_apply_to_grids(self):
+        blinker = grid.Grid.from_array(3, 3, [0, 0, 0, 1, 1, 1, 0, 0, 0])
+        self.assertEqual(list(conway.step(blinker)),
+                         [0, 1, 0, 0, 1, 0, 0, 1, 0])
+
+
+class TestHexPaths(unittest.TestCase):
+
+    def setUp(self):
+        self.world = HexGrid.from_array(5, 4, [0, 0, 0, 0, 0,
+                                               0, 1, 1, 1, 0,
+                                               0, 0, 0, 1, 0,
+                                               1, 1, 0, 0, 0],
+                                        layout='odd-r')
+        self.finder = PathFinder(self.world)
+
+    def test_paths_step_between_neighbours(self):
+        for method in ('bfs', 'dijkstra', 'astar'):
+            path = getattr(self.finder, method)((0, 0), (4, 3))
+            self.assertEqual(len(path), 7)
+            for a, b in zip(path, path[1:]):
+                self.assertIn(b, self.world.neighbours(*a))
+
+    def test_flow_field(self):
+        field = FlowField(self.world, [(4, 3)])
+        self.assertEqual(field.distance(0, 0), 6.0)
+        self.assertEqual(field.next_step(4, 1), (4, 2))
+
+    def test_unsupported_options(self):
+        with self.assertRaises(ValueError):
+            PathFinder(self.world, walls=True)
+        with self.assertRaises(ValueError):
+            self.finder.jps((0, 0), (4, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
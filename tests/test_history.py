@@ -0,0 +1,105 @@
+import unittest
+
+from horton import grid
+from horton.history import History
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.world = grid.Grid(4, 4)
+        self.history = History(chunk_size=4)
+        self.history.record(self.world)
+        self.world[3, 3] = 1
+        self.history.record(self.world)
+        self.world[0, 0] = 2
+        self.history.record(self.world)
+
+    def test_len(self):
+        self.assertEqual(len(self.history), 3)
+
+    def test_getitem(self):
+        self.assertEqual(self.history[0], grid.Grid(4, 4))
+        self.assertEqual(self.history[1][3, 3], 1)
+        self.assertEqual(self.history[1][0, 0], 0)
+        self.assertEqual(self.history[-1], self.world)
+
+    def test_snapshot_is_not_affected_by_later_writes(self):
+        self.world[1, 1] = 5
+        self.assertEqual(self.history[2][1, 1], 0)
+
+    def test_unchanged_chunks_are_shared(self):
+        first, second, third = self.history._snapshots
+        self.assertTrue(first[1] is second[1])
+        self.assertTrue(first[0] is second[0])
+        self.assertFalse(first[3] is second[3])
+        self.assertTrue(second[3] is third[3])
+
+    def test_snapshot_keeps_grid_type(self):
+        history = History()
+        history.record(grid.Torus(2, 2))
+        self.assertTrue(isinstance(history[0], grid.Torus))
+
+    def test_record_reads_only_dirty_chunks(self):
+        reads = []
+        values = self.world._grid
+
+        class Spy(list):
+            def __getitem__(self, key):
+                reads.append(key)
+                return list.__getitem__(self, key)
+
+        self.world._grid = Spy(values)
+        self.world[1, 2] = 3
+        self.history.record(self.world)
+        self.assertEqual(reads, [slice(8, 12)])
+        self.assertEqual(self.history[-1], self.world)
+        self.assertTrue(self.history._snapshots[2][3] is
+                        self.history._snapshots[3][3])
+
+    def test_bulk_change_is_compared(self):
+        self.world.fill(4)
+        self.history.record(self.world)
+        self.assertEqual(self.history[-1], self.world)
+        self.assertEqual(self.history[2][1, 1], 0)
+
+    def test_other_grid_is_compared(self):
+        world = grid.Grid.copy(self.world)
+        world[2, 1] = 6
+        self.history.record(world)
+        self.world[0, 3] = 8
+        self.history.record(self.world)
+        self.assertEqual(self.history[3][2, 1], 6)
+        self.assertEqual(self.history[4][2, 1], 0)
+        self.assertEqual(self.history[4][0, 3], 8)
+
+    def test_close(self):
+        self.history.close()
+        self.assertEqual(self.world._watchers, [])
+
+    def test_snapshot_keeps_typecode(self):
+        world = grid.Grid.typed(2, 2, 'h', 1)
+        history = History()
+        history.record(world)
+        self.assertEqual(history[0]._grid.typecode, 'h')
+        self.assertEqual(history[0], world)
+
+    def test_record_different_dimensions_raises_error(self):
+        with self.assertRaises(AssertionError):
+            self.history.record(grid.Grid(2, 2))
+
+    def test_rewind(self):
+        world = self.history.rewind(1)
+        self.assertEqual(len(self.history), 2)
+        self.assertEqual(world[3, 3], 1)
+        self.assertEqual(world[0, 0], 0)
+
+    def test_branch(self):
+        branch = self.history.branch(0)
+        world = branch[0]
+        world[2, 2] = 7
+        branch.record(world)
+        self.assertEqual(len(branch), 2)
+        self.assertEqual(len(self.history), 3)
+        self.assertEqual(branch[1][2, 2], 7)
+        self.assertEqual(self.history[1][2, 2], 0)
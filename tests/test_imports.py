@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import unittest
+
+import horton
+
+
+def loaded_after(statement, modules):
+    """ Return which of *modules* are loaded after running *statement*
+    in a fresh interpreter."""
+    check = ("import sys; {0}; "
+             "print(','.join(m for m in {1!r} if m in sys.modules))".format(
+                 statement, modules))
+    output = subprocess.check_output([sys.executable, '-c', check])
+    return [m for m in output.decode().strip().split(',') if m]
+
+
+class TestImports(unittest.TestCase):
+
+    def test_package_import_is_lazy(self):
+        self.assertEqual(loaded_after('import horton',
+                                      ['horton.grid', 'horton.conway']),
+                         [])
+
+    def test_submodule_attribute_access(self):
+        self.assertTrue(horton.grid.Grid is not None)
+        with self.assertRaises(AttributeError):
+            horton.nothing
+
+    def test_core_does_not_load_optional_dependencies(self):
+        statement = ('import horton.grid, horton.conway, horton.path, '
+                     'horton.maze, horton.chunked, horton.history, '
+                     'horton.backends, horton.records, horton.shared, '
+                     'horton.spatial, horton.checkpoint, horton.disk, '
+                     'horton.summary, horton.hex, horton.render.loop')
+        self.assertEqual(loaded_after(statement, ['numpy', 'pygame']), [])
@@ -0,0 +1,85 @@
+import time
+import unittest
+
+from horton import conway, grid
+from horton.render.loop import RateMeter, Simulation
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateMeter(unittest.TestCase):
+
+    def test_rate_over_window(self):
+        clock = FakeClock()
+        meter = RateMeter(window=1.0, clock=clock)
+        self.assertEqual(meter.rate, 0.0)
+        for n in range(30):
+            clock.now = n * 0.25
+            meter.tick()
+        self.assertEqual(meter.rate, 4.0)
+        self.assertEqual(len(meter._times), 5)
+
+
+class TestSimulation(unittest.TestCase):
+
+    def setUp(self):
+        self.blinker = grid.Grid.from_array(3, 3, [0, 0, 0,
+                                                   1, 1, 1,
+                                                   0, 0, 0])
+
+    def test_ticks_on_this_thread(self):
+        sim = Simulation(self.blinker, conway.step)
+        sim.run_ticks(3)
+        generation, world = sim.latest()
+        self.assertEqual(generation, 3)
+        self.assertEqual(list(world), [0, 1, 0, 0, 1, 0, 0, 1, 0])
+
+    def test_apply_changes_before_next_tick(self):
+        sim = Simulation(grid.Grid(2, 1), lambda world: world + 1)
+
+        def change(world):
+            world[0, 0] = 10
+            return world
+        sim.apply(change)
+        sim.tick()
+        self.assertEqual(list(sim.latest()[1]), [11, 1])
+
+    def test_background_thread(self):
+        with Simulation(self.blinker, conway.step) as sim:
+            self.assertTrue(sim.running)
+            deadline = time.monotonic() + 5
+            while sim.latest()[0] < 10 and time.monotonic() < deadline:
+                time.sleep(0.001)
+        self.assertFalse(sim.running)
+        self.assertTrue(sim.latest()[0] >= 10)
+        self.assertTrue(sim.ticks_per_second > 0)
+
+    def test_step_errors_are_raised_again(self):
+        def broken(world):
+            if sim.latest()[0] == 3:
+                raise ValueError("broken")
+            return world
+
+        for method in ('latest', 'stop'):
+            sim = Simulation(self.blinker, broken)
+            sim.start()
+            sim._thread.join(5)
+            self.assertFalse(sim.running)
+            with self.assertRaises(ValueError):
+                getattr(sim, method)()
+            self.assertEqual(sim.latest()[0], 3)
+            sim.stop()
+
+    def test_target_rate(self):
+        sim = Simulation(self.blinker, conway.step, rate=50)
+        sim.start()
+        time.sleep(0.2)
+        sim.stop()
+        self.assertTrue(2 <= sim.latest()[0] <= 20)
@@ -0,0 +1,69 @@
+import unittest
+
+from horton import maze
+
+
+def passages(grid):
+    """ Return the set of open edges, checking both sides agree."""
+    edges = set()
+    offsets = {maze.NORTH: (0, -1), maze.EAST: (1, 0),
+               maze.SOUTH: (0, 1), maze.WEST: (-1, 0)}
+    for y in range(grid.height):
+        for x in range(grid.width):
+            for direction, (dx, dy) in offsets.items():
+                if grid[x, y] & direction:
+                    continue
+                nx, ny = x + dx, y + dy
+                assert grid._is_valid_location(nx, ny)
+                assert not grid[nx, ny] & maze.OPPOSITE[direction]
+                edges.add(frozenset([(x, y), (nx, ny)]))
+    return edges
+
+
+class MazeTests(object):
+
+    generator = None
+
+    def assertPerfectMaze(self, grid):
+        edges = passages(grid)
+        self.assertEqual(len(edges), len(grid) - 1)
+        seen = set([(0, 0)])
+        stack = [(0, 0)]
+        while stack:
+            cell = stack.pop()
+            for edge in edges:
+                if cell in edge:
+                    other, = edge - set([cell])
+                    if other not in seen:
+                        seen.add(other)
+                        stack.append(other)
+        self.assertEqual(len(seen), len(grid))
+
+    def test_perfect_maze(self):
+        for width, height in [(1, 1), (1, 6), (7, 1), (9, 5), (6, 8)]:
+            self.assertPerfectMaze(self.generator(width, height, rng=3))
+
+    def test_seeded_maze_is_reproducible(self):
+        self.assertEqual(self.generator(10, 10, rng=7),
+                         self.generator(10, 10, rng=7))
+
+    def test_cells_are_wall_masks(self):
+        grid = self.generator(5, 5)
+        for cell in grid:
+            self.assertTrue(0 <= cell <= maze.ALL_WALLS)
+
+
+class TestBacktracker(MazeTests, unittest.TestCase):
+    generator = staticmethod(maze.backtracker)
+
+
+class TestPrim(MazeTests, unittest.TestCase):
+    generator = staticmethod(maze.prim)
+
+
+class TestKruskal(MazeTests, unittest.TestCase):
+    generator = staticmethod(maze.kruskal)
+
+
+class TestEller(MazeTests, unittest.TestCase):
+    generator = staticmethod(maze.eller)
@@ -0,0 +1,170 @@
+import random
+import unittest
+
+from horton import grid, maze
+from horton.path import FlowField, PathFinder, INFINITY, SQRT2
+
+
+def path_cost(path):
+    return sum(1 if abs(x1 - x2) + abs(y1 - y2) == 1 else SQRT2
+               for (x1, y1), (x2, y2) in zip(path, path[1:]))
+
+
+class TestPathFinder(unittest.TestCase):
+
+    def setUp(self):
+        self.world = grid.Grid.from_array(5, 4, [0, 0, 0, 0, 0,
+                                                 0, 1, 1, 1, 0,
+                                                 0, 0, 0, 1, 0,
+                                                 1, 1, 0, 0, 0])
+        self.finder = PathFinder(self.world)
+
+    def test_bfs(self):
+        self.assertEqual(self.finder.bfs((0, 2), (2, 2)),
+                         [(0, 2), (1, 2), (2, 2)])
+
+    def test_start_is_goal(self):
+        self.assertEqual(self.finder.astar((0, 0), (0, 0)), [(0, 0)])
+
+    def test_unreachable_goal(self):
+        self.assertEqual(self.finder.bfs((0, 0), (1, 1)), None)
+        self.world[4, 1] = 1
+        self.world[0, 1] = 1
+        self.finder.refresh()
+        self.assertEqual(self.finder.dijkstra((0, 0), (2, 2)), None)
+
+    def test_invalid_location_raises_error(self):
+        with self.assertRaises(KeyError):
+            self.finder.bfs((0, 0), (5, 0))
+
+    def test_search_methods_agree(self):
+        rng = random.Random(7)
+        for diagonal in (False, True):
+            for _ in range(50):
+                w, h = rng.randint(1, 10), rng.randint(1, 10)
+                world = grid.Grid.from_array(
+                    w, h, [int(rng.random() < 0.3) for _ in range(w * h)])
+                finder = PathFinder(world, diagonal=diagonal)
+                start = (rng.randrange(w), rng.randrange(h))
+                goal = (rng.randrange(w), rng.randrange(h))
+                paths = [finder.dijkstra(start, goal),
+                         finder.astar(start, goal),
+                         finder.jps(start, goal)]
+                if paths[0] is None:
+                    self.assertEqual(paths, [None, None, None])
+                    continue
+                for path in paths:
+                    self.assertEqual(path[0], start)
+                    self.assertEqual(path[-1], goal)
+                    self.assertAlmostEqual(path_cost(path),
+                                           path_cost(paths[0]))
+                    for x, y in path:
+                        self.assertEqual(world[x, y], 0)
+
+    def test_costs(self):
+        world = grid.Grid.from_array(3, 2, [1, 9, 1,
+                                            1, 1, 1])
+        finder = PathFinder(world, passable=lambda cell: True,
+                            cost=lambda cell: cell)
+        path = [(0, 0), (0, 1), (1, 1), (2, 1), (2, 0)]
+        self.assertEqual(finder.dijkstra((0, 0), (2, 0)), path)
+        self.assertEqual(finder.astar((0, 0), (2, 0)), path)
+        with self.assertRaises(ValueError):
+            finder.jps((0, 0), (2, 0))
+
+    def test_torus_paths_wrap(self):
+        world = grid.Torus.from_array(5, 1, [0, 0, 1, 0, 0])
+        finder = PathFinder(world)
+        self.assertEqual(finder.astar((1, 0), (3, 0)),
+                         [(1, 0), (0, 0), (4, 0), (3, 0)])
+
+    def test_maze_walls(self):
+        walls = maze.kruskal(8, 6, rng=1)
+        finder = PathFinder(walls, walls=True)
+        path = finder.bfs((0, 0), (7, 5))
+        offsets = {(0, -1): maze.NORTH, (1, 0): maze.EAST,
+                   (0, 1): maze.SOUTH, (-1, 0): maze.WEST}
+        for (x1, y1), (x2, y2) in zip(path, path[1:]):
+            self.assertFalse(walls[x1, y1] & offsets[x2 - x1, y2 - y1])
+
+    def test_find_paths(self):
+        queries = [((0, 0), (4, 3)), ((0, 0), (0, 2)),
+                   ((4, 0), (1, 1)), ((0, 2), (0, 0))]
+        for method in ('bfs', 'dijkstra', 'astar', 'jps'):
+            paths = self.finder.find_paths(queries, method)
+            self.assertEqual(len(paths[0]), 8)
+            self.assertEqual(paths[1], [(0, 0), (0, 1), (0, 2)])
+            self.assertEqual(paths[2], None)
+            self.assertEqual(paths[3], [(0, 2), (0, 1), (0, 0)])
+
+
+class TestFlowField(unittest.TestCase):
+
+    def setUp(self):
+        self.world = grid.Grid.from_array(4, 3, [0, 0, 0, 0,
+                                                 0, 1, 1, 0,
+                                                 0, 0, 0, 0])
+        self.field = FlowField(self.world, [(0, 0), (3, 2)])
+
+    def assertFieldMatchesRecompute(self, field, **kwargs):
+        world = field.grid
+        fresh = FlowField(world.__class__.from_array(world.width,
+                                                     world.height,
+                                                     list(world)),
+                          [(0, 0), (3, 2)], **kwargs)
+        self.assertEqual(list(field.distances), list(fresh.distances))
+
+    def test_distances(self):
+        self.assertEqual(list(self.field.distances),
+                         [0, 1, 2, 2,
+                          1, INFINITY, INFINITY, 1,
+                          2, 2, 1, 0])
+
+    def test_distances_hash_follows_repairs(self):
+        hash(self.field.distances)
+        self.world[0, 1] = 1
+        fresh = FlowField(grid.Grid.from_array(4, 3, list(self.world)),
+                          [(0, 0), (3, 2)])
+        self.assertEqual(hash(self.field.distances), hash(fresh.distances))
+        self.assertEqual(self.field.distances, fresh.distances)
+
+    def test_next_step(self):
+        self.assertEqual(self.field.next_step(0, 2), (0, 1))
+        self.assertEqual(self.field.next_step(0, 0), None)
+        self.assertEqual(self.field.next_step(1, 1), None)
+
+    def test_blocking_a_cell_repairs_the_field(self):
+        self.world[0, 1] = 1
+        self.assertEqual(self.field.distance(0, 2), 3)
+        self.world[1, 0] = 1
+        self.assertEqual(self.field.distance(2, 0), 3)
+        self.assertFieldMatchesRecompute(self.field)
+
+    def test_opening_a_cell_repairs_the_field(self):
+        self.world[2, 1] = 0
+        self.assertEqual(self.field.distance(2, 1), 2)
+        self.assertFieldMatchesRecompute(self.field)
+
+    def test_random_changes_match_recompute(self):
+        rng = random.Random(5)
+        for diagonal in (False, True):
+            world = grid.Torus(5, 4)
+            field = FlowField(world, [(0, 0), (3, 2)],
+                              passable=lambda cell: cell != 1,
+                              cost=lambda cell: cell + 1,
+                              diagonal=diagonal)
+            for _ in range(100):
+                world[rng.randrange(5), rng.randrange(4)] = rng.choice(
+                    [0, 1, 3])
+                self.assertFieldMatchesRecompute(
+                    field, passable=lambda cell: cell != 1,
+                    cost=lambda cell: cell + 1, diagonal=diagonal)
+
+    def test_bulk_changes_recompute(self):
+        self.world -= self.world
+        self.assertEqual(self.field.distance(1, 1), 2)
+
+    def test_close(self):
+        self.field.close()
+        self.world[0, 1] = 1
+        self.assertEqual(self.field.distance(0, 1), 1)
@@ -0,0 +1,88 @@
+import os
+import unittest
+
+from horton import grid
+from horton._optional import optional
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame = optional('pygame')
+if pygame is not None:
+    from horton.render.pg import Runner, SpriteCache, draw_cell, render_grid
+
+
+def pixels(surface):
+    return pygame.image.tobytes(surface, 'RGB')
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class TestSpriteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.world = grid.Grid.from_array(4, 3, [0, 1, 0, 2,
+                                                 1, 1, 0, 0,
+                                                 2, 0, 1, 0])
+        self.drawn = []
+
+    def render_cell(self, surface, cell, x, y, width, height):
+        self.drawn.append((cell, width, height))
+        draw_cell(surface, cell, x, y, width, height)
+
+    def test_one_sprite_per_key_and_size(self):
+        sprites = SpriteCache(self.render_cell)
+        surface = pygame.Surface((40, 30))
+        for _ in range(3):
+            render_grid(surface, self.world, 0, 0, 40, 30, sprites=sprites)
+        self.assertEqual(len(sprites), 3)
+        self.assertEqual(sorted(self.drawn),
+                         [(0, 10, 10), (1, 10, 10), (2, 10, 10)])
+
+    def test_key_function(self):
+        sprites = SpriteCache(self.render_cell, key=bool)
+        render_grid(pygame.Surface((40, 30)), self.world, 0, 0, 40, 30,
+                    sprites=sprites)
+        self.assertEqual(len(sprites), 2)
+        self.assertEqual(len(self.drawn), 2)
+
+    def test_resize_redraws_sprites(self):
+        sprites = SpriteCache(self.render_cell)
+        render_grid(pygame.Surface((40, 30)), self.world, 0, 0, 40, 30,
+                    sprites=sprites)
+        render_grid(pygame.Surface((80, 60)), self.world, 0, 0, 80, 60,
+                    sprites=sprites)
+        self.assertEqual(len(sprites), 3)
+        self.assertEqual(len(self.drawn), 6)
+        self.assertEqual(sorted(self.drawn[3:]),
+                         [(0, 20, 20), (1, 20, 20), (2, 20, 20)])
+
+    def test_blits_match_drawing_each_cell(self):
+        for padding in (0, 1):
+            drawn = pygame.Surface((40, 30))
+            blitted = pygame.Surface((40, 30))
+            render_grid(drawn, self.world, 0, 0, 40, 30, padding)
+            render_grid(blitted, self.world, 0, 0, 40, 30, padding,
+                        sprites=SpriteCache())
+            self.assertEqual(pixels(blitted), pixels(drawn))
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class TestRunner(unittest.TestCase):
+
+    def setUp(self):
+        pygame.display.init()
+        self.surface = pygame.display.set_mode((30, 30))
+
+    def tearDown(self):
+        pygame.display.quit()
+
+    def test_step_errors_stop_the_loop(self):
+        def broken(world):
+            raise ValueError("broken")
+
+        runner = Runner(self.surface, grid.Grid(3, 3), broken)
+        with self.assertRaises(ValueError):
+            runner.run()
+        self.assertFalse(runner.simulation.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from horton import grid
+from horton.records import Cell, Field, RecordGrid
+
+
+SCHEMA = [('north', 'B', 1), ('east', 'B', 1), ('set', 'l'),
+          ('name', None, '')]
+
+
+class TestRecordGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.g = RecordGrid(4, 3, SCHEMA)
+
+    def test_schema(self):
+        self.assertEqual(self.g.fields, ('north', 'east', 'set', 'name'))
+        self.assertEqual(self.g.schema[2], Field('set', 'l', 0))
+        self.assertEqual(len(self.g), 12)
+        self.assertEqual(self.g.dimensions, (4, 3))
+
+    def test_fields_are_typed_grids(self):
+        north = self.g.field('north')
+        self.assertTrue(isinstance(north, grid.Grid))
+        self.assertEqual(north._grid.typecode, 'B')
+        self.assertEqual(list(north), [1] * 12)
+        self.assertEqual(list(self.g.field('name')), [''] * 12)
+        with self.assertRaises(KeyError):
+            self.g.field('west')
+
+    def test_cell_view(self):
+        cell = self.g[2, 1]
+        self.assertTrue(isinstance(cell, Cell))
+        cell.north = 0
+        cell['name'] = 'hall'
+        self.assertEqual(self.g.field('north')[2, 1], 0)
+        self.assertEqual(self.g[2, 1].name, 'hall')
+        self.g.field('set')[2, 1] = 5
+        self.assertEqual(cell.set, 5)
+        with self.assertRaises(AttributeError):
+            cell.west
+        with self.assertRaises(AttributeError):
+            cell.west = 1
+
+    def test_set_record(self):
+        self.g[0, 0] = (0, 0, 3, 'a')
+        self.assertEqual(self.g.record(0, 0), (0, 0, 3, 'a'))
+        self.g[0, 0] = {'east': 1}
+        self.assertEqual(self.g.record(0, 0).east, 1)
+        self.g[1, 0] = self.g[0, 0]
+        self.assertEqual(self.g[1, 0], self.g[0, 0])
+        with self.assertRaises(KeyError):
+            self.g[0, 0] = {'west': 1}
+        with self.assertRaises(ValueError):
+            self.g[0, 0] = (1, 2)
+
+    def test_invalid_location(self):
+        with self.assertRaises(KeyError):
+            self.g[4, 0]
+        with self.assertRaises(KeyError):
+            self.g[-1, 0] = {'set': 1}
+
+    def test_iteration(self):
+        self.g[3, 2] = {'set': 9}
+        records = list(self.g.iter_records())
+        self.assertEqual(records[-1], (1, 1, 9, ''))
+        self.assertEqual([c.set for c in self.g][-1], 9)
+        self.assertTrue((1, 1, 9, '') in self.g)
+
+    def test_copy_and_equality(self):
+        other = RecordGrid.copy(self.g)
+        self.assertEqual(other, self.g)
+        other[1, 1] = {'north': 0}
+        self.assertNotEqual(other, self.g)
+        self.assertEqual(self.g[1, 1].north, 1)
+
+    def test_field_watchers_see_cell_writes(self):
+        changes = []
+        self.g.field('set').watch(lambda x, y: changes.append((x, y)))
+        self.g[3, 1].set = 2
+        self.assertEqual(changes, [(3, 1)])
+
+    def test_duplicate_fields(self):
+        with self.assertRaises(ValueError):
+            RecordGrid(1, 1, [('a', 'b'), ('a', 'l')])
@@ -0,0 +1,153 @@
+import gc
+import multiprocessing
+import pickle
+import unittest
+
+from horton import conway, grid
+from horton import shared
+from horton.shared import SharedGrid, SharedGridHandle, use_lock
+
+
+def total(g):
+    try:
+        return g.sum()
+    finally:
+        g.close()
+
+
+def mark(g, value):
+    try:
+        with g.lock:
+            g[0, 0] += value
+    finally:
+        g.close()
+
+
+class TestSharedGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.g = SharedGrid(4, 3, typecode='b')
+
+    def tearDown(self):
+        self.g.unlink()
+
+    def test_attach_shares_cells(self):
+        other = SharedGrid.attach(self.g.handle)
+        self.g[2, 1] = 7
+        self.assertEqual(other[2, 1], 7)
+        other[0, 2] = 3
+        self.assertEqual(self.g[0, 2], 3)
+        other.close()
+
+    def test_handle(self):
+        handle = self.g.handle
+        self.assertTrue(isinstance(handle, SharedGridHandle))
+        self.assertEqual(handle[1:], (4, 3, 'b'))
+
+    def test_pickle_sends_handle(self):
+        self.g.fill(5)
+        data = pickle.dumps(self.g)
+        self.assertTrue(len(data) < 200)
+        other = pickle.loads(data)
+        self.assertEqual(list(other), [5] * 12)
+        other.close()
+
+    def test_readonly(self):
+        other = SharedGrid.attach(self.g.handle, readonly=True)
+        with self.assertRaises(TypeError):
+            other[0, 0] = 1
+        with self.assertRaises(TypeError):
+            other.fill(1)
+        other.close()
+
+    def test_from_array(self):
+        g = SharedGrid.from_array(3, 1, [1, 2, 3], typecode='d')
+        self.assertEqual(g.values, [1.0, 2.0, 3.0])
+        self.assertEqual(g, grid.Grid.from_array(3, 1, [1, 2, 3]))
+        g.unlink()
+
+    def test_operations_return_ordinary_grids(self):
+        self.g[1, 1] = 1
+        self.assertTrue(type(self.g + 1) is grid.Grid)
+        self.assertEqual((self.g + self.g)[1, 1], 2)
+        self.assertEqual(grid.Grid.copy(self.g), self.g)
+        self.assertTrue(type(conway.step(self.g)) is grid.Grid)
+
+    def test_bulk_writes(self):
+        self.g += 2
+        self.assertEqual(list(self.g), [2] * 12)
+        self.g.apply_patch([(0, [1, 1])])
+        self.assertEqual(self.g.flood_fill((3, 2), 4), 10)
+        self.assertEqual(list(self.g), [1, 1] + [4] * 10)
+
+    def test_context_manager_unlinks(self):
+        with SharedGrid(2, 2) as g:
+            handle = g.handle
+        with self.assertRaises(FileNotFoundError):
+            SharedGrid.attach(handle)
+
+    def test_collected_grid_destroys_block(self):
+        handles = [SharedGrid.from_array(2, 1, [1, 2]).handle,
+                   SharedGrid.copy(self.g).handle]
+        gc.collect()
+        for handle in handles:
+            with self.assertRaises(FileNotFoundError):
+                SharedGrid.attach(handle)
+
+    def test_attached_grid_keeps_block(self):
+        other = SharedGrid.attach(self.g.handle)
+        del other
+        gc.collect()
+        SharedGrid.attach(self.g.handle).close()
+
+    def test_options(self):
+        self.assertEqual(self.g._options(), {'typecode': 'b'})
+        g = SharedGrid.from_array(4, 3, list(self.g), **self.g._options())
+        self.assertEqual(g.typecode, 'b')
+        g.unlink()
+
+    def test_process_pool(self):
+        context = multiprocessing.get_context()
+        self.g.fill(1)
+        with context.Pool(2) as pool:
+            self.assertEqual(pool.map(total, [self.g] * 4), [12] * 4)
+
+    def test_process_pool_with_lock(self):
+        context = multiprocessing.get_context()
+        lock = context.RLock()
+        g = SharedGrid(1, 1, lock=lock)
+        with context.Pool(2, initializer=use_lock,
+                          initargs=(lock,)) as pool:
+            pool.starmap(mark, [(g, n) for n in range(1, 5)])
+        self.assertEqual(g[0, 0], 10)
+        g.unlink()
+
+    def test_process_pool_with_manager_lock(self):
+        context = multiprocessing.get_context()
+        with context.Manager() as manager:
+            g = SharedGrid(1, 1, lock=manager.RLock())
+            with context.Pool(2) as pool:
+                pool.starmap(mark, [(g, n) for n in range(1, 5)])
+            self.assertEqual(g[0, 0], 10)
+            g.unlink()
+
+    def test_lock_must_be_given_to_process(self):
+        g = SharedGrid(1, 1, lock=multiprocessing.RLock())
+        data = pickle.dumps(g)
+        self.assertEqual(shared._process_lock, None)
+        with self.assertRaises(RuntimeError):
+            pickle.loads(data)
+        g.unlink()
+
+    def test_locked_writes(self):
+        context = multiprocessing.get_context()
+        lock = context.RLock()
+        g = SharedGrid(1, 1, lock=lock)
+        workers = [context.Process(target=mark, args=(g, n))
+                   for n in range(1, 5)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(g[0, 0], 10)
+        g.unlink()
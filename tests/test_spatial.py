@@ -0,0 +1,86 @@
+import random
+import unittest
+
+from horton import grid
+from horton.spatial import SpatialIndex
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SpatialIndex(grid.Grid(30, 20), bucket_size=4)
+
+    def test_insert_move_remove(self):
+        self.index.insert('a', (1, 1))
+        self.assertTrue('a' in self.index)
+        self.index.move('a', (29, 19))
+        self.assertEqual(self.index.position('a'), (29, 19))
+        self.assertEqual(self.index.at((29, 19)), ['a'])
+        self.assertEqual(self.index.at((1, 1)), [])
+        self.index.remove('a')
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index._buckets, {})
+
+    def test_errors(self):
+        self.index.insert('a', (1, 1))
+        with self.assertRaises(ValueError):
+            self.index.insert('a', (2, 2))
+        with self.assertRaises(KeyError):
+            self.index.insert('b', (30, 0))
+        with self.assertRaises(KeyError):
+            self.index.move('a', (-1, 0))
+        with self.assertRaises(KeyError):
+            self.index.remove('b')
+
+    def test_in_rect(self):
+        self.index.insert('a', (4, 4))
+        self.index.insert('b', (7, 9))
+        self.index.insert('c', (8, 9))
+        self.assertEqual(sorted(self.index.in_rect((4, 4), (7, 9))),
+                         ['a', 'b'])
+        self.assertEqual(sorted(self.index.in_rect((-5, -5), (50, 50))),
+                         ['a', 'b', 'c'])
+
+    def test_torus_wraps(self):
+        index = SpatialIndex(grid.Torus(10, 10), bucket_size=3)
+        index.insert('a', (0, 0))
+        index.insert('b', (12, 9))
+        self.assertEqual(index.position('b'), (2, 9))
+        self.assertEqual(sorted(index.within((9, 9), 1.5)), ['a'])
+        self.assertEqual(sorted(index.in_rect((8, 8), (12, 11))),
+                         ['a', 'b'])
+        self.assertEqual(index.nearest((9, 0)), ['a'])
+
+    def test_nearest_edge_cases(self):
+        self.assertEqual(self.index.nearest((0, 0)), [])
+        self.index.insert('a', (29, 19))
+        self.assertEqual(self.index.nearest((0, 0), k=3), ['a'])
+        self.assertEqual(self.index.nearest((0, 0), k=0), [])
+
+    def test_queries_match_brute_force(self):
+        rng = random.Random(4)
+        for cls in [grid.Grid, grid.Torus]:
+            for width, height, size in [(17, 11, 4), (9, 23, 8), (5, 5, 1)]:
+                g = cls(width, height)
+                index = SpatialIndex(g, bucket_size=size)
+                for n in range(60):
+                    index.insert(n, (rng.randrange(width),
+                                     rng.randrange(height)))
+                for n in range(0, 60, 3):
+                    index.move(n, (rng.randrange(width),
+                                   rng.randrange(height)))
+                for _ in range(30):
+                    centre = (rng.randrange(width), rng.randrange(height))
+                    radius = rng.uniform(0, 8)
+                    expected = sorted(
+                        n for n in index
+                        if index._distance2(centre, index.position(n)) <=
+                        radius * radius)
+                    self.assertEqual(sorted(index.within(centre, radius)),
+                                     expected)
+                    k = rng.randint(1, 10)
+                    distance = lambda n: index._distance2(
+                        centre, index.position(n))
+                    self.assertEqual(
+                        [distance(n) for n in index.nearest(centre, k)],
+                        sorted(map(distance, index))[:k])
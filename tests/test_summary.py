@@ -0,0 +1,91 @@
+import random
+import unittest
+
+from horton import grid
+from horton.summary import Summary
+
+
+class TestSummary(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.g = grid.Grid.from_array(
+            11, 6, [rng.randint(-20, 20) for _ in range(66)])
+        self.summary = Summary(self.g)
+
+    def tearDown(self):
+        self.summary.close()
+
+    def cells(self, x1, y1, x2, y2):
+        return [self.g[x, y]
+                for y in range(y1, y2 + 1) for x in range(x1, x2 + 1)]
+
+    def check_regions(self, rng):
+        for _ in range(50):
+            x1, x2 = sorted(rng.randrange(11) for _ in range(2))
+            y1, y2 = sorted(rng.randrange(6) for _ in range(2))
+            cells = self.cells(x1, y1, x2, y2)
+            self.assertEqual(self.summary.sum((x1, y1), (x2, y2)),
+                             sum(cells))
+            self.assertEqual(self.summary.min((x1, y1), (x2, y2)),
+                             min(cells))
+            self.assertEqual(self.summary.max((x1, y1), (x2, y2)),
+                             max(cells))
+
+    def test_queries_match_brute_force(self):
+        self.check_regions(random.Random(1))
+
+    def test_updates_on_setitem(self):
+        rng = random.Random(2)
+        self.summary.max((0, 0), (10, 5))
+        for _ in range(30):
+            self.g[rng.randrange(11), rng.randrange(6)] = rng.randint(-50, 50)
+            self.check_regions(rng)
+
+    def test_setitem_keeps_table(self):
+        self.summary.sum((0, 0), (10, 5))
+        table = self.summary._sat
+        self.g[4, 2] += 5
+        self.g[4, 2] += 1
+        self.g[9, 5] = 100
+        self.check_regions(random.Random(3))
+        self.assertTrue(self.summary._sat is table)
+        for x in range(11):
+            for y in range(2):
+                self.g[x, y] = x
+        self.check_regions(random.Random(4))
+        self.assertFalse(self.summary._sat is table)
+
+    def test_rebuilds_after_bulk_changes(self):
+        self.summary.sum((0, 0), (10, 5))
+        self.g.fill(2)
+        self.assertEqual(self.summary.sum((0, 0), (10, 5)), 132)
+        self.assertEqual(self.summary.max((3, 1), (4, 4)), 2)
+
+    def test_levels(self):
+        self.assertEqual(self.summary.levels, 5)
+        top = self.summary.level(4, 'sum')
+        self.assertEqual(top.dimensions, (1, 1))
+        self.assertEqual(top[0, 0], sum(self.g))
+        coarse = self.summary.level(1, 'max')
+        self.assertEqual(coarse.dimensions, (6, 3))
+        self.assertEqual(coarse[5, 2], max(self.cells(10, 4, 10, 5)))
+
+    def test_errors(self):
+        with self.assertRaises(KeyError):
+            self.summary.sum((0, 0), (11, 0))
+        with self.assertRaises(ValueError):
+            self.summary.min((3, 3), (2, 3))
+        with self.assertRaises(ValueError):
+            self.summary.level(5)
+        with self.assertRaises(ValueError):
+            self.summary.level(1, 'median')
+
+    def test_close_stops_watching(self):
+        self.summary.close()
+        self.assertEqual(self.g._watchers, [])
+        self.summary = Summary(self.g)
+
+
+if __name__ == '__main__':
+    unittest.main()